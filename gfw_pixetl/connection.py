@@ -1,5 +1,17 @@
+import os
+from typing import Dict
+
+from sqlalchemy.engine import Engine, create_engine
+from sqlalchemy.engine.url import URL
+
 from gfw_pixetl.settings.globals import GLOBALS
 
+# Engines by process ID. Engines inherited from a parent process share its
+# connections, so each worker process creates its own. Inherited engines are
+# kept referenced, so that their connections don't get closed on garbage
+# collection while the parent still uses them.
+_ENGINES: Dict[int, Engine] = dict()
+
 
 class PgConn(object):
     db_host = GLOBALS.db_host
@@ -10,3 +22,29 @@ class PgConn(object):
 
     def pg_conn(self):
         return f"PG:dbname={self.db_name} port={self.db_port} host={self.db_host} user={self.db_user} password={self.db_password}"
+
+
+def get_engine() -> Engine:
+    """Pooled database engine of the current process.
+
+    The engine is created on first use and reused for all tiles the
+    process handles. Connections are checked before use, so that
+    connections dropped by the database get replaced transparently.
+    """
+    pid: int = os.getpid()
+    if pid not in _ENGINES:
+        db_url: URL = URL(
+            "postgresql+psycopg2",
+            host=GLOBALS.db_host,
+            port=GLOBALS.db_port,
+            username=GLOBALS.db_username,
+            password=GLOBALS.db_password,
+            database=GLOBALS.db_name,
+        )
+        _ENGINES[pid] = create_engine(
+            db_url,
+            pool_size=GLOBALS.db_pool_size,
+            max_overflow=0,
+            pool_pre_ping=True,
+        )
+    return _ENGINES[pid]
@@ -3,24 +3,34 @@ import os
 from typing import Any, Dict, List, Optional, Tuple, Type, Union
 from urllib.parse import urlparse
 
+import numpy as np
+import shapely
 from geojson import FeatureCollection
 from rasterio.warp import Resampling
-from shapely.geometry import MultiPolygon, shape
+from shapely.geometry import MultiPolygon, Polygon, shape
 from shapely.ops import unary_union
 
 from gfw_pixetl import get_module_logger
 from gfw_pixetl.data_type import DataType, data_type_factory
+from gfw_pixetl.decorators import lazy_property
 from gfw_pixetl.grids import Grid, grid_factory
 from gfw_pixetl.models.pydantic import LayerModel, Symbology
 from gfw_pixetl.resampling import resampling_factory
-from gfw_pixetl.sources import RasterSource, VectorSource, fetch_metadata
+from gfw_pixetl.sources import RasterSource, VectorSource
 
 from .models.enums import DstFormat, PhotometricType
 from .models.named_tuples import InputBandElement
 from .settings.globals import GLOBALS
-from .utils.aws import get_aws_files, get_s3_client
+from .utils.aws import get_aws_file_versions, get_s3_client
+from .utils.calc import compile_calc
 from .utils.geometry import generate_feature_collection
-from .utils.google import get_gs_files
+from .utils.google import get_gs_file_versions
+from .utils.metadata import (
+    FileMetadata,
+    fetch_source_metadata,
+    metadata_from_json,
+    register_source_metadata,
+)
 from .utils.utils import DummyTile, enumerate_bands, intersection, union
 
 LOGGER = get_module_logger(__name__)
@@ -51,6 +61,9 @@ class Layer(object):
         self.band_count: int = layer_def.band_count
         self.union_bands: bool = layer_def.union_bands
         self.photometric: Optional[PhotometricType] = layer_def.photometric
+        self.warp_threads: Optional[int] = layer_def.warp_threads
+        self.warp_error_threshold: Optional[float] = layer_def.warp_error_threshold
+        self.compression_threads: Optional[int] = layer_def.compression_threads
 
     def _get_prefix(
         self,
@@ -121,10 +134,19 @@ def get_input_files_from_tiles_geojson(
     features = json.loads(body.decode("utf-8"))["features"]
 
     input_files = list()
+    metadata: Dict[str, FileMetadata] = dict()
 
     for feature in features:
         LOGGER.debug(f"Found feature: {feature}")
-        input_files.append((shape(feature["geometry"]), feature["properties"]["name"]))
+        properties = feature["properties"]
+        input_files.append((shape(feature["geometry"]), properties["name"]))
+        if properties.get("raster"):
+            metadata[properties["name"]] = metadata_from_json(properties["raster"])
+
+    # Trust metadata listed in tiles.geojson, instead of opening every file
+    LOGGER.debug(f"Found metadata of {len(metadata)} file(s) in {prefix}")
+    register_source_metadata(metadata)
+
     return input_files
 
 
@@ -140,13 +162,14 @@ def get_input_files_from_folder(
     elif not new_prefix.endswith("/"):
         new_prefix += "/"
 
-    get_files = {"s3": get_aws_files, "gs": get_gs_files}
+    get_files = {"s3": get_aws_file_versions, "gs": get_gs_file_versions}
 
-    file_list = get_files[provider](bucket, new_prefix)
+    file_versions: Dict[str, str] = get_files[provider](bucket, new_prefix)
+    metadata = fetch_source_metadata(file_versions, file_versions)
     tiles: List[DummyTile] = list()
-    for uri in file_list:
+    for uri in file_versions:
         LOGGER.debug(f"Adding file {uri}")
-        src = RasterSource(uri)
+        src = RasterSource(uri, metadata[uri])
         tiles.append(DummyTile({"geotiff": src}))
 
     fc: FeatureCollection = generate_feature_collection(
@@ -168,6 +191,10 @@ class RasterSrcLayer(Layer):
         self._src_uri = layer_def.source_uri
         self.input_bands: List[List[InputBandElement]] = self._input_bands()
 
+        # Fail early if calc expression does not match the input bands
+        if self.calc:
+            compile_calc(self.calc, len(self.input_bands))
+
     def _input_bands(self) -> List[List[InputBandElement]]:
         assert isinstance(self._src_uri, list)
 
@@ -193,8 +220,9 @@ class RasterSrcLayer(Layer):
             src_band_count: Optional[int] = None
             src_band_elements: List[List[InputBandElement]] = list()
 
+            metadata = fetch_source_metadata(file_uri for _, file_uri in src_files)
             for geometry, file_uri in src_files:
-                _, file_profile = fetch_metadata(file_uri)
+                _, file_profile = metadata[file_uri]
                 file_band_count: int = file_profile["count"]
 
                 LOGGER.info(
@@ -236,10 +264,38 @@ class RasterSrcLayer(Layer):
 
         return input_bands
 
-    @property
+    @lazy_property
+    def input_band_trees(self) -> List[shapely.STRtree]:
+        """Spatial index over the footprints of the input files of each
+        band."""
+        return [
+            shapely.STRtree([element.geometry for element in band])
+            for band in self.input_bands
+        ]
+
+    def intersecting_input_files(self, geom: Polygon) -> List[List[InputBandElement]]:
+        """Input files per band whose footprints intersect with geometry.
+
+        Files which only share an exterior point with the geometry are
+        excluded. Files keep their order within each band.
+        """
+        input_files: List[List[InputBandElement]] = list()
+        for band, tree in zip(self.input_bands, self.input_band_trees):
+            candidates: np.ndarray = np.sort(tree.query(geom, predicate="intersects"))
+            touching: np.ndarray = shapely.touches(
+                tree.geometries.take(candidates), geom
+            )
+            input_files.append([band[i] for i in candidates[~touching]])
+        return input_files
+
+    @lazy_property
     def geom(self) -> MultiPolygon:
         """Create a Multipolygon from the union or intersection of the input
-        tiles in all bands."""
+        tiles in all bands.
+
+        Computed once per layer and prepared, so that repeated predicates
+        against it are fast.
+        """
 
         LOGGER.debug("Creating Multipolygon from input tile bounds")
 
@@ -255,6 +311,7 @@ class RasterSrcLayer(Layer):
         if not geom:
             raise RuntimeError("Input bands do not overlap")
 
+        shapely.prepare(geom)
         return geom
 
 
@@ -9,6 +9,12 @@ class Order(str, Enum):
 class RasterizeMethod(str, Enum):
     _count = "count"
     value = "value"
+    max = "max"
+    min = "min"
+    sum = "sum"
+    mean = "mean"
+    first = "first"
+    last = "last"
 
 
 class SourceType(str, Enum):
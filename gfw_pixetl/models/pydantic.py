@@ -1,6 +1,7 @@
+import ast
 from typing import Dict, List, Optional, Tuple, Union
 
-from pydantic import BaseModel, Field, StrictInt, validator
+from pydantic import BaseModel, Field, PositiveInt, StrictInt, validator
 
 from gfw_pixetl.data_type import DataTypeEnum
 from gfw_pixetl.grids.grid_factory import GridEnum
@@ -59,6 +60,17 @@ class LayerModel(BaseModel):
     compute_histogram: bool = False
     process_locally: bool = False
     photometric: Optional[PhotometricType] = None
+    warp_threads: Optional[PositiveInt] = Field(
+        None, description="Overrides number of threads used to warp a window."
+    )
+    warp_error_threshold: Optional[float] = Field(
+        None,
+        ge=0,
+        description="Overrides maximum error in input pixels when approximating the warp transformation.",
+    )
+    compression_threads: Optional[PositiveInt] = Field(
+        None, description="Overrides number of threads used to compress output files."
+    )
 
     @validator("source_uri")
     def validate_source_uri(cls, v, values, **kwargs):
@@ -68,6 +80,16 @@ class LayerModel(BaseModel):
             assert not v, "Only raster source type require source_uri"
         return v
 
+    @validator("calc")
+    def validate_calc(cls, v, values, **kwargs):
+        # Vector calc expressions are SQL and get validated by the database
+        if v and values.get("source_type") == SourceType.raster:
+            try:
+                ast.parse(v.strip(), mode="eval")
+            except SyntaxError as e:
+                raise ValueError(f"Calc is not a valid expression: {e}")
+        return v
+
     @validator("no_data")
     def validate_no_data(cls, v, values, **kwargs):
         if isinstance(v, list):
@@ -1,5 +1,7 @@
 from typing import Iterator, List, Set, Tuple
 
+import numpy as np
+import shapely
 from parallelpipe import Stage, stage
 
 from gfw_pixetl import get_module_logger
@@ -27,8 +29,32 @@ class RasterPipe(Pipe):
         tile_count: int = len(tiles)
         LOGGER.info(f"Found {tile_count} tile(s) inside grid")
 
+        self._intersect_src_tiles(tiles)
+
         return tiles
 
+    def _intersect_src_tiles(self, tiles: Set[RasterSrcTile]) -> None:
+        """Determine which tiles intersect with the source extent using a
+        single vectorized predicate over all tiles, instead of testing one
+        tile at a time."""
+        assert isinstance(self.layer, RasterSrcLayer)
+        candidates: List[RasterSrcTile] = [
+            tile for tile in tiles if not self.subset or tile.tile_id in self.subset
+        ]
+        if not candidates:
+            return
+
+        tile_geoms: np.ndarray = np.array(
+            [tile.dst[tile.default_format].geom for tile in candidates], dtype=object
+        )
+        # must intersect, but we don't want geometries that only share an exterior point
+        intersects: np.ndarray = shapely.intersects(
+            tile_geoms, self.layer.geom
+        ) & ~shapely.touches(tile_geoms, self.layer.geom)
+
+        for tile, src_intersects in zip(candidates, intersects):
+            tile.src_intersects = bool(src_intersects)
+
     def _get_grid_tile(self, tile_id: str) -> RasterSrcTile:
         assert isinstance(self.layer, RasterSrcLayer)
         return RasterSrcTile(tile_id=tile_id, grid=self.grid, layer=self.layer)
@@ -59,13 +85,19 @@ class RasterPipe(Pipe):
     @staticmethod
     @stage(workers=GLOBALS.num_processes)
     def filter_src_tiles(tiles: Iterator[RasterSrcTile]) -> Iterator[RasterSrcTile]:
-        """Only process tiles which intersect with source raster."""
+        """Only process tiles which intersect with source raster.
+
+        Only tests tiles for which this isn't known yet.
+        """
         for tile in tiles:
-            if tile.status == "pending" and not tile.within():
-                LOGGER.info(
-                    f"Tile {tile.tile_id} does not intersect with source raster - skip"
-                )
-                tile.status = "skipped (does not intersect)"
+            if tile.status == "pending":
+                if tile.src_intersects is None:
+                    tile.src_intersects = tile.within()
+                if not tile.src_intersects:
+                    LOGGER.info(
+                        f"Tile {tile.tile_id} does not intersect with source raster - skip"
+                    )
+                    tile.status = "skipped (does not intersect)"
             yield tile
 
     # We cannot use the @stage decorate here
@@ -7,6 +7,7 @@ from gfw_pixetl.layers import VectorSrcLayer
 from gfw_pixetl.pipes import Pipe
 from gfw_pixetl.settings.globals import GLOBALS
 from gfw_pixetl.tiles import Tile, VectorSrcTile
+from gfw_pixetl.tiles.vector_src_tile import intersecting_tile_ids, partition_src
 
 LOGGER = get_module_logger(__name__)
 
@@ -47,8 +48,39 @@ class VectorPipe(Pipe):
         tile_count: int = len(tiles)
         LOGGER.info(f"Found {tile_count} tiles inside grid")
 
+        if GLOBALS.partition_vector_source:
+            self._partition_src_tiles(tiles)
+        elif GLOBALS.bulk_vector_intersects:
+            self._intersect_src_tiles(tiles)
+
         return tiles
 
+    def _subset_tiles(self, tiles: Set[VectorSrcTile]) -> List[VectorSrcTile]:
+        return [
+            tile for tile in tiles if not self.subset or tile.tile_id in self.subset
+        ]
+
+    def _intersect_src_tiles(self, tiles: Set[VectorSrcTile]) -> None:
+        """Determine which tiles intersect with the input vector extent
+        using a single query, instead of querying once per tile."""
+        candidates: List[VectorSrcTile] = self._subset_tiles(tiles)
+        tile_ids: Set[str] = intersecting_tile_ids(candidates)
+        for tile in candidates:
+            tile.src_intersects = tile.tile_id in tile_ids
+
+    def _partition_src_tiles(self, tiles: Set[VectorSrcTile]) -> None:
+        """Extract features for all tiles using a single scan of the input
+        vector table, instead of querying it once per tile.
+
+        Tiles without features don't intersect with the input vector
+        extent.
+        """
+        candidates: List[VectorSrcTile] = self._subset_tiles(tiles)
+        tile_ids: Set[str] = partition_src(candidates)
+        for tile in candidates:
+            tile.src_intersects = tile.tile_id in tile_ids
+            tile.src_extracted = tile.src_intersects
+
     def _get_grid_tile(self, tile_id: str) -> VectorSrcTile:
         assert isinstance(self.layer, VectorSrcLayer)
         return VectorSrcTile(tile_id=tile_id, grid=self.grid, layer=self.layer)
@@ -56,16 +88,24 @@ class VectorPipe(Pipe):
     @staticmethod
     @stage(workers=min(GLOBALS.num_processes, 4))  # Limited to be nice to DB
     def filter_src_tiles(tiles: Iterator[VectorSrcTile]) -> Iterator[VectorSrcTile]:
-        """Only include tiles which intersect input vector extent."""
+        """Only include tiles which intersect input vector extent.
+
+        Only queries the database for tiles for which this isn't known
+        yet.
+        """
         for tile in tiles:
-            if tile.status == "pending" and not tile.src_vector_intersects():
-                tile.status = "skipped (does not intersect)"
+            if tile.status == "pending":
+                if tile.src_intersects is None:
+                    tile.src_intersects = tile.src_vector_intersects()
+                if not tile.src_intersects:
+                    tile.status = "skipped (does not intersect)"
             yield tile
 
     @staticmethod
     @stage(workers=min(GLOBALS.num_processes, 4))  # Limited to be nice to DB
     def fetch_tile_data(tiles: Iterator[VectorSrcTile]) -> Iterator[VectorSrcTile]:
-        """Download vector data from the database."""
+        """Download vector data from the database, unless already
+        extracted."""
         for tile in tiles:
             if tile.status == "pending":
                 tile.fetch_data()
@@ -1,14 +1,25 @@
-from typing import List, Tuple
+import json
+import os
+from typing import Dict, List, Tuple
 from urllib.parse import urlparse
 
 import click
 
+from gfw_pixetl import get_module_logger
 from gfw_pixetl.sources import RasterSource
 from gfw_pixetl.utils import get_bucket, upload_geometries
-from gfw_pixetl.utils.aws import get_aws_files
-from gfw_pixetl.utils.google import get_gs_files
+from gfw_pixetl.utils.aws import get_aws_file_versions, get_s3_client
+from gfw_pixetl.utils.google import get_gs_file_versions
+from gfw_pixetl.utils.metadata import (
+    FileMetadata,
+    fetch_source_metadata,
+    metadata_from_json,
+    register_source_metadata,
+)
 from gfw_pixetl.utils.utils import DummyTile
 
+LOGGER = get_module_logger(__name__)
+
 
 def get_key_from_vsi(vsi_path: str) -> str:
     key = vsi_path.split("/")[3:]
@@ -21,28 +32,40 @@ def create_geojsons(
     version: str,
     prefix: str,
     merge_existing: bool,
+    incremental: bool = False,
 ) -> None:
-    get_files = {"s3": get_aws_files, "gs": get_gs_files}
-
-    tiles: List[DummyTile] = list()
+    get_files = {"s3": get_aws_file_versions, "gs": get_gs_file_versions}
 
+    files: Dict[str, str] = dict()
     for provider, bucket, key in resources:
-        files = get_files[provider](bucket, key)
-
-        for uri in files:
-            src = RasterSource(uri)
-            tiles.append(DummyTile({"geotiff": src}))
+        files.update(get_files[provider](bucket, key))
 
     data_lake_bucket = get_bucket()
     target_prefix = f"{dataset}/{version}/{prefix.strip('/')}/"
 
     # Don't bother checking for existing tiles unless we're going to use them
-    existing_tiles = list()
+    existing_files: Dict[str, str] = dict()
     if merge_existing:
-        existing_uris = get_aws_files(data_lake_bucket, target_prefix)
-        for uri in existing_uris:
-            src = RasterSource(uri)
-            existing_tiles.append(DummyTile({"geotiff": src}))
+        existing_files = get_aws_file_versions(data_lake_bucket, target_prefix)
+
+    if incremental:
+        listed = get_listed_files(
+            data_lake_bucket, os.path.join(target_prefix, "geotiff", "tiles.geojson")
+        )
+        all_files: Dict[str, str] = {**files, **existing_files}
+        # Only open files which are new or changed since tiles.geojson was written
+        unchanged: Dict[str, FileMetadata] = {
+            uri: metadata
+            for uri, (etag, metadata) in listed.items()
+            if all_files.get(uri) == etag
+        }
+        LOGGER.info(
+            f"{len(unchanged)} of {len(all_files)} file(s) are unchanged since last run"
+        )
+        register_source_metadata(unchanged)
+
+    tiles: List[DummyTile] = create_tiles(files)
+    existing_tiles: List[DummyTile] = create_tiles(existing_files)
 
     upload_geometries.upload_geojsons(
         tiles,  # type: ignore
@@ -53,6 +76,50 @@ def create_geojsons(
     )
 
 
+def create_tiles(files: Dict[str, str]) -> List[DummyTile]:
+    """Create a tile for each file, opening files concurrently.
+
+    Files are given by URI together with their ETag, which is kept in
+    tiles.geojson to detect changed files in later runs.
+    """
+    metadata: Dict[str, FileMetadata] = fetch_source_metadata(files, files)
+
+    tiles: List[DummyTile] = list()
+    for uri, etag in files.items():
+        tile = DummyTile({"geotiff": RasterSource(uri, metadata[uri])})
+        tile.metadata["geotiff"] = {"etag": etag}
+        tiles.append(tile)
+
+    return tiles
+
+
+def get_listed_files(bucket: str, key: str) -> Dict[str, Tuple[str, FileMetadata]]:
+    """ETag and metadata of files listed in an existing tiles.geojson, by
+    file URI.
+
+    Files listed without ETag or metadata are left out, they need to be
+    opened again.
+    """
+    s3_client = get_s3_client()
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=key)
+    except s3_client.exceptions.NoSuchKey:
+        LOGGER.info(f"No tiles.geojson found at {bucket}/{key}")
+        return dict()
+
+    features = json.loads(response["Body"].read().decode("utf-8"))["features"]
+
+    listed: Dict[str, Tuple[str, FileMetadata]] = dict()
+    for feature in features:
+        properties = feature["properties"]
+        if properties.get("etag") and properties.get("raster"):
+            listed[properties["name"]] = (
+                properties["etag"],
+                metadata_from_json(properties["raster"]),
+            )
+    return listed
+
+
 @click.command()
 @click.argument("urls", type=str)
 @click.option(
@@ -74,8 +141,21 @@ def create_geojsons(
     default=False,
     help="Merge features from resources with features already present in S3 folder.",
 )
+@click.option(
+    "--incremental",
+    type=bool,
+    is_flag=True,
+    default=False,
+    help="Only open files which are new or changed since tiles.geojson was last written. "
+    "Files are compared by key and ETag.",
+)
 def cli(
-    urls: str, dataset: str, version: str, prefix: str, merge_existing: bool
+    urls: str,
+    dataset: str,
+    version: str,
+    prefix: str,
+    merge_existing: bool,
+    incremental: bool,
 ) -> None:
     """Retrieve all geotiffs under given resources and generate tiles.geojson
     and extent.geojson at s3://{data-
@@ -97,4 +177,4 @@ def cli(
         key = o.path.lstrip("/")
         resources.append((provider, bucket, key))
 
-    create_geojsons(resources, dataset, version, prefix, merge_existing)
+    create_geojsons(resources, dataset, version, prefix, merge_existing, incremental)
@@ -1,9 +1,10 @@
+import os
 from os import cpu_count
 from typing import Optional
 
 import psutil
 import pydantic
-from pydantic import Field, PositiveInt
+from pydantic import Field, NonNegativeInt, PositiveInt, confloat
 
 from gfw_pixetl import get_module_logger
 from gfw_pixetl.models.enums import DstFormat
@@ -30,7 +31,6 @@ class Secret:
 
 
 class Globals(EnvSettings):
-
     #####################
     # General
     #####################
@@ -53,9 +53,75 @@ class Globals(EnvSettings):
         description="Fraction of memory per worker to use to compute maximum block size."
         "(ie 4 => size =  25% of available memory)",
     )
+    probe_tiles: bool = Field(
+        False,
+        description="Read the no data mask of the source at full resolution before "
+        "processing a tile to skip tiles and windows without data.",
+    )
+    calibrate_memory: bool = Field(
+        True,
+        description="Measure peak memory per pixel on a sample window and size windows accordingly. "
+        "Falls back to divisor if disabled or if measurement fails.",
+    )
+    calibration_memory_fraction: confloat(gt=0, le=1) = Field(  # type: ignore
+        0.5,
+        description="Fraction of memory per worker a window may use according to the measured peak memory.",
+    )
+    calibration_cache: Optional[str] = Field(
+        os.path.join(
+            os.path.expanduser("~"), ".cache", "gfw_pixetl", "calibration.json"
+        ),
+        description="File in which memory calibrations are kept for later runs. Set empty to disable.",
+    )
+    metadata_threads: PositiveInt = Field(
+        16,
+        description="Number of threads used to fetch metadata of input files concurrently.",
+    )
+    metadata_cache: Optional[str] = Field(
+        os.path.join(os.path.expanduser("~"), ".cache", "gfw_pixetl", "metadata.json"),
+        description="File in which metadata of input files is kept for later runs, "
+        "keyed by file URI and ETag or size. Set empty to disable.",
+    )
     workers: PositiveInt = Field(
         cpu_count(), description="Number of workers to use to execute job."
     )
+    worker_max_tasks: PositiveInt = Field(
+        100,
+        description="Number of windows a worker process handles before it gets replaced.",
+    )
+    worker_max_rss: Optional[PositiveInt] = Field(
+        None,
+        description="Memory in MB a worker process may hold after finishing a window before it gets replaced. "
+        "Defaults to the memory available per worker.",
+    )
+    worker_timeout: Optional[PositiveInt] = Field(
+        3600,
+        description="Seconds a worker process may spend on a single window before it gets terminated.",
+    )
+    writer_queue_size: PositiveInt = Field(
+        2,
+        description="Number of finished windows which can queue up for the output file writer.",
+    )
+    prefetch_depth: NonNegativeInt = Field(
+        1,
+        description="Number of windows a worker reads ahead while transforming the current window. "
+        "Limited by the memory left over per worker. Set to 0 to disable.",
+    )
+    warp_threads: Optional[PositiveInt] = Field(
+        None,
+        description="Number of threads GDAL uses to warp a window. "
+        "Defaults to the cores left over per worker process.",
+    )
+    warp_error_threshold: confloat(ge=0) = Field(  # type: ignore
+        0.125,
+        description="Maximum error in input pixels when approximating the warp transformation. "
+        "Use 0 for an exact transformation.",
+    )
+    compression_threads: Optional[PositiveInt] = Field(
+        None,
+        description="Number of threads GDAL uses to compress output files. "
+        "Defaults to the cores left over per tile.",
+    )
 
     ########################
     # PostgreSQL authentication
@@ -71,6 +137,28 @@ class Globals(EnvSettings):
     db_name: Optional[str] = Field(
         None, env="PGDATABASE", description="PostgreSQL database name"
     )
+    db_pool_size: PositiveInt = Field(
+        2, description="Number of database connections each worker process keeps open"
+    )
+    vector_batch_size: PositiveInt = Field(
+        50000,
+        description="Number of features fetched from the database and written to file at once",
+    )
+    bulk_vector_intersects: bool = Field(
+        True,
+        description="Find tiles which intersect with vector sources using a single query "
+        "instead of one query per tile.",
+    )
+    partition_vector_source: bool = Field(
+        False,
+        description="Read vector sources in a single scan and split features into "
+        "local extracts per tile, instead of querying the database for every tile.",
+    )
+    vector_max_open_extracts: PositiveInt = Field(
+        256,
+        description="Maximum number of tile extracts kept open at once while partitioning "
+        "a vector source. Extracts closed in between continue in a new part file.",
+    )
 
     ######################
     # AWS configuration
@@ -177,9 +177,16 @@ class Raster(Source):
 
 
 class RasterSource(Raster):
-    def __init__(self, uri: str) -> None:
+    def __init__(
+        self, uri: str, metadata: Optional[Tuple[BoundingBox, Dict[str, Any]]] = None
+    ) -> None:
+        """Open file to fetch bounds and profile, unless already known."""
 
-        self.uri: str = uri
+        if metadata is None:
+            self.uri: str = uri
+        else:
+            self._uri = uri
+            self._bounds, self._profile = metadata
 
     @lazy_property
     def geom(self) -> Polygon:
@@ -236,7 +243,7 @@ class Destination(Raster):
     def bucket(self):
         return get_bucket()
 
-    @property
+    @lazy_property
     def geom(self) -> Polygon:
         left, bottom, right, top = self.reproject_bounds(CRS.from_epsg(4326))
         return Polygon(
@@ -1,43 +1,70 @@
 import os
-from concurrent.futures import ProcessPoolExecutor, as_completed
-from math import floor, sqrt
+from functools import partial
+from math import ceil, floor, sqrt
 from pathlib import Path
-from typing import Iterator, List, Optional, Tuple, Union
+from typing import Any, Iterator, List, Optional, Tuple, Union
 from urllib.parse import urlparse
 
 import numpy as np
 import rasterio
+import shapely
+from affine import Affine
+from numpy.ma import MaskedArray
 from rasterio.io import DatasetReader, DatasetWriter
 from rasterio.vrt import WarpedVRT
 from rasterio.warp import transform_bounds
 from rasterio.windows import Window, bounds, from_bounds, union
 
 from gfw_pixetl import get_module_logger
-from gfw_pixetl.decorators import SubprocessKilledError, lazy_property, processify
+from gfw_pixetl.decorators import SubprocessKilledError, lazy_property
 from gfw_pixetl.grids import Grid
 from gfw_pixetl.layers import RasterSrcLayer
 from gfw_pixetl.models.named_tuples import InputBandElement
-from gfw_pixetl.models.types import Bounds
+from gfw_pixetl.models.types import Bounds, NoData
 from gfw_pixetl.settings.gdal import GDAL_ENV
 from gfw_pixetl.settings.globals import GLOBALS
 from gfw_pixetl.sources import RasterSource
 from gfw_pixetl.tiles import Tile
+from gfw_pixetl.tiles.utils.buffers import BufferPool
+from gfw_pixetl.tiles.utils.calibration import (
+    calibration_key,
+    get_calibration,
+    measure_peak_memory,
+    needs_calibration,
+    set_calibration,
+    skip_calibration,
+)
 from gfw_pixetl.tiles.utils.named_tuples import Destination, Layer, Source
-from gfw_pixetl.tiles.utils.transform import transform
+from gfw_pixetl.tiles.utils.transform import read, transform
+from gfw_pixetl.tiles.utils.window_utils import (
+    WindowPrefetcher,
+    WindowWriter,
+    create_scratch_file,
+    open_scratch_file,
+    process_windows,
+    sentinel_nodata,
+    write_window_to_scratch_file,
+)
 from gfw_pixetl.utils import (
     available_memory_per_process_bytes,
     available_memory_per_process_mb,
     get_co_workers,
+    get_spare_threads,
     snapped_window,
 )
 from gfw_pixetl.utils.aws import download_s3
-from gfw_pixetl.utils.gdal import create_multiband_vrt, create_vrt, just_copy_geotiff
+from gfw_pixetl.utils.gdal import create_multiband_vrt, just_copy_geotiff
 from gfw_pixetl.utils.google import download_gcs
+from gfw_pixetl.utils.metadata import source_metadata
 from gfw_pixetl.utils.path import create_dir, from_vsi
-from gfw_pixetl.utils.utils import create_empty_file, fetch_metadata
+from gfw_pixetl.utils.utils import create_empty_file
+from gfw_pixetl.utils.worker_pool import WorkerPool
 
 LOGGER = get_module_logger(__name__)
 
+# Max misalignment in pixels for sources to be considered on the same grid
+ALIGNMENT_TOLERANCE = 0.001
+
 Windows = Tuple[Window, Window]
 
 
@@ -45,40 +72,51 @@ class RasterSrcTile(Tile):
     def __init__(self, tile_id: str, grid: Grid, layer: RasterSrcLayer) -> None:
         super().__init__(tile_id, grid, layer)
         self.layer: RasterSrcLayer = layer
+        # Blocks of intersecting window which have data, if probed
+        self.data_blocks: Optional[np.ndarray] = None
+        # Whether tile intersects with source extent, if already known
+        self.src_intersects: Optional[bool] = None
 
     @lazy_property
     def src(self) -> RasterSource:
+        return RasterSource(
+            create_multiband_vrt(self.input_files, vrt=self.tile_id + ".vrt")
+        )
+
+    @lazy_property
+    def input_files(self) -> List[List[InputBandElement]]:
+        """Input files per band which intersect with tile."""
         LOGGER.debug(f"Finding input files for tile {self.tile_id}")
 
         input_bands: List[List[InputBandElement]] = list()
-        for i, band in enumerate(self.layer.input_bands):
+        intersecting_files: List[
+            List[InputBandElement]
+        ] = self.layer.intersecting_input_files(self.dst[self.default_format].geom)
+        for i, (band, files) in enumerate(
+            zip(self.layer.input_bands, intersecting_files)
+        ):
             input_elements: List[InputBandElement] = list()
-            for f in band:
-                if self.dst[self.default_format].geom.intersects(
-                    f.geometry
-                ) and not self.dst[self.default_format].geom.touches(f.geometry):
-                    LOGGER.debug(
-                        f"Adding {f.uri} to input files for tile {self.tile_id}"
-                    )
+            for f in files:
+                LOGGER.debug(f"Adding {f.uri} to input files for tile {self.tile_id}")
 
-                    if self.layer.process_locally:
-                        uri = self._download_source_file(f.uri)
-                        input_file = InputBandElement(
-                            uri=uri, geometry=f.geometry, band=f.band
-                        )
-                    else:
-                        input_file = InputBandElement(
-                            uri=f.uri, geometry=f.geometry, band=f.band
-                        )
+                if self.layer.process_locally:
+                    uri = self._download_source_file(f.uri)
+                    input_file = InputBandElement(
+                        uri=uri, geometry=f.geometry, band=f.band
+                    )
+                else:
+                    input_file = InputBandElement(
+                        uri=f.uri, geometry=f.geometry, band=f.band
+                    )
 
-                    input_elements.append(input_file)
+                input_elements.append(input_file)
             if band and not input_elements:
                 LOGGER.debug(
                     f"No input files found for tile {self.tile_id} "
                     f"in band {i}, padding VRT with empty file"
                 )
                 # But we need to know the profile of the tile's siblings in this band.
-                _, profile = fetch_metadata(band[0].uri)
+                _, profile = source_metadata(band[0].uri)
                 empty_file_uri = create_empty_file(self.work_dir, profile)
                 empty_file_element = InputBandElement(
                     geometry=None, band=band[0].band, uri=empty_file_uri
@@ -91,9 +129,7 @@ class RasterSrcTile(Tile):
                 f"Did not find any intersecting files for tile {self.tile_id}"
             )
 
-        return RasterSource(
-            create_multiband_vrt(input_bands, vrt=self.tile_id + ".vrt")
-        )
+        return input_bands
 
     def _download_source_file(self, remote_file: str) -> str:
         """Download remote files."""
@@ -165,7 +201,18 @@ class RasterSrcTile(Tile):
         LOGGER.debug(f"Transform tile {self.tile_id}")
 
         try:
-            has_data: bool = self._process_windows()
+            copy_uri: Optional[str] = self._copy_src_uri()
+            if copy_uri is not None:
+                has_data: bool = self._copy_src(copy_uri)
+            else:
+                if GLOBALS.probe_tiles:
+                    self.data_blocks = self._probe()
+
+                if self.data_blocks is not None and not self.data_blocks.any():
+                    LOGGER.debug(f"Probe of tile {self.tile_id} found no data")
+                    has_data = False
+                else:
+                    has_data = self._process_windows()
 
             # creating gdal-geotiff and computing stats here
             # instead of in a separate stage to assure we don't run out of memory
@@ -185,7 +232,170 @@ class RasterSrcTile(Tile):
 
         return has_data
 
-    def _src_to_vrt(self) -> Tuple[DatasetReader, WarpedVRT]:
+    def is_aligned(self) -> bool:
+        """Check if source is on the same grid as the destination.
+
+        This is the case if both share the same CRS, the same resolution
+        and pixels are aligned.
+        """
+        src_transform: Affine = self.src.transform
+        dst_transform: Affine = self.dst[self.default_format].transform
+
+        if self.src.crs != self.dst[self.default_format].crs:
+            return False
+        if not (src_transform.is_rectilinear and dst_transform.is_rectilinear):
+            return False
+
+        # Differences in resolution must not add up to a shift across the tile
+        pixels: float = max(
+            self.dst[self.default_format].width, self.dst[self.default_format].height
+        )
+        for src_res, dst_res in [
+            (src_transform.a, dst_transform.a),
+            (src_transform.e, dst_transform.e),
+        ]:
+            if abs(src_res - dst_res) / abs(dst_res) * pixels > ALIGNMENT_TOLERANCE:
+                return False
+
+        col_off: float = (src_transform.c - dst_transform.c) / dst_transform.a
+        row_off: float = (src_transform.f - dst_transform.f) / dst_transform.e
+        return (
+            abs(col_off - round(col_off)) < ALIGNMENT_TOLERANCE
+            and abs(row_off - round(row_off)) < ALIGNMENT_TOLERANCE
+        )
+
+    def _copy_src_uri(self) -> Optional[str]:
+        """Return URI of input file if it can be copied as is into the output
+        tile.
+
+        This is the case if there is a single input file which is on the
+        same grid, has the same extent, data type and no data value as
+        the output tile and if no calc needs to be applied.
+        """
+        if self.layer.calc is not None or not self.is_aligned():
+            return None
+
+        if len(self.input_files) != 1 or len(self.input_files[0]) != 1:
+            return None
+
+        input_file: InputBandElement = self.input_files[0][0]
+        if input_file.geometry is None or input_file.band != 1:
+            return None
+
+        dst = self.dst[self.default_format]
+        _, profile = source_metadata(input_file.uri)
+        if (
+            profile["count"] != 1
+            or dst.profile["count"] != 1
+            or profile["width"] != dst.width
+            or profile["height"] != dst.height
+            or np.dtype(profile["dtype"]) != np.dtype(dst.dtype)
+            or not _same_nodata(profile.get("nodata"), dst.nodata)
+            or not profile["transform"].almost_equals(
+                dst.transform, precision=abs(dst.transform.a) * ALIGNMENT_TOLERANCE
+            )
+        ):
+            return None
+
+        return input_file.uri
+
+    def _copy_src(self, uri: str) -> bool:
+        """Copy input file into output tile without reading it window by
+        window.
+
+        Returns False if the copy has no valid pixels.
+        """
+        LOGGER.info(f"Copy input file {uri} as is into tile {self.tile_id}")
+        local_uri: str = self.get_local_dst_uri(self.default_format)
+        just_copy_geotiff(
+            uri,
+            local_uri,
+            self.get_write_profile(self.default_format),
+        )
+        self.set_local_dst(self.default_format)
+
+        if not _has_valid_pixels(local_uri):
+            LOGGER.debug(f"Input file {uri} of tile {self.tile_id} has no data")
+            return False
+
+        return True
+
+    def _probe(self) -> Optional[np.ndarray]:
+        """Find blocks of the intersecting window which have data.
+
+        Reads the dataset mask of the source at full resolution, one row
+        of blocks at a time. Overviews are not used, as their resampling
+        method is unknown and nearest neighbour overviews miss sparse
+        pixels. This costs a full read of the source, which is why
+        probing is off by default. Returns None if source bands have no
+        no data value to probe for.
+        """
+        window: Window = self.intersecting_window
+        blockxsize: int = self.dst[self.default_format].blockxsize
+        blockysize: int = self.dst[self.default_format].blockysize
+        dst_transform: Affine = self.dst[self.default_format].transform
+        rows: int = ceil(window.height / blockysize)
+        cols: int = ceil(window.width / blockxsize)
+        LOGGER.debug(f"Probe tile {self.tile_id} at shape {(rows, cols)}")
+
+        has_data: np.ndarray = np.zeros((rows, cols), dtype=bool)
+        src, vrt = self._src_to_vrt()
+        try:
+            if any(nodata is None for nodata in vrt.nodatavals):
+                return None
+
+            with rasterio.Env(**GDAL_ENV):
+                for row in range(rows):
+                    row_off: int = int(window.row_off) + row * blockysize
+                    height: int = min(
+                        blockysize, int(window.row_off + window.height) - row_off
+                    )
+                    strip = Window(window.col_off, row_off, window.width, height)
+                    mask: np.ndarray = vrt.dataset_mask(
+                        window=vrt.window(*bounds(strip, dst_transform)),
+                        out_shape=(height, int(window.width)),
+                    )
+                    has_data[row] = np.logical_or.reduceat(
+                        mask.any(axis=0), np.arange(0, int(window.width), blockxsize)
+                    )
+        finally:
+            vrt.close()
+            src.close()
+
+        return has_data
+
+    def _window_has_data(self, window: Window) -> bool:
+        """Check if window covers any block which has data according to
+        probe."""
+        if self.data_blocks is None:
+            return True
+
+        intersecting_window: Window = self.intersecting_window
+        cell_height: int = self.dst[self.default_format].blockysize
+        cell_width: int = self.dst[self.default_format].blockxsize
+
+        row_start = floor((window.row_off - intersecting_window.row_off) / cell_height)
+        row_stop = ceil(
+            (window.row_off + window.height - intersecting_window.row_off) / cell_height
+        )
+        col_start = floor((window.col_off - intersecting_window.col_off) / cell_width)
+        col_stop = ceil(
+            (window.col_off + window.width - intersecting_window.col_off) / cell_width
+        )
+
+        return bool(
+            self.data_blocks[
+                max(0, row_start) : row_stop, max(0, col_start) : col_stop
+            ].any()
+        )
+
+    def _src_to_vrt(self) -> Tuple[DatasetReader, Union[DatasetReader, WarpedVRT]]:
+        """Open source and wrap it in a WarpedVRT to reproject and resample it
+        to the destination grid.
+
+        Sources which are already aligned with the destination grid are
+        read directly.
+        """
         chunk_size = (self._block_byte_size() * self._max_blocks(),)
         with rasterio.Env(
             **GDAL_ENV,
@@ -194,6 +404,12 @@ class RasterSrcTile(Tile):
         ):
             src: DatasetReader = rasterio.open(self.src.uri)
 
+            if self.is_aligned():
+                LOGGER.debug(
+                    f"Source of tile {self.tile_id} is aligned with grid, skip warping"
+                )
+                return src, src
+
             transform, width, height = self._vrt_transform(
                 *self.src.reproject_bounds(self.grid.crs)
             )
@@ -205,10 +421,29 @@ class RasterSrcTile(Tile):
                 height=height,
                 warp_mem_limit=available_memory_per_process_mb(),
                 resampling=self.layer.resampling,
+                tolerance=self._warp_error_threshold(),
+                num_threads=self._warp_threads(),
             )
 
         return src, vrt
 
+    def _warp_threads(self) -> int:
+        """Number of threads each worker process warps with.
+
+        Unless set, use the cores left over once all tiles and their co-
+        workers got a core.
+        """
+        return (
+            self.layer.warp_threads
+            or GLOBALS.warp_threads
+            or get_spare_threads(get_co_workers())
+        )
+
+    def _warp_error_threshold(self) -> float:
+        if self.layer.warp_error_threshold is not None:
+            return self.layer.warp_error_threshold
+        return GLOBALS.warp_error_threshold
+
     def _process_windows(self) -> bool:
         # In case we have more workers than cores we can further subdivide the read process.
         # In that case we will need to write the windows into separate files
@@ -225,91 +460,139 @@ class RasterSrcTile(Tile):
         return has_data
 
     def _process_windows_parallel(self, co_workers) -> bool:
-        """Process windows in parallel and write output into separate files.
+        """Process windows in parallel and write output into an uncompressed
+        scratch file.
 
-        Create VRT of output files and copy results into final GTIFF
+        Copy windows with data into final GTIFF, so that every pixel
+        only gets compressed once.
         """
         LOGGER.info(f"Processing tile {self.tile_id} with {co_workers} co_workers")
 
-        has_data = False
-        out_files: List[str] = list()
-
-        with ProcessPoolExecutor(max_workers=co_workers) as executor:
-            future_to_window = {
-                executor.submit(self._parallel_transform, window): window
-                for window in self.windows()
-            }
-            for future in as_completed(future_to_window):
-                out_file = future.result()
-                if out_file is not None:
-                    out_files.append(out_file)
-
-        if out_files:
-            # merge all data into one VRT and copy to target file
-            vrt_name: str = os.path.join(self.tmp_dir, f"{self.tile_id}.vrt")
-            create_vrt(out_files, extent=self.bounds, vrt=vrt_name)
-            just_copy_geotiff(
-                vrt_name,
+        windows = self.windows()
+        profile = self.dst[self.default_format].profile
+        scratch_uri = os.path.join(self.tmp_dir, f"{self.tile_id}.raw")
+        create_scratch_file(scratch_uri, profile)
+
+        data_windows: List[Window] = list()
+        with self._worker_pool(co_workers, scratch_uri=scratch_uri) as pool:
+            for window, has_data in self._transform_windows(pool, windows):
+                if has_data:
+                    data_windows.append(window)
+
+        if data_windows:
+            scratch: np.memmap = open_scratch_file(scratch_uri, profile, "r")
+            with WindowWriter(
                 self.local_dst[self.default_format].uri,
-                self.dst[self.default_format].profile,
-            )
-            # Clean up tmp files
-            for f in out_files:
-                LOGGER.debug(f"Delete temporary file {f}")
-                os.remove(f)
-            has_data = True
+                self.get_write_profile(self.default_format),
+                self.tile_id,
+            ) as writer:
+                for window in sorted(
+                    data_windows, key=lambda w: (w.row_off, w.col_off)
+                ):
+                    rows, cols = window.toslices()
+                    writer.write(np.array(scratch[:, rows, cols]), window)
+            del scratch
 
-        return has_data
+        LOGGER.debug(f"Delete scratch file {scratch_uri}")
+        os.remove(scratch_uri)
 
-    def _process_windows_sequential(self) -> bool:
-        """Read one window after another and update target file."""
-        LOGGER.info(f"Processing tile {self.tile_id} with a single worker")
+        return bool(data_windows)
 
-        src: DatasetReader
-        vrt: WarpedVRT
+    def _process_windows_sequential(self) -> bool:
+        """Read one window after another and update target file.
 
-        src, vrt = self._src_to_vrt()
-        out_files = list()
-        try:
-            for window in self.windows():
-                out_files.append(self._processified_transform(vrt, window))
-        finally:
-            vrt.close()
-            src.close()
+        Windows are computed in a worker process while a writer thread
+        holds the target file open and writes finished windows. The
+        worker reads the following windows ahead while computing the
+        current one.
+        """
+        LOGGER.info(f"Processing tile {self.tile_id} with a single worker")
 
-        has_data = any(value is not None for value in out_files)
+        has_data = False
+        windows = self.windows()
+        with WindowWriter(
+            self.local_dst[self.default_format].uri,
+            self.get_write_profile(self.default_format),
+            self.tile_id,
+        ) as writer:
+            with self._worker_pool(
+                1, prefetch=windows, prefetch_depth=self._prefetch_depth(windows)
+            ) as pool:
+                for window, array in self._transform_windows(pool, windows):
+                    if array is not None:
+                        writer.write(array, window)
+                        has_data = True
+                    del array
 
         return has_data
 
-    def _parallel_transform(self, window) -> Optional[str]:
-        """When transforming in parallel, we need to read SRC and create VRT in
-        every process."""
-        src: DatasetReader
-        vrt: WarpedVRT
-
-        src, vrt = self._src_to_vrt()
+    def _transform_windows(
+        self, pool: WorkerPool, windows: List[Window]
+    ) -> Iterator[Tuple[Window, Any]]:
+        """Submit windows to worker pool and yield results as they
+        complete."""
+        return process_windows(
+            pool,
+            windows,
+            self.dst[self.default_format].blockxsize,
+            self.dst[self.default_format].blockysize,
+            self.tile_id,
+        )
 
-        try:
-            out_file: Optional[str] = self._processified_transform(vrt, window, True)
-        finally:
-            vrt.close()
-            src.close()
+    def _worker_pool(
+        self,
+        co_workers: int,
+        scratch_uri: Optional[str] = None,
+        prefetch: Optional[List[Window]] = None,
+        prefetch_depth: int = 0,
+    ) -> WorkerPool:
+        """Create pool of long-lived worker processes to transform windows.
+
+        Workers open the source VRT once and get recycled after a number
+        of windows or once they hold too much memory. This makes sure
+        memory gets cleared regularly. Without this, we might experience
+        memory leakage, in particular for float data types.
+
+        If windows to prefetch are given, workers read up to
+        `prefetch_depth` windows ahead, expecting to receive windows in
+        that order.
+        """
+        max_rss = (
+            GLOBALS.worker_max_rss or available_memory_per_process_mb() / co_workers
+        )
 
-        return out_file
+        return WorkerPool(
+            partial(self._transform_window, scratch_uri=scratch_uri),
+            processes=co_workers,
+            initializer=partial(
+                self._open_worker_vrt, prefetch=prefetch, prefetch_depth=prefetch_depth
+            ),
+            max_rss=max_rss,
+        )
 
-    @processify
-    def _processified_transform(
-        self, vrt: WarpedVRT, window: Window, write_to_seperate_files=False
-    ) -> Optional[str]:
-        """Wrapper to run _transform in a separate process.
+    def _open_worker_vrt(
+        self, prefetch: Optional[List[Window]] = None, prefetch_depth: int = 0
+    ) -> None:
+        """Open source and VRT once per worker process."""
+        self._worker_src, self._worker_vrt = self._src_to_vrt()
+        self._worker_nodata = sentinel_nodata(self._worker_vrt)
+        self._worker_buffers = BufferPool()
+        self._worker_prefetcher: Optional[WindowPrefetcher] = (
+            WindowPrefetcher(self._read_window, prefetch, prefetch_depth)
+            if prefetch and prefetch_depth
+            else None
+        )
 
-        This will make sure that memory gets completely cleared once a
-        window is processed. Without this, we might experience memory
-        leakage, in particular for float data types.
-        """
+    def _worker_context(self) -> Tuple[Layer, Source, Destination]:
+        """Layer, source and destination of the current worker process."""
         layer = Layer(input_bands=self.layer.input_bands, calc_string=self.layer.calc)
 
-        source = Source(vrt=vrt, crs=self.src.crs)
+        source = Source(
+            vrt=self._worker_vrt,
+            crs=self.src.crs,
+            aligned=self._worker_vrt is self._worker_src,
+            nodata=self._worker_nodata,
+        )
 
         destination = Destination(
             transform=self.dst[self.default_format].transform,
@@ -317,17 +600,68 @@ class RasterSrcTile(Tile):
             count=self.dst[self.default_format].profile["count"],
             no_data=self.dst[self.default_format].nodata,
             datatype=self.dst[self.default_format].dtype,
-            profile=self.dst[self.default_format].profile,
-            tmp_dir=self.tmp_dir,
-            uri=self.local_dst[self.default_format].uri,
-            write_to_separate_files=write_to_seperate_files,
         )
 
-        return transform(self.tile_id, window, layer, source, destination)
+        return layer, source, destination
+
+    def _read_window(
+        self, window: Window, buffer: str
+    ) -> Union[MaskedArray, np.ndarray]:
+        """Read window inside a worker process into given buffer."""
+        layer, source, destination = self._worker_context()
+        return read(
+            self.tile_id,
+            window,
+            layer,
+            source,
+            destination,
+            self._worker_buffers,
+            buffer,
+        )
+
+    def _transform_window(
+        self, window: Window, scratch_uri: Optional[str] = None
+    ) -> Union[np.ndarray, bool, None]:
+        """Transform a single window inside a worker process.
+
+        Returns the array for the writer of the shared output file. If a
+        scratch file is given, the array is written to the scratch file
+        instead and only the information whether the window has data is
+        returned.
+        """
+        layer, source, destination = self._worker_context()
+
+        src_array: Union[MaskedArray, np.ndarray, None] = (
+            self._worker_prefetcher.get(window) if self._worker_prefetcher else None
+        )
+        array: Optional[np.ndarray] = transform(
+            self.tile_id,
+            window,
+            layer,
+            source,
+            destination,
+            self._worker_buffers,
+            src_array,
+        )
+        del src_array
+        if array is None or scratch_uri is None:
+            return array
+
+        write_window_to_scratch_file(
+            scratch_uri,
+            self.dst[self.default_format].profile,
+            self.tile_id,
+            array,
+            window,
+        )
+        return True
 
     def windows(self) -> List[Window]:
         """Creates local output file and returns list of size optimized windows
         to process."""
+        if GLOBALS.calibrate_memory:
+            self._calibrate()
+
         LOGGER.debug(f"Create local output file for tile {self.tile_id}")
         with rasterio.Env(**GDAL_ENV):
             with rasterio.open(
@@ -335,11 +669,143 @@ class RasterSrcTile(Tile):
                 "w",
                 **self.dst[self.default_format].profile,
             ) as dst:
-                windows = [window for window in self._windows(dst)]
+                windows = self._plan_windows([window for window in self._windows(dst)])
         self.set_local_dst(self.default_format)
 
         return windows
 
+    def _plan_windows(self, windows: List[Window]) -> List[Window]:
+        """Drop windows which don't intersect with any input file footprint or
+        which have no data according to probe and order remaining windows by
+        the input file they first intersect with.
+
+        This way we don't read and warp windows of sparse sources which
+        are known to be empty, and windows follow source file layout.
+        """
+        footprints = np.array(
+            [
+                f.geometry
+                for band in self.input_files
+                for f in band
+                if f.geometry is not None
+            ]
+        )
+        if not len(footprints):
+            return [window for window in windows if self._window_has_data(window)]
+
+        dst_transform: Affine = self.dst[self.default_format].transform
+        dst_crs = self.dst[self.default_format].crs
+
+        planned: List[Tuple[int, Window]] = list()
+        for window in windows:
+            if not self._window_has_data(window):
+                LOGGER.debug(
+                    f"{window} of tile {self.tile_id} has no data according to probe - skip"
+                )
+                continue
+
+            left, bottom, right, top = transform_bounds(
+                dst_crs, "EPSG:4326", *bounds(window, dst_transform)
+            )
+            geom = shapely.box(left, bottom, right, top)
+            # must intersect, but we don't want geometries that only share an exterior point
+            hits = np.flatnonzero(
+                shapely.intersects(footprints, geom)
+                & ~shapely.touches(footprints, geom)
+            )
+            if len(hits):
+                planned.append((hits[0], window))
+            else:
+                LOGGER.debug(
+                    f"{window} of tile {self.tile_id} does not intersect with any input file - skip"
+                )
+
+        LOGGER.debug(
+            f"Planned {len(planned)} of {len(windows)} windows for tile {self.tile_id}"
+        )
+        planned.sort(key=lambda item: (item[0], item[1].row_off, item[1].col_off))
+
+        return [window for _, window in planned]
+
+    def _calibrate(self) -> None:
+        """Measure peak memory per pixel while transforming a sample window,
+        unless already known for this layer setup."""
+        key: str = self._calibration_key()
+        if not needs_calibration(key):
+            return
+
+        window: Window = self._sample_window()
+        LOGGER.info(f"Calibrate memory usage for tile {self.tile_id} using {window}")
+
+        with WorkerPool(
+            self._calibrate_window, initializer=self._open_worker_vrt, max_tasks=1
+        ) as pool:
+            future = pool.submit(window)
+            for _ in pool.as_completed():
+                pass
+
+        try:
+            has_data, peak_memory = future.result()
+        except SubprocessKilledError:
+            LOGGER.warning(
+                f"Calibration of tile {self.tile_id} was killed. Fall back to divisor."
+            )
+            skip_calibration(key)
+            return
+
+        if not has_data:
+            LOGGER.debug(
+                f"Sample window of tile {self.tile_id} has no data. Skip calibration."
+            )
+            skip_calibration(key)
+            return
+
+        bytes_per_pixel: float = peak_memory / (window.width * window.height)
+        LOGGER.info(
+            f"Measured peak memory of {bytes_per_pixel} B per pixel for tile {self.tile_id}"
+        )
+        set_calibration(key, bytes_per_pixel)
+
+    def _calibrate_window(self, window: Window) -> Tuple[bool, int]:
+        """Transform window inside a worker process and measure its peak
+        memory."""
+        array, peak_memory = measure_peak_memory(self._transform_window, window)
+        return array is not None, peak_memory
+
+    def _calibration_key(self) -> str:
+        return calibration_key(
+            self.src.dtype,
+            self.dst[self.default_format].dtype,
+            self.layer.band_count,
+            self.layer.calc,
+            self.layer.resampling,
+            abs(self.src.transform.a / self.dst[self.default_format].transform.a),
+            self.grid.name,
+        )
+
+    def _sample_window(self) -> Window:
+        """Block aligned window of default size in the center of the area
+        covered by the source."""
+        block_count: int = int(sqrt(self._max_blocks_from_divisor()))
+        blockxsize: int = self.dst[self.default_format].blockxsize
+        blockysize: int = self.dst[self.default_format].blockysize
+        width: int = block_count * blockxsize
+        height: int = block_count * blockysize
+
+        window: Window = self.intersecting_window
+        col_off: int = max(
+            0, floor((window.col_off + (window.width - width) / 2) / blockxsize)
+        )
+        row_off: int = max(
+            0, floor((window.row_off + (window.height - height) / 2) / blockysize)
+        )
+
+        return snapped_window(
+            Window(
+                col_off * blockxsize, row_off * blockysize, width, height
+            ).intersection(window)
+        )
+
     def _windows(self, dst: DatasetWriter) -> Iterator[Window]:
         """Divides raster source into larger windows which will still fit into
         memory."""
@@ -381,6 +847,80 @@ class RasterSrcTile(Tile):
         """Calculate the maximum amount of blocks we can fit into memory,
         making sure that blocks can always fill a squared extent.
 
+        Uses the measured peak memory per pixel for this layer setup if
+        known. Otherwise falls back to the divisor heuristic.
+        """
+        bytes_per_pixel: Optional[float] = (
+            get_calibration(self._calibration_key())
+            if GLOBALS.calibrate_memory
+            else None
+        )
+        if bytes_per_pixel is None:
+            return self._max_blocks_from_divisor()
+
+        block_pixels: int = (
+            self.dst[self.default_format].blockxsize
+            * self.dst[self.default_format].blockysize
+        )
+        # The window must at least be able to hold the raw data
+        block_byte_size: float = max(
+            bytes_per_pixel * block_pixels, self._block_byte_size()
+        )
+        memory_per_process: float = (
+            available_memory_per_process_bytes()
+            / get_co_workers()
+            * GLOBALS.calibration_memory_fraction
+        )
+
+        # make sure we get a number whose sqrt is a whole number
+        max_blocks: int = max(1, floor(sqrt(memory_per_process / block_byte_size)) ** 2)
+
+        LOGGER.debug(
+            f"Maximum number of blocks for tile {self.tile_id} to read at once: {max_blocks}, "
+            f"based on measured peak memory of {bytes_per_pixel} B per pixel."
+        )
+
+        return max_blocks
+
+    def _prefetch_depth(self, windows: List[Window]) -> int:
+        """Number of windows a worker may read ahead.
+
+        Every window read ahead holds the raw source data of a window
+        on top of the memory needed to transform the current one. Uses
+        the measured peak memory per pixel for this layer setup if known.
+        Otherwise only allows for as many raw windows as the divisor
+        heuristic leaves room for.
+        """
+        if not GLOBALS.prefetch_depth or len(windows) < 2:
+            return 0
+
+        max_pixels: float = max(window.width * window.height for window in windows)
+        window_byte_size: float = (
+            max_pixels * len(self.layer.input_bands) * np.dtype(self.src.dtype).itemsize
+        )
+        memory_per_process: float = available_memory_per_process_bytes()
+
+        bytes_per_pixel: Optional[float] = (
+            get_calibration(self._calibration_key())
+            if GLOBALS.calibrate_memory
+            else None
+        )
+        if bytes_per_pixel is None:
+            spare_memory: float = memory_per_process / GLOBALS.divisor
+        else:
+            spare_memory = memory_per_process - bytes_per_pixel * max_pixels
+
+        depth: int = max(
+            0, min(GLOBALS.prefetch_depth, floor(spare_memory / window_byte_size))
+        )
+        LOGGER.debug(f"Read {depth} windows ahead for tile {self.tile_id}")
+
+        return depth
+
+    def _max_blocks_from_divisor(self) -> int:
+        """Estimate the maximum amount of blocks we can fit into memory using
+        the divisor.
+
         We can only use a fraction of the available memory per process
         per block b/c we might have multiple copies of the array at the
         same time. Using a divisor of 8 leads to max memory usage of
@@ -414,10 +954,17 @@ class RasterSrcTile(Tile):
             divisor *= co_workers
             LOGGER.debug("Divisor multiplied for multiple workers")
 
-        # further reduce block size in case we need to perform additional computations
+        # further reduce block size in case we need to perform additional computations.
+        # Calcs on float data are evaluated at a fixed working precision (see calc_dtype),
+        # so we only need room for one additional copy of the array.
+        # NumPy may still promote integer data while evaluating a calc.
         if self.layer.calc is not None:
-            divisor **= 2
-            LOGGER.debug("Divisor squared for calc operations")
+            if np.issubdtype(self.src.dtype, np.floating):
+                divisor *= 2
+                LOGGER.debug("Divisor doubled for calc operations")
+            else:
+                divisor **= 2
+                LOGGER.debug("Divisor squared for calc operations")
 
         LOGGER.debug(f"Divisor set to {divisor} for tile {self.tile_id}")
 
@@ -511,3 +1058,41 @@ class RasterSrcTile(Tile):
         os.link(path, new_path)
 
         return new_path
+
+
+def _same_nodata(
+    a: Optional[Union[NoData, List[NoData]]], b: Optional[Union[NoData, List[NoData]]]
+) -> bool:
+    """Compare no data values, treating NaN as equal to NaN.
+
+    Lists hold one value per band. A single value applies to all bands.
+    """
+    a_values: List[Optional[NoData]] = list(a) if isinstance(a, list) else [a]
+    b_values: List[Optional[NoData]] = list(b) if isinstance(b, list) else [b]
+    if len(a_values) == 1:
+        a_values = a_values * len(b_values)
+    if len(b_values) == 1:
+        b_values = b_values * len(a_values)
+    if len(a_values) != len(b_values):
+        return False
+
+    for a_value, b_value in zip(a_values, b_values):
+        if a_value is None or b_value is None:
+            if a_value is not b_value:
+                return False
+        elif a_value != b_value and not (np.isnan(a_value) and np.isnan(b_value)):
+            return False
+    return True
+
+
+def _has_valid_pixels(uri: str) -> bool:
+    """Check block by block if any band of raster has a valid pixel.
+
+    Stops at the first block with data.
+    """
+    with rasterio.Env(**GDAL_ENV):
+        with rasterio.open(uri) as src:
+            for _, window in src.block_windows(1):
+                if src.dataset_mask(window=window).any():
+                    return True
+    return False
@@ -2,7 +2,7 @@ import copy
 import os
 import shutil
 from abc import ABC
-from typing import Dict
+from typing import Any, Dict
 
 import rasterio
 from rasterio.coords import BoundingBox
@@ -15,7 +15,7 @@ from gfw_pixetl.layers import Layer
 from gfw_pixetl.models.enums import DstFormat
 from gfw_pixetl.settings.globals import GLOBALS
 from gfw_pixetl.sources import Destination, RasterSource
-from gfw_pixetl.utils import get_bucket
+from gfw_pixetl.utils import get_bucket, get_spare_threads
 from gfw_pixetl.utils.aws import upload_s3
 from gfw_pixetl.utils.gdal import just_copy_geotiff
 from gfw_pixetl.utils.path import create_dir
@@ -122,6 +122,27 @@ class Tile(ABC):
 
         return uri
 
+    def get_write_profile(self, dst_format) -> Dict[str, Any]:
+        """Profile of destination format including options which only affect
+        how the file gets written."""
+        return {
+            **self.dst[dst_format].profile,
+            "num_threads": self.compression_threads(),
+        }
+
+    def compression_threads(self) -> int:
+        """Number of threads to compress output files with.
+
+        Unless set, use the cores left over per tile. Determined on
+        demand, since the number of workers is only known once the pipe
+        starts processing tiles.
+        """
+        return (
+            self.layer.compression_threads
+            or GLOBALS.compression_threads
+            or get_spare_threads()
+        )
+
     def create_gdal_geotiff(self) -> None:
         dst_format = DstFormat.gdal_geotiff
         if self.default_format != dst_format:
@@ -132,7 +153,7 @@ class Tile(ABC):
             just_copy_geotiff(
                 self.local_dst[self.default_format].uri,
                 self.get_local_dst_uri(dst_format),
-                self.dst[dst_format].profile,
+                self.get_write_profile(dst_format),
             )
             self.set_local_dst(dst_format)
         else:
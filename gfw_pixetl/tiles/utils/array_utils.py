@@ -1,10 +1,10 @@
-from typing import cast
+from typing import Optional, Sequence, Union, cast
 
 import numpy as np
 from numpy.ma import MaskedArray
 
 from gfw_pixetl import get_module_logger
-from gfw_pixetl.utils.utils import enumerate_bands
+from gfw_pixetl.utils.calc import calc_dtype, compile_calc, float_result_dtype
 
 LOGGER = get_module_logger(__name__)
 
@@ -15,30 +15,37 @@ def set_datatype(
     nodata_value,
     datatype: str,
     tile_id: str,
+    out: Optional[np.ndarray] = None,
 ) -> np.ndarray:
     """Update data type to desired output datatype Update nodata value to
     desired nodata value (current no data values will be updated and any values
-    which already has new no data value will stay as is)"""
+    which already has new no data value will stay as is)
+
+    If given, results are written into `out`.
+    """
+    if out is None:
+        out = np.empty(array.shape, dtype=datatype)
+    data: np.ndarray = np.ma.getdata(array)
+
     if nodata_value is None:
         LOGGER.debug(f"Set datatype for {dst_window} of tile {tile_id}")
-        array = array.data.astype(datatype)
-    elif isinstance(nodata_value, list):
-        LOGGER.debug(
-            f"Set datatype for entire array and no data value for each band for {dst_window} of tile {tile_id}"
-        )
-        # make mypy happy. not sure why the isinstance check above alone doesn't do it
-        nodata_list = cast(list, nodata_value)
-        array = np.array(
-            [np.ma.filled(array[i], nodata) for i, nodata in enumerate(nodata_list)]
-        ).astype(datatype)
-
+        np.copyto(out, data, casting="unsafe")
     else:
         LOGGER.debug(
             f"Set datatype and no data value for {dst_window} of tile {tile_id}"
         )
-        array = np.ma.filled(array, nodata_value).astype(datatype)
+        mask: np.ndarray = np.ma.getmaskarray(array)
+        if isinstance(nodata_value, list):
+            # make mypy happy. not sure why the isinstance check above alone doesn't do it
+            nodata_list = cast(list, nodata_value)
+        else:
+            nodata_list = [nodata_value] * len(out)
 
-    return array
+        for i, nodata in enumerate(nodata_list):
+            np.copyto(out[i], data[i], casting="unsafe", where=~mask[i])
+            np.copyto(out[i], nodata, casting="unsafe", where=mask[i])
+
+    return out
 
 
 def block_has_data(band_arrays: MaskedArray, tile_id) -> bool:
@@ -58,17 +65,112 @@ def block_has_data(band_arrays: MaskedArray, tile_id) -> bool:
     return band_arrays.shape[1] > 0 and band_arrays.shape[2] > 0 and size != 0
 
 
-def calc(array: MaskedArray, dst_window: str, calc, count, tile_id) -> MaskedArray:
-    """Apply user defined calculation on array."""
+def nodata_mask(
+    band: np.ndarray, nodata_value: Optional[float], out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Boolean array which is True where band equals no data value."""
+    if out is None:
+        out = np.empty(band.shape, dtype=bool)
+
+    if nodata_value is None:
+        out.fill(False)
+    elif np.isnan(nodata_value):
+        np.isnan(band, out=out)
+    else:
+        np.equal(band, nodata_value, out=out)
+    return out
+
+
+def sentinel_block_has_data(
+    array: np.ndarray,
+    nodata_values: Sequence[Optional[float]],
+    tile_id,
+    mask: Optional[np.ndarray] = None,
+) -> bool:
+    """Check if current block has any data, using the no data value of each
+    band instead of a mask.
+
+    If given, `mask` is used as scratch space for the no data mask of a
+    band.
+    """
+    if array.shape[1] == 0 or array.shape[2] == 0:
+        return False
+
+    for i, (band, nodata_value) in enumerate(zip(array, nodata_values)):
+        if not nodata_mask(band, nodata_value, mask).all():
+            LOGGER.debug(f"Block of tile {tile_id}, band {i+1} has data pixels")
+            return True
+    return False
+
+
+def sentinel_set_datatype(
+    array: np.ndarray,
+    src_nodata_values: Sequence[Optional[float]],
+    dst_window: str,
+    nodata_value,
+    datatype: str,
+    tile_id: str,
+    out: Optional[np.ndarray] = None,
+    mask: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Same as `set_datatype` for arrays which mark missing data with the no
+    data value of each band instead of a mask.
+
+    Data are cast straight into the output array, no data pixels are
+    then replaced with the desired no data value. If given, results are
+    written into `out` and `mask` is used as scratch space.
+    """
+    LOGGER.debug(f"Set datatype and no data value for {dst_window} of tile {tile_id}")
+    if out is None:
+        out = np.empty(array.shape, dtype=datatype)
+
+    for i, (band, src_nodata) in enumerate(zip(array, src_nodata_values)):
+        dst_nodata = nodata_value[i] if isinstance(nodata_value, list) else nodata_value
+        if dst_nodata is None or src_nodata is None:
+            np.copyto(out[i], band, casting="unsafe")
+        else:
+            band_mask = nodata_mask(band, src_nodata, mask)
+            np.copyto(out[i], dst_nodata, casting="unsafe", where=band_mask)
+            np.logical_not(band_mask, out=band_mask)
+            np.copyto(out[i], band, casting="unsafe", where=band_mask)
+
+    return out
+
+
+def calc(
+    array: MaskedArray, dst_window: str, calc, count, tile_id, datatype=None
+) -> MaskedArray:
+    """Apply user defined calculation on array.
+
+    If a destination datatype is given, input bands are cast to the
+    precision returned by `calc_dtype` before evaluation.
+    """
     if calc:
-        # Assign a variable name to each band
-        band_names = ", ".join(enumerate_bands(len(array)))
-        funcstr = f"def f({band_names}) -> MaskedArray:\n    return {calc}"
-        LOGGER.debug(
-            f"Apply function {funcstr} on block {dst_window} of tile {tile_id}"
-        )
-        exec(funcstr, globals())
-        array = f(*array)  # type: ignore # noqa: F821
+        f = compile_calc(calc, len(array))
+        LOGGER.debug(f"Apply function {calc} on block {dst_window} of tile {tile_id}")
+
+        bands: Union[np.ndarray, MaskedArray] = array
+        float_dtype: Optional[np.dtype] = None
+        if datatype is not None:
+            working_dtype = calc_dtype(array.dtype, datatype)
+            bands = array.astype(working_dtype, copy=False)
+            float_dtype = (
+                working_dtype
+                if np.issubdtype(working_dtype, np.floating)
+                else float_result_dtype(datatype)
+            )
+
+        array = f(*bands)
+        del bands
+
+        # Don't let float results drift beyond the working precision
+        if (
+            float_dtype is not None
+            and np.issubdtype(array.dtype, np.floating)
+            and array.dtype != float_dtype
+        ):
+            # astype keeps masked arrays masked
+            array = cast(MaskedArray, array.astype(float_dtype, copy=False))
 
         # assign band index
         if len(array.shape) == 2:
@@ -0,0 +1,36 @@
+from typing import Dict, Tuple
+
+import numpy as np
+
+from gfw_pixetl import get_module_logger
+
+LOGGER = get_module_logger(__name__)
+
+
+class BufferPool(object):
+    """Named, preallocated buffers which are handed out as arrays of the
+    requested shape and data type.
+
+    Buffers only grow if a requested array does not fit, so once sized
+    for the largest window, transforming further windows doesn't
+    allocate new arrays. Arrays handed out stay valid until the same
+    buffer is requested again.
+    """
+
+    def __init__(self) -> None:
+        self._buffers: Dict[str, np.ndarray] = dict()
+
+    def reserve(self, name: str, nbytes: int) -> None:
+        """Make sure buffer can hold at least nbytes."""
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.nbytes < nbytes:
+            LOGGER.debug(f"Allocate buffer {name} of {nbytes / 1000000} MB")
+            self._buffers[name] = np.empty(nbytes, dtype=np.uint8)
+
+    def get(self, name: str, shape: Tuple[int, ...], dtype) -> np.ndarray:
+        """Return C-contiguous array of given shape and data type backed by
+        buffer."""
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        self.reserve(name, nbytes)
+        return self._buffers[name][:nbytes].view(dtype).reshape(shape)
@@ -0,0 +1,149 @@
+import json
+import os
+from threading import Event, Thread
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+import numpy as np
+import psutil
+from rasterio.enums import Resampling
+
+from gfw_pixetl import get_module_logger
+from gfw_pixetl.settings.globals import GLOBALS
+
+LOGGER = get_module_logger(__name__)
+
+# Calibrations known to the current process, loaded from disk on first use
+_CALIBRATIONS: Dict[str, float] = dict()
+# Modification time of the calibration cache when it was last loaded
+_LOADED_MTIME: Optional[float] = None
+# Calibration keys the current process could not measure (ie sample
+# window had no data). Not persisted, so a later run can try again.
+_SKIPPED: Set[str] = set()
+
+
+def calibration_key(
+    src_dtype: Any,
+    dst_dtype: Any,
+    band_count: int,
+    calc: Optional[str],
+    resampling: Resampling,
+    resolution_ratio: float,
+    grid: str,
+) -> str:
+    """Key under which the memory calibration of a layer setup is stored.
+
+    The resolution ratio is the source pixel size divided by the
+    destination pixel size. It decides how many source pixels get read
+    and warped per destination pixel.
+    """
+    return "|".join(
+        [
+            np.dtype(src_dtype).name,
+            np.dtype(dst_dtype).name,
+            str(band_count),
+            str(calc),
+            resampling.name,
+            f"{resolution_ratio:.4g}",
+            grid,
+        ]
+    )
+
+
+def get_calibration(key: str) -> Optional[float]:
+    """Return measured peak bytes per pixel for calibration key, if
+    known.
+
+    The calibration cache is only read again if another process updated
+    it since it was last loaded.
+    """
+    global _LOADED_MTIME
+
+    if key not in _CALIBRATIONS:
+        mtime: Optional[float] = _cache_mtime()
+        if mtime != _LOADED_MTIME:
+            _CALIBRATIONS.update(_load_calibrations())
+            _LOADED_MTIME = mtime
+    return _CALIBRATIONS.get(key)
+
+
+def needs_calibration(key: str) -> bool:
+    """Whether memory usage for calibration key still needs to be
+    measured."""
+    return key not in _SKIPPED and get_calibration(key) is None
+
+
+def skip_calibration(key: str) -> None:
+    """Don't try to measure memory usage for calibration key again in the
+    current process."""
+    _SKIPPED.add(key)
+
+
+def set_calibration(key: str, bytes_per_pixel: float) -> None:
+    """Remember measured peak bytes per pixel and persist it for later
+    runs."""
+    _CALIBRATIONS[key] = bytes_per_pixel
+
+    if not GLOBALS.calibration_cache:
+        return
+
+    calibrations = _load_calibrations()
+    calibrations[key] = bytes_per_pixel
+
+    try:
+        os.makedirs(os.path.dirname(GLOBALS.calibration_cache), exist_ok=True)
+        tmp_file = f"{GLOBALS.calibration_cache}.{os.getpid()}"
+        with open(tmp_file, "w") as f:
+            json.dump(calibrations, f, indent=2)
+        # Replace in one go, other processes might read the file at the same time
+        os.replace(tmp_file, GLOBALS.calibration_cache)
+    except OSError as e:
+        LOGGER.warning(f"Could not persist memory calibration: {e}")
+
+
+def measure_peak_memory(
+    func: Callable[..., Any], *args, interval: float = 0.005
+) -> Tuple[Any, int]:
+    """Run function and sample resident memory of the current process in the
+    background.
+
+    Returns result of function and peak memory increase in bytes.
+    """
+    process = psutil.Process()
+    baseline: int = process.memory_info().rss
+    peak = [baseline]
+    done = Event()
+
+    def sample() -> None:
+        while not done.wait(interval):
+            peak[0] = max(peak[0], process.memory_info().rss)
+
+    sampler = Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        result = func(*args)
+        peak[0] = max(peak[0], process.memory_info().rss)
+    finally:
+        done.set()
+        sampler.join()
+
+    return result, peak[0] - baseline
+
+
+def _cache_mtime() -> Optional[float]:
+    if not GLOBALS.calibration_cache:
+        return None
+    try:
+        return os.stat(GLOBALS.calibration_cache).st_mtime
+    except OSError:
+        return None
+
+
+def _load_calibrations() -> Dict[str, float]:
+    if not GLOBALS.calibration_cache or not os.path.isfile(GLOBALS.calibration_cache):
+        return dict()
+    try:
+        with open(GLOBALS.calibration_cache) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        LOGGER.warning(f"Could not read memory calibration: {e}")
+        return dict()
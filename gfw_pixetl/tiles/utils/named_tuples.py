@@ -1,5 +1,6 @@
-from typing import Any, NamedTuple, Optional
+from typing import Any, NamedTuple, Optional, Tuple, Union
 
+from rasterio.io import DatasetReader
 from rasterio.vrt import WarpedVRT
 
 
@@ -9,15 +10,14 @@ class Destination(NamedTuple):
     count: Any
     no_data: Any
     datatype: Any
-    profile: Any
-    tmp_dir: Any
-    uri: Any
-    write_to_separate_files: bool
 
 
 class Source(NamedTuple):
-    vrt: WarpedVRT
+    vrt: Union[WarpedVRT, DatasetReader]
     crs: Any
+    aligned: bool = False
+    # No data value of each band, if masks can be derived from them
+    nodata: Optional[Tuple[Optional[float], ...]] = None
 
 
 class Layer(NamedTuple):
@@ -0,0 +1,358 @@
+from typing import Iterator, Optional, Tuple, Union
+
+import numpy as np
+import pyarrow as pa
+import shapely
+from affine import Affine
+from rasterio.enums import MergeAlg
+from rasterio.features import rasterize
+from rasterio.windows import Window, bounds
+from rasterio.windows import transform as window_transform
+
+from gfw_pixetl import get_module_logger
+from gfw_pixetl.models.enums import RasterizeMethod
+from gfw_pixetl.settings.globals import GLOBALS
+
+LOGGER = get_module_logger(__name__)
+
+# Data types GDAL can burn features into with any version
+BURN_DTYPES = ("int16", "int32", "uint8", "uint16", "uint32", "float32", "float64")
+
+# Methods which combine the values of all features covering a pixel
+REDUCTIONS = (
+    RasterizeMethod.max,
+    RasterizeMethod.min,
+    RasterizeMethod.sum,
+    RasterizeMethod.mean,
+    RasterizeMethod.first,
+    RasterizeMethod.last,
+)
+
+
+class Features(object):
+    """WKB encoded geometries and burn values of a tile.
+
+    Only the bounding boxes of the geometries are decoded up front, batch
+    by batch, to look up the features of a window. Geometries get
+    decoded window by window, so that the decoded geometries of the
+    whole tile are never held at once. Encoded geometries stay in an
+    Arrow array, which forked workers share without copying.
+
+    Features without geometry are dropped. Features without value (None
+    or NaN) are burned as 0, like GDAL burns empty attributes, and are
+    left out of reductions. If an order ("asc" or "desc") is given,
+    features are burned in order of their values, like the database
+    would sort them.
+    """
+
+    def __init__(
+        self,
+        geometries: Union[np.ndarray, pa.ChunkedArray],
+        values: np.ndarray,
+        method: Optional[str] = None,
+        order: Optional[str] = None,
+    ) -> None:
+        self.method: str = method if method else RasterizeMethod.value
+        self.wkb: pa.ChunkedArray = (
+            geometries
+            if isinstance(geometries, pa.ChunkedArray)
+            else pa.chunked_array([pa.array(geometries, type=pa.binary())])
+        )
+
+        bounds: np.ndarray = _bounds(self.wkb)
+        # Bounds of missing and empty geometries are NaN
+        keep = ~np.isnan(bounds[:, 0])
+        if self.method in REDUCTIONS:
+            keep &= _has_value(values)
+
+        self.positions: np.ndarray = np.flatnonzero(keep)
+        self.bounds: np.ndarray = bounds[keep]
+        self.values: np.ndarray = values[keep]
+        if order is not None:
+            burn_order: np.ndarray = _value_order(self.values, order)
+            self.positions = self.positions[burn_order]
+            self.bounds = self.bounds[burn_order]
+            self.values = self.values[burn_order]
+        if not self.count:
+            self.values = np.where(_has_value(self.values), self.values, 0)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    @property
+    def count(self) -> bool:
+        return self.method == RasterizeMethod._count
+
+    def query(self, window_bounds) -> np.ndarray:
+        """Indices of features whose bounding boxes intersect with bounds,
+        in the order the features are burned in."""
+        left, bottom, right, top = window_bounds
+        return np.flatnonzero(
+            (self.bounds[:, 0] <= right)
+            & (self.bounds[:, 2] >= left)
+            & (self.bounds[:, 1] <= top)
+            & (self.bounds[:, 3] >= bottom)
+        )
+
+    def geometries(self, indices: np.ndarray) -> np.ndarray:
+        """Decode geometries of features."""
+        wkb: pa.ChunkedArray = self.wkb.take(pa.array(self.positions[indices]))
+        return shapely.from_wkb(wkb.to_numpy())
+
+
+def rasterize_window(
+    features: Features,
+    window: Window,
+    transform: Affine,
+    dtype,
+    nodata,
+) -> Optional[np.ndarray]:
+    """Burn features into window of a single band raster.
+
+    Later features overwrite earlier ones, unless features get counted
+    or reduced. Pixels without any feature are set to the no data value.
+    Returns None if no feature intersects with the window.
+    """
+    dtype = np.dtype(dtype)
+    indices = features.query(bounds(window, transform))
+    if not len(indices):
+        LOGGER.debug(f"{window} has no features - skip")
+        return None
+
+    fill = 0 if nodata is None else nodata
+    LOGGER.debug(f"Burn {len(indices)} features into {window}")
+    geometries: np.ndarray = features.geometries(indices)
+
+    if features.method in REDUCTIONS:
+        reduced: np.ndarray = _reduce_window(
+            features, indices, geometries, window, transform, fill
+        )
+        return reduced.astype(dtype).reshape((1,) + reduced.shape)
+
+    burn_dtype = dtype if dtype.name in BURN_DTYPES else np.dtype("float64")
+    values = (
+        np.ones(len(indices), dtype=burn_dtype)
+        if features.count
+        else features.values[indices].astype(burn_dtype)
+    )
+
+    array: np.ndarray = rasterize(
+        zip(geometries, values),
+        out_shape=(int(window.height), int(window.width)),
+        transform=window_transform(window, transform),
+        # Counts must start at zero
+        fill=0 if features.count else fill,
+        dtype=burn_dtype,
+        merge_alg=MergeAlg.add if features.count else MergeAlg.replace,
+    )
+    if features.count and fill != 0:
+        array[array == 0] = fill
+
+    return array.astype(dtype, copy=False).reshape((1,) + array.shape)
+
+
+def _reduce_window(
+    features: Features,
+    indices: np.ndarray,
+    geometries: np.ndarray,
+    window: Window,
+    transform: Affine,
+    fill,
+) -> np.ndarray:
+    """Combine values of all features covering a pixel.
+
+    Features get counted per pixel first. Pixels covered by a single
+    feature take the value of that feature. Only features covering
+    pixels shared with other features get burned one by one, each
+    within its own bounding box, and reduced into the result with
+    NumPy. Overlap is decided by pixel footprint, so features which
+    don't intersect but fall into the same pixel get reduced as well.
+    """
+    shape = (int(window.height), int(window.width))
+    win_transform: Affine = window_transform(window, transform)
+    values: np.ndarray = features.values[indices].astype("float64")
+
+    # Number of features covering each pixel
+    counts: np.ndarray = rasterize(
+        zip(geometries, np.ones(len(geometries), dtype="int32")),
+        out_shape=shape,
+        transform=win_transform,
+        fill=0,
+        dtype="int32",
+        merge_alg=MergeAlg.add,
+    )
+    # Position of the feature covering each pixel, starting at one
+    positions: np.ndarray = rasterize(
+        zip(geometries, np.arange(1, len(geometries) + 1)),
+        out_shape=shape,
+        transform=win_transform,
+        fill=0,
+        dtype="int32",
+    )
+    hits: np.ndarray = (counts == 1).astype("int32")
+    result: np.ndarray = np.where(hits > 0, values[positions - 1], np.nan)
+
+    shared: np.ndarray = counts > 1
+    for i in range(len(geometries) if shared.any() else 0):
+        rows, cols = _bounding_slices(geometries[i].bounds, win_transform, shape)
+        if rows.start >= rows.stop or cols.start >= cols.stop:
+            continue
+        if not shared[rows, cols].any():
+            continue
+
+        mask: np.ndarray = rasterize(
+            [(geometries[i], 1)],
+            out_shape=(rows.stop - rows.start, cols.stop - cols.start),
+            transform=win_transform * Affine.translation(cols.start, rows.start),
+            fill=0,
+            dtype="uint8",
+        ).astype(bool)
+        mask &= shared[rows, cols]
+
+        current: np.ndarray = result[rows, cols]
+        result[rows, cols] = np.where(
+            mask,
+            _reduce(features.method, current, hits[rows, cols], values[i]),
+            current,
+        )
+        hits[rows, cols] += mask
+
+    if features.method == RasterizeMethod.mean:
+        result = np.divide(result, hits, out=result, where=hits > 0)
+
+    return np.where(hits > 0, result, fill)
+
+
+def _reduce(method: str, current: np.ndarray, hits: np.ndarray, value: float):
+    """Combine current values of pixels with value of the next feature."""
+    if method == RasterizeMethod.max:
+        return np.fmax(current, value)
+    if method == RasterizeMethod.min:
+        return np.fmin(current, value)
+    if method in (RasterizeMethod.sum, RasterizeMethod.mean):
+        return np.where(hits > 0, current + value, value)
+    if method == RasterizeMethod.first:
+        return np.where(hits > 0, current, value)
+    return value
+
+
+def _bounding_slices(geometry_bounds, transform: Affine, shape):
+    """Rows and columns of pixels within bounding box, clipped to window.
+
+    The box is padded by one pixel, so geometries on pixel edges, like
+    points, still cover the pixels they get burned into.
+    """
+    left, bottom, right, top = geometry_bounds
+    col_start, row_start = ~transform * (left, top)
+    col_stop, row_stop = ~transform * (right, bottom)
+    rows = slice(
+        max(0, int(np.floor(row_start)) - 1),
+        min(shape[0], int(np.ceil(row_stop)) + 1),
+    )
+    cols = slice(
+        max(0, int(np.floor(col_start)) - 1),
+        min(shape[1], int(np.ceil(col_stop)) + 1),
+    )
+    return rows, cols
+
+
+def bin_points(
+    x: np.ndarray,
+    y: np.ndarray,
+    weights: Optional[np.ndarray],
+    transform: Affine,
+    width: int,
+    height: int,
+    window_size: int,
+    dtype,
+    nodata,
+) -> Iterator[Tuple[Window, np.ndarray]]:
+    """Count points per pixel, or sum up their weights if given.
+
+    Points get binned window by window, with windows of window_size x
+    window_size pixels. Points are grouped by window first, so every
+    point is only touched once. Windows without points are skipped.
+    Pixels without points are set to the no data value.
+    """
+    dtype = np.dtype(dtype)
+    fill = 0 if nodata is None else nodata
+
+    if weights is not None:
+        has_weight = ~np.isnan(weights)
+        x, y, weights = x[has_weight], y[has_weight], weights[has_weight]
+
+    cols, rows = ~transform * (x, y)
+    cols = np.floor(cols).astype("int64")
+    rows = np.floor(rows).astype("int64")
+    within = (cols >= 0) & (cols < width) & (rows >= 0) & (rows < height)
+    cols, rows = cols[within], rows[within]
+    if weights is not None:
+        weights = weights[within]
+
+    x_windows: int = -(-width // window_size)
+    window_ids = (rows // window_size) * x_windows + cols // window_size
+    order = np.argsort(window_ids, kind="stable")
+    ids, starts = np.unique(window_ids[order], return_index=True)
+    stops = np.append(starts[1:], len(order))
+
+    for window_id, start, stop in zip(ids, starts, stops):
+        points = order[start:stop]
+        col_off = int(window_id % x_windows) * window_size
+        row_off = int(window_id // x_windows) * window_size
+        window = Window(
+            col_off,
+            row_off,
+            min(window_size, width - col_off),
+            min(window_size, height - row_off),
+        )
+        shape = (int(window.height), int(window.width))
+        pixels = (rows[points] - row_off) * shape[1] + cols[points] - col_off
+
+        counts: np.ndarray = np.bincount(pixels, minlength=shape[0] * shape[1])
+        binned: np.ndarray = (
+            counts
+            if weights is None
+            else np.bincount(
+                pixels, weights=weights[points], minlength=shape[0] * shape[1]
+            )
+        )
+        array = np.where(counts > 0, binned, fill).astype(dtype).reshape(shape)
+
+        LOGGER.debug(f"Binned {len(points)} points into {window}")
+        yield window, array.reshape((1,) + shape)
+
+
+def _bounds(wkb: pa.ChunkedArray) -> np.ndarray:
+    """Bounding boxes of WKB encoded geometries, decoded batch by batch."""
+    bounds = [np.empty((0, 4))]
+    for start in range(0, len(wkb), GLOBALS.vector_batch_size):
+        batch: pa.ChunkedArray = wkb.slice(start, GLOBALS.vector_batch_size)
+        bounds.append(shapely.bounds(shapely.from_wkb(batch.to_numpy())))
+    return np.concatenate(bounds)
+
+
+def _value_order(values: np.ndarray, order: str) -> np.ndarray:
+    """Indices which sort values in ascending or descending order.
+
+    Like PostgreSQL, missing values go last in ascending and first in
+    descending order. Equal values keep their order.
+    """
+    key = np.array(
+        [np.nan if v is None else v for v in values]
+        if values.dtype == object
+        else values,
+        dtype="float64",
+    )
+    key[np.isnan(key)] = np.inf
+    if order == "desc":
+        key = -key
+    return np.argsort(key, kind="stable")
+
+
+def _has_value(values: np.ndarray) -> np.ndarray:
+    """Mask of values which are neither None nor NaN."""
+    if values.dtype == object:
+        return np.array([v is not None and v == v for v in values], dtype=bool)
+    if np.issubdtype(values.dtype, np.floating):
+        return ~np.isnan(values)
+    return np.ones(len(values), dtype=bool)
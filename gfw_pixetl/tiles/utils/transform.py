@@ -1,68 +1,174 @@
-from typing import Optional
+from typing import Optional, Union, cast
 
 import numpy as np
 from numpy.ma import MaskedArray
 from rasterio.windows import Window
 
 from gfw_pixetl import get_module_logger
-from gfw_pixetl.tiles.utils.array_utils import block_has_data, calc, set_datatype
+from gfw_pixetl.tiles.utils.array_utils import (
+    block_has_data,
+    calc,
+    sentinel_block_has_data,
+    sentinel_set_datatype,
+    set_datatype,
+)
+from gfw_pixetl.tiles.utils.buffers import BufferPool
 from gfw_pixetl.tiles.utils.named_tuples import Destination, Layer, Source
-from gfw_pixetl.tiles.utils.window_utils import read_window, write_window
+from gfw_pixetl.tiles.utils.window_utils import read_window, window_shape
 
 LOGGER = get_module_logger(__name__)
 
 
 def transform(
-    tile_id, window: Window, layer: Layer, source: Source, destination: Destination
-) -> Optional[str]:
-    """Read windows from input VRT, reproject, resample, transform and write to
-    destination."""
-    out_file: Optional[str] = None
+    tile_id,
+    window: Window,
+    layer: Layer,
+    source: Source,
+    destination: Destination,
+    buffers: Optional[BufferPool] = None,
+    array: Union[MaskedArray, np.ndarray, None] = None,
+) -> Optional[np.ndarray]:
+    """Read windows from input VRT, reproject, resample and transform.
 
-    def m_bytes(arr):
-        return arr.nbytes / 1000000
+    Returns None if window has no data. If a buffer pool is given, the
+    returned array is backed by the pool and only valid until the next
+    window is transformed with the same pool. If the window was already
+    read (see `read`), the array is transformed as is.
+    """
+    if buffers is None:
+        buffers = BufferPool()
 
-    masked_array: MaskedArray = read_window(
-        source.vrt,
-        window,
-        destination.transform,
-        source.crs,
-        destination.crs,
-        layer.input_bands,
-        tile_id,
+    if array is None:
+        array = read(tile_id, window, layer, source, destination, buffers)
+
+    if _is_sentinel(layer, source):
+        return _transform_sentinel(tile_id, window, source, destination, array, buffers)
+    return _transform_masked(
+        tile_id, window, layer, destination, cast(MaskedArray, array), buffers
     )
+
+
+def read(
+    tile_id,
+    window: Window,
+    layer: Layer,
+    source: Source,
+    destination: Destination,
+    buffers: BufferPool,
+    buffer: str = "src",
+) -> Union[MaskedArray, np.ndarray]:
+    """Read window from input VRT in the form `transform` expects.
+
+    Unmasked arrays are read into the named buffer of the pool.
+    """
+    if _is_sentinel(layer, source):
+        shape = window_shape(window, len(layer.input_bands))
+        array: Union[MaskedArray, np.ndarray] = read_window(
+            source.vrt,
+            window,
+            destination.transform,
+            source.crs,
+            destination.crs,
+            layer.input_bands,
+            tile_id,
+            source.aligned,
+            masked=False,
+            out=buffers.get(buffer, shape, source.vrt.dtypes[0]),
+        )
+    else:
+        array = read_window(
+            source.vrt,
+            window,
+            destination.transform,
+            source.crs,
+            destination.crs,
+            layer.input_bands,
+            tile_id,
+            source.aligned,
+        )
     LOGGER.debug(
-        f"Masked Array size for tile {tile_id} when read: {m_bytes(masked_array)} MB"
+        f"Array size for tile {tile_id} when read: {array.nbytes / 1000000} MB"
+    )
+    return array
+
+
+def _is_sentinel(layer: Layer, source: Source) -> bool:
+    """Without calc, we don't need masked arrays as long as the source marks
+    missing data with no data values."""
+    return layer.calc_string is None and source.nodata is not None
+
+
+def _transform_sentinel(
+    tile_id,
+    window: Window,
+    source: Source,
+    destination: Destination,
+    array: np.ndarray,
+    buffers: BufferPool,
+) -> Optional[np.ndarray]:
+    """Transform window using plain arrays and no data values."""
+    assert source.nodata is not None
+
+    mask: np.ndarray = buffers.get("mask", array.shape[1:], bool)
+    if not sentinel_block_has_data(array, source.nodata, tile_id, mask):
+        LOGGER.debug(f"{window} of tile {tile_id} has no data - skip")
+        return None
+
+    LOGGER.debug(f"{window} of tile {tile_id} has data - continue")
+
+    return sentinel_set_datatype(
+        array,
+        source.nodata,
+        window,
+        destination.no_data,
+        destination.datatype,
+        tile_id,
+        out=buffers.get("dst", array.shape, destination.datatype),
+        mask=mask,
     )
 
+
+def _transform_masked(
+    tile_id,
+    window: Window,
+    layer: Layer,
+    destination: Destination,
+    masked_array: MaskedArray,
+    buffers: BufferPool,
+) -> Optional[np.ndarray]:
+    """Transform window using masked arrays."""
+
+    def m_bytes(arr):
+        return arr.nbytes / 1000000
+
     if not block_has_data(masked_array, tile_id):
         LOGGER.debug(f"{window} of tile {tile_id} has no data - skip")
         del masked_array
-        return out_file
+        return None
 
     LOGGER.debug(f"{window} of tile {tile_id} has data - continue")
 
     masked_array = calc(
-        masked_array, window, layer.calc_string, destination.count, tile_id
+        masked_array,
+        window,
+        layer.calc_string,
+        destination.count,
+        tile_id,
+        destination.datatype,
     )
     LOGGER.debug(
         f"Masked Array size for tile {tile_id} after calc: {m_bytes(masked_array)} MB"
     )
     array: np.ndarray = set_datatype(
-        masked_array, window, destination.no_data, destination.datatype, tile_id
+        masked_array,
+        window,
+        destination.no_data,
+        destination.datatype,
+        tile_id,
+        out=buffers.get("dst", masked_array.shape, destination.datatype),
     )
     LOGGER.debug(
         f"Array size for tile {tile_id} after set dtype: {m_bytes(masked_array)} MB"
     )
     del masked_array
-    out_file = write_window(
-        tile_id,
-        destination.tmp_dir,
-        destination.uri,
-        destination.profile,
-        array,
-        window,
-        destination.write_to_separate_files,
-    )
-    del array
-    return out_file
+    return array
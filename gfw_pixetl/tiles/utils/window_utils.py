@@ -1,82 +1,381 @@
-import os
-from copy import deepcopy
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from math import ceil, floor
+from multiprocessing.connection import Connection
+from queue import Queue
+from threading import Thread
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple, Union
 
 import numpy as np
 import rasterio
 from numpy.ma import MaskedArray
+from rasterio.enums import MaskFlags
+from rasterio.io import DatasetReader
 from rasterio.vrt import WarpedVRT
 from rasterio.warp import transform_bounds
 from rasterio.windows import Window, bounds
 from retrying import retry
 
 from gfw_pixetl import get_module_logger
+from gfw_pixetl.decorators import SubprocessKilledError
 from gfw_pixetl.errors import retry_if_rasterio_io_error
 from gfw_pixetl.models.types import Bounds
 from gfw_pixetl.settings.gdal import GDAL_ENV
+from gfw_pixetl.settings.globals import GLOBALS
+from gfw_pixetl.utils import snapped_window
+from gfw_pixetl.utils.worker_pool import CONTEXT, WorkerPool
 
 LOGGER = get_module_logger(__name__)
 
 
-def _write_window_to_shared_file(
-    uri, profile, tile_id, array: np.ndarray, dst_window: Window
-) -> str:
-    """Write blocks into output raster."""
-    with rasterio.Env(**GDAL_ENV):
-        with rasterio.open(
-            uri,
-            "r+",
-            **profile,
-        ) as dst:
-            LOGGER.debug(f"Write {dst_window} of tile {tile_id}")
-            dst.write(array, window=dst_window)
-            del array
-    return uri
-
-
-def _write_window_to_separate_file(
-    tmp_dir, profile, tile_id, array: np.ndarray, dst_window: Window
-) -> str:
-    file_name = f"{tile_id}_{dst_window.col_off}_{dst_window.row_off}.tif"
-    file_path = os.path.join(tmp_dir, file_name)
-
-    profile = deepcopy(profile)
-    transform = rasterio.windows.transform(dst_window, profile["transform"])
-    profile.update(
-        width=dst_window.width, height=dst_window.height, transform=transform
-    )
+def _write_windows(
+    uri: str, profile: Dict[str, Any], tile_id: str, conn: Connection, queue_size: int
+) -> None:
+    """Write arrays received through the pipe into the output file.
 
-    with rasterio.Env(**GDAL_ENV):
-        with rasterio.open(
-            file_path,
-            "w",
-            **profile,
-        ) as dst:
-            LOGGER.debug(
-                f"Write {dst_window} of tile {tile_id} to separate file {file_path}"
-            )
-            dst.write(array)
-            del array
-    return file_path
+    A reader thread keeps accepting arrays while the previous one gets
+    written. The first error is sent back right away, a final None once
+    all arrays are written.
+    """
 
+    queue: Queue = Queue(maxsize=queue_size)
 
-def write_window(
-    tile_id,
-    temp_dir,
-    uri,
-    profile,
-    array: np.ndarray,
-    dst_window: Window,
-    write_to_separate_files: bool,
-) -> str:
-    if write_to_separate_files:
-        out_file: str = _write_window_to_separate_file(
-            temp_dir, profile, tile_id, array, dst_window
-        )
+    def receive() -> None:
+        while True:
+            try:
+                item = conn.recv()
+            except EOFError:
+                item = None
+            queue.put(item)
+            if item is None:
+                break
+
+    reader = Thread(target=receive, daemon=True)
+    reader.start()
+
+    try:
+        with rasterio.Env(**GDAL_ENV):
+            with rasterio.open(uri, "r+", **profile) as dst:
+                while True:
+                    item = queue.get()
+                    if item is None:
+                        break
+                    array, dst_window = item
+                    LOGGER.debug(f"Write {dst_window} of tile {tile_id}")
+                    dst.write(array, window=dst_window)
+                    del array, item
+    except Exception as e:
+        LOGGER.error(f"Failed to write to output file of tile {tile_id}")
+        try:
+            conn.send(e)
+        except Exception:
+            # Exception could not be pickled
+            conn.send(RuntimeError(str(e)))
+        # Keep consuming so that producers don't block on a full pipe
+        while queue.get() is not None:
+            pass
     else:
-        out_file = _write_window_to_shared_file(
-            uri, profile, tile_id, array, dst_window
+        conn.send(None)
+
+    reader.join()
+    conn.close()
+
+
+class WindowWriter(object):
+    """Write windows into a shared output file from a single process.
+
+    The output file stays open for the lifetime of the writer. Finished
+    arrays are handed over through a pipe and a bounded queue, so that
+    computing the next window overlaps with compressing and writing the
+    previous one. The writer runs in its own process and not in a thread
+    of the tile process, so that worker processes forked while it writes
+    never inherit locks held by GDAL.
+    """
+
+    def __init__(self, uri, profile, tile_id, queue_size: Optional[int] = None):
+        self.uri = uri
+        self.profile = profile
+        self.tile_id = tile_id
+        self._conn, child_conn = CONTEXT.Pipe()
+        self._process = CONTEXT.Process(
+            target=_write_windows,
+            args=(
+                uri,
+                profile,
+                tile_id,
+                child_conn,
+                queue_size if queue_size else GLOBALS.writer_queue_size,
+            ),
+            daemon=True,
         )
-    return out_file
+        self._child_conn = child_conn
+        self._error: Optional[Exception] = None
+        self._closed = False
+
+    def __enter__(self) -> "WindowWriter":
+        self._process.start()
+        self._child_conn.close()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        try:
+            self._conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        if not self._closed:
+            self._receive_status()
+        self._process.join()
+        self._conn.close()
+        if exc_type is None and self._error is not None:
+            raise self._error
+
+    def write(self, array: np.ndarray, dst_window: Window) -> None:
+        """Send array to the writer process.
+
+        Blocks while the writer is busy and its queue is full.
+        """
+        if not self._closed and self._conn.poll():
+            self._receive_status()
+        if self._error is not None:
+            raise self._error
+        self._conn.send((array, dst_window))
+
+    def _receive_status(self) -> None:
+        """Receive the error or final None sent by the writer process."""
+        try:
+            self._error = self._conn.recv()
+        except (EOFError, OSError):
+            self._process.join()
+            self._error = RuntimeError(
+                f"Writer process of tile {self.tile_id} exited with code {self._process.exitcode}"
+            )
+        self._closed = True
+
+
+class WindowPrefetcher(object):
+    """Read the next windows of a planned sequence on a background thread
+    while the current window gets transformed.
+
+    `read` receives the window and the name of the buffer to read into.
+    Every read gets its own buffer out of `depth` + 1, so that a window
+    which is still being transformed never gets overwritten. All reads
+    run on the same thread and never access the dataset concurrently.
+    Windows which are not part of the plan (ie split windows) are read
+    on the same thread, without reading ahead.
+    """
+
+    def __init__(
+        self,
+        read: Callable[[Window, str], Any],
+        windows: List[Window],
+        depth: int,
+    ) -> None:
+        self.read = read
+        self.depth = depth
+        self._windows = windows
+        self._index: Dict[Tuple, int] = {
+            window.flatten(): i for i, window in enumerate(windows)
+        }
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending: Deque[Tuple[Tuple, Future]] = deque()
+        self._reads = 0
+
+    def __enter__(self) -> "WindowPrefetcher":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def get(self, window: Window) -> Any:
+        """Return data of window and start reading the following windows."""
+        key = window.flatten()
+        future: Optional[Future] = None
+        while self._pending:
+            pending_key, pending_future = self._pending.popleft()
+            if pending_key == key:
+                future = pending_future
+                break
+            # Windows got processed out of order, drop what we read ahead
+            pending_future.cancel()
+
+        if future is None:
+            future = self._submit(window)
+
+        i: Optional[int] = self._index.get(key)
+        if i is not None:
+            pending_keys = [pending_key for pending_key, _ in self._pending]
+            for next_window in self._windows[i + 1 : i + 1 + self.depth]:
+                if next_window.flatten() not in pending_keys:
+                    self._pending.append(
+                        (next_window.flatten(), self._submit(next_window))
+                    )
+
+        return future.result()
+
+    def close(self) -> None:
+        for _, future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        self._executor.shutdown(wait=True)
+
+    def _submit(self, window: Window) -> Future:
+        buffer = f"src{self._reads % (self.depth + 1)}"
+        self._reads += 1
+        return self._executor.submit(self.read, window, buffer)
+
+
+def create_scratch_file(uri, profile) -> None:
+    """Create uncompressed raw file which can hold all pixels of the output
+    raster.
+
+    The file is sparse, only windows which get written take up disk
+    space.
+    """
+    size = (
+        profile["count"]
+        * profile["height"]
+        * profile["width"]
+        * np.dtype(profile["dtype"]).itemsize
+    )
+    with open(uri, "wb") as f:
+        f.truncate(size)
+
+
+def open_scratch_file(uri, profile, mode="r+") -> np.memmap:
+    """Memory map scratch file as array of output raster shape."""
+    return np.memmap(
+        uri,
+        dtype=profile["dtype"],
+        mode=mode,
+        shape=(profile["count"], profile["height"], profile["width"]),
+    )
+
+
+def write_window_to_scratch_file(
+    uri, profile, tile_id, array: np.ndarray, dst_window: Window
+) -> None:
+    """Write window into scratch file.
+
+    Workers write into distinct windows, so no locking is required.
+    """
+    scratch: np.memmap = open_scratch_file(uri, profile)
+    LOGGER.debug(f"Write {dst_window} of tile {tile_id} to scratch file {uri}")
+    rows, cols = dst_window.toslices()
+    scratch[:, rows, cols] = array
+    scratch.flush()
+    del scratch, array
+
+
+def split_window(window: Window, blockxsize: int, blockysize: int) -> List[Window]:
+    """Split window into up to four quadrants, aligned to blocks.
+
+    Returns the original window if it only covers a single block.
+    """
+    col_off, row_off, width, height = window.flatten()
+
+    def split(offset, length, block_size) -> List[Tuple[int, int]]:
+        # Block boundaries which lie within the window
+        first = floor(offset / block_size) + 1
+        last = ceil((offset + length) / block_size) - 1
+        if first > last:
+            return [(offset, length)]
+
+        middle = min(max(round((offset + length / 2) / block_size), first), last)
+        middle *= block_size
+        return [(offset, middle - offset), (middle, offset + length - middle)]
+
+    return [
+        Window(col, row, w, h)
+        for row, h in split(row_off, height, blockysize)
+        for col, w in split(col_off, width, blockxsize)
+    ]
+
+
+def block_windows(
+    width: int, height: int, blockxsize: int, blockysize: int, block_count: int
+) -> List[Window]:
+    """Divide raster into windows of up to block_count x block_count
+    blocks."""
+    x_blocks: int = ceil(width / blockxsize)
+    y_blocks: int = ceil(height / blockysize)
+
+    windows: List[Window] = list()
+    for i in range(0, x_blocks, block_count):
+        for j in range(0, y_blocks, block_count):
+            col_off: int = i * blockxsize
+            row_off: int = j * blockysize
+            windows.append(
+                Window(
+                    col_off,
+                    row_off,
+                    min(block_count * blockxsize, width - col_off),
+                    min(block_count * blockysize, height - row_off),
+                )
+            )
+    return windows
+
+
+def process_windows(
+    pool: WorkerPool,
+    windows: List[Window],
+    blockxsize: int,
+    blockysize: int,
+    tile_id: str,
+) -> Iterator[Tuple[Window, Any]]:
+    """Submit windows to worker pool and yield results as they complete.
+
+    If a worker gets killed while processing a window (ie b/c it ran
+    out of memory), the window is split into quadrants which are
+    retried. Only fails if a single block cannot be processed.
+    """
+    future_to_window: Dict[Future, Window] = {
+        pool.submit(window): window for window in windows
+    }
+    for future in pool.as_completed():
+        window = future_to_window.pop(future)
+        try:
+            result = future.result()
+        except SubprocessKilledError:
+            quadrants: List[Window] = split_window(window, blockxsize, blockysize)
+            if len(quadrants) == 1:
+                raise
+            LOGGER.warning(
+                f"Worker was killed while processing {window} of tile {tile_id}. "
+                f"Retry with {len(quadrants)} smaller windows."
+            )
+            for quadrant in quadrants:
+                future_to_window[pool.submit(quadrant)] = quadrant
+        else:
+            yield window, result
+
+
+def sentinel_nodata(
+    vrt: Union[WarpedVRT, DatasetReader]
+) -> Optional[Tuple[Optional[float], ...]]:
+    """No data value of each band, if masks of all bands derive from their
+    no data value.
+
+    Bands without mask yield None. Returns None if any band uses a
+    different kind of mask (ie alpha band).
+    """
+    nodata_values: List[Optional[float]] = list()
+    for flags, nodata in zip(vrt.mask_flag_enums, vrt.nodatavals):
+        if flags == [MaskFlags.all_valid]:
+            nodata_values.append(None)
+        elif MaskFlags.nodata in flags:
+            nodata_values.append(nodata)
+        else:
+            return None
+    return tuple(nodata_values)
+
+
+def window_shape(dst_window: Window, band_count: int) -> Tuple[int, int, int]:
+    """Shape of array holding all bands of window."""
+    return (
+        band_count,
+        int(round(dst_window.height)),
+        int(round(dst_window.width)),
+    )
 
 
 @retry(
@@ -86,17 +385,28 @@ def write_window(
     wait_exponential_max=300000,
 )  # Wait 2^x * 1000 ms between retries by to 300 sec, then 300 sec afterwards.
 def read_window(
-    vrt: WarpedVRT,
+    vrt: Union[WarpedVRT, DatasetReader],
     dst_window: Window,
     transform,
     source_crs,
     destination_crs,
     input_bands,
     tile_id,
-) -> MaskedArray:
-    """Read window of input raster."""
+    aligned: bool = False,
+    masked: bool = True,
+    out: Optional[np.ndarray] = None,
+) -> Union[MaskedArray, np.ndarray]:
+    """Read window of input raster.
+
+    If the input raster is aligned with the destination grid, the window
+    is snapped to whole pixels so that data are copied without
+    resampling. Unmasked arrays mark missing data with the no data value
+    of the input raster. If given, unmasked data are read into `out`.
+    """
     dst_bounds: Bounds = bounds(dst_window, transform)
     window = vrt.window(*dst_bounds)
+    if aligned:
+        window = snapped_window(window)
 
     src_bounds = transform_bounds(destination_crs, source_crs, *dst_bounds)
 
@@ -104,17 +414,15 @@ def read_window(
         f"Read {dst_window} for Tile {tile_id} - this corresponds to bounds {src_bounds} in source"
     )
 
-    shape = (
-        len(input_bands),
-        int(round(dst_window.height)),
-        int(round(dst_window.width)),
-    )
+    shape = window_shape(dst_window, len(input_bands))
 
     try:
+        if out is not None and not masked:
+            return vrt.read(window=window, out=out)
         return vrt.read(
             window=window,
             out_shape=shape,
-            masked=True,
+            masked=masked,
         )
     except rasterio.RasterioIOError as e:
         if "Access window out of range" in str(e) and (shape[1] == 1 or shape[2] == 1):
@@ -123,6 +431,13 @@ def read_window(
                 "This is most likely due to subpixel misalignment. "
                 "Returning empty array instead."
             )
+            if not masked:
+                return np.array(
+                    [
+                        np.full(shape[1:], nodata if nodata is not None else 0)
+                        for nodata in vrt.nodatavals
+                    ]
+                )
             return np.ma.array(data=np.zeros(shape=shape), mask=np.ones(shape=shape))
 
         else:
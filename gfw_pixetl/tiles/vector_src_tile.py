@@ -1,32 +1,71 @@
 import os
-from typing import List
+import shutil
+from collections import OrderedDict
+from math import floor, sqrt
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
 
-import geopandas
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import rasterio
+import shapely
+from rasterio.windows import Window
 from retrying import retry
 from sqlalchemy import Column, Table, select, table, text
-from sqlalchemy.engine import ResultProxy, create_engine
-from sqlalchemy.engine.url import URL
+from sqlalchemy.engine import Engine, ResultProxy
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.sql.elements import TextClause, literal_column
 
 from gfw_pixetl import get_module_logger
-from gfw_pixetl.data_type import to_gdal_data_type
-from gfw_pixetl.errors import GDALError, retry_if_db_fell_over
+from gfw_pixetl.connection import get_engine
+from gfw_pixetl.decorators import lazy_property
+from gfw_pixetl.errors import retry_if_db_fell_over
 from gfw_pixetl.grids import Grid
 from gfw_pixetl.layers import VectorSrcLayer
+from gfw_pixetl.models.enums import RasterizeMethod
+from gfw_pixetl.models.types import Bounds
+from gfw_pixetl.settings.gdal import GDAL_ENV
 from gfw_pixetl.settings.globals import GLOBALS
 from gfw_pixetl.sources import VectorSource
 from gfw_pixetl.tiles import Tile
-from gfw_pixetl.utils.gdal import run_gdal_subcommand
+from gfw_pixetl.tiles.utils.rasterize import Features, bin_points, rasterize_window
+from gfw_pixetl.tiles.utils.window_utils import (
+    WindowWriter,
+    block_windows,
+    process_windows,
+)
+from gfw_pixetl.utils import (
+    available_memory_per_process_bytes,
+    available_memory_per_process_mb,
+    get_co_workers,
+)
+from gfw_pixetl.utils.parquet import (
+    arrow_type,
+    geoparquet_schema,
+    geoparquet_table,
+    geoparquet_writer,
+    read_geoparquet,
+    read_points,
+    write_geoparquet,
+    write_points,
+)
+from gfw_pixetl.utils.worker_pool import WorkerPool
 
 logger = get_module_logger(__name__)
 
 GEOMETRY_COLUMN = "geom"
+# Number of tiles to test for intersection with the source table per statement
+TILE_QUERY_CHUNK_SIZE = 1000
 
 
 class VectorSrcTile(Tile):
     def __init__(self, tile_id: str, grid: Grid, layer: VectorSrcLayer) -> None:
         super().__init__(tile_id, grid, layer)
         self.src: VectorSource = layer.src
+        # Whether tile intersects with source table, if already known
+        self.src_intersects: Optional[bool] = None
+        # Whether features of tile were already extracted to local file
+        self.src_extracted: bool = False
 
     def intersect_filter(self) -> TextClause:
         return text(
@@ -73,10 +112,56 @@ class VectorSrcTile(Tile):
             order = val
         return order
 
+    def is_ordered(self) -> bool:
+        """Whether features must be fetched ordered by value.
+
+        Counts and reductions don't depend on the order in which
+        features get burned, except for first and last if an order is
+        set.
+        """
+        method = self.layer.rasterize_method
+        if method in (RasterizeMethod.first, RasterizeMethod.last):
+            return self.layer.order is not None
+        return method in (None, RasterizeMethod.value)
+
+    def _burn_order(self) -> Optional[str]:
+        """Order in which features must be burned by value, if any.
+
+        Extracts of a partitioned source are only sorted for first and
+        last, so features get put in order again before burning.
+        """
+        if not self.is_ordered():
+            return None
+        return self.layer.order if self.layer.order else "asc"
+
     def src_table(self) -> Table:
-        src_table: Table = table(self.src.table)
-        src_table.schema = self.src.schema
-        return src_table
+        return src_table(self.src)
+
+    def extract_uri(self) -> str:
+        return os.path.join(self.work_dir, f"{self.tile_id}.parquet")
+
+    def remove_extract(self) -> None:
+        """Remove local extract, a single file or a directory of parts."""
+        extract: str = self.extract_uri()
+        if os.path.isdir(extract):
+            shutil.rmtree(extract)
+        elif os.path.exists(extract):
+            os.remove(extract)
+
+    def points_uri(self) -> str:
+        return os.path.join(self.work_dir, f"{self.tile_id}.points.parquet")
+
+    @lazy_property
+    def src_geometry_type(self) -> Optional[str]:
+        return geometry_type(self.src)
+
+    def bins_points(self) -> bool:
+        """Whether features are points which only get counted or summed
+        up per pixel, so that they can be binned instead of rasterized."""
+        return (
+            self.layer.rasterize_method in (RasterizeMethod._count, RasterizeMethod.sum)
+            and self.src_geometry_type == "POINT"
+        )
 
     @retry(
         retry_on_exception=retry_if_db_fell_over,
@@ -85,15 +170,7 @@ class VectorSrcTile(Tile):
         wait_random_max=180000,
     )  # Wait 60-180s between retries
     def src_vector_intersects(self) -> bool:
-        db_url: URL = URL(
-            "postgresql+psycopg2",
-            host=GLOBALS.db_host,
-            port=GLOBALS.db_port,
-            username=GLOBALS.db_username,
-            password=GLOBALS.db_password,
-            database=GLOBALS.db_name,
-        )
-        engine = create_engine(db_url)
+        engine: Engine = get_engine()
 
         sql = (
             select([literal_column("gfw_fid")])
@@ -121,92 +198,604 @@ class VectorSrcTile(Tile):
     )  # Wait 60-180s between retries
     def fetch_data(self) -> None:
         """Download all intersecting features to a local file."""
-        prefix = f"{self.work_dir}"
-        os.makedirs(f"{prefix}", exist_ok=True)
+        if self.src_extracted:
+            logger.debug(f"Features for tile {self.tile_id} already extracted")
+            return
 
-        dst = os.path.join(prefix, f"{self.tile_id}.parquet")
+        os.makedirs(self.work_dir, exist_ok=True)
+        if self.bins_points():
+            self._fetch_points()
+            return
 
-        db_url: URL = URL(
-            "postgresql+psycopg2",
-            host=GLOBALS.db_host,
-            port=GLOBALS.db_port,
-            username=GLOBALS.db_username,
-            password=GLOBALS.db_password,
-            database=GLOBALS.db_name,
-        )
-        engine = create_engine(db_url)
+        dst = self.extract_uri()
 
         val_column = literal_column(str(self.layer.calc))
-        geom_column = literal_column(str(self.intersection_geom()))
+        geom_column = literal_column(f"ST_AsBinary({self.intersection_geom()})")
 
         sql = (
-            select([val_column.label(self.layer.field), geom_column.label(GEOMETRY_COLUMN)])
+            select(
+                [val_column.label(self.layer.field), geom_column.label(GEOMETRY_COLUMN)]
+            )
             .select_from(self.src_table())
             .where(self.intersect_filter())
-            .order_by(self.order_column(val_column))
         )
+        if self.is_ordered():
+            sql = sql.order_by(self.order_column(val_column))
 
-        # Read the rows into memory and then dump them into a local file
-        # for processing in the next stage
+        # Stream the rows through a server side cursor and dump them batch by
+        # batch into a local file for processing in the next stage. This way
+        # memory usage doesn't depend on the number of features in the tile.
         # Why store as GeoParquet? Could be almost anything, but
         # GeoParquet is both faster and more compact (without extra
         # processing) than GeoPackage, Shapefiles, GeoJSON, CSV.
-        geodataframe = geopandas.read_postgis(sql, engine)
-        geodataframe.set_crs("EPSG:4326")
-        geodataframe.to_parquet(dst, compression="snappy")
+        with get_engine().begin() as conn:
+            result: ResultProxy = conn.execution_options(stream_results=True).execute(
+                sql
+            )
+            rows: List[Tuple] = result.fetchmany(GLOBALS.vector_batch_size)
+            schema = _result_schema(result, rows, self.layer.field)
+            row_count: int = write_geoparquet(dst, schema, _batches(result, rows))
+
+        logger.info(f"Fetched {row_count} features for tile {self.tile_id}")
+
+    def _fetch_points(self) -> None:
+        """Download coordinates and, if summed up, values of all intersecting
+        points to a local file."""
+        value_field: Optional[str] = (
+            self.layer.field
+            if self.layer.rasterize_method == RasterizeMethod.sum
+            else None
+        )
+        columns = [
+            literal_column(f"ST_X({GEOMETRY_COLUMN})").label("x"),
+            literal_column(f"ST_Y({GEOMETRY_COLUMN})").label("y"),
+        ]
+        if value_field:
+            columns.append(literal_column(str(self.layer.calc)).label(value_field))
+
+        sql = (
+            select(columns).select_from(self.src_table()).where(self.intersect_filter())
+        )
+
+        with get_engine().begin() as conn:
+            result: ResultProxy = conn.execution_options(stream_results=True).execute(
+                sql
+            )
+            rows: List[Tuple] = result.fetchmany(GLOBALS.vector_batch_size)
+            row_count: int = write_points(
+                self.points_uri(), _batches(result, rows), value_field
+            )
+
+        logger.info(f"Fetched {row_count} points for tile {self.tile_id}")
 
     def rasterize(self) -> None:
-        """Rasterize all features from data fetched in previous stage."""
-        src = f"{self.work_dir}/{self.tile_id}.parquet"
+        """Rasterize all features from data fetched in previous stage.
+
+        Features are burned window by window, with windows processed in
+        parallel by co-workers and written to the output file from a
+        single thread.
+        """
         dst = self.get_local_dst_uri(self.default_format)
+
+        try:
+            with rasterio.Env(**GDAL_ENV):
+                with rasterio.open(dst, "w", **self.dst[self.default_format].profile):
+                    pass
+            if os.path.isfile(self.points_uri()):
+                self._bin_points(dst)
+            else:
+                self._rasterize_features(dst)
+        except Exception:
+            logger.error(f"Could not rasterize tile {self.tile_id}")
+            raise
+
+        self.set_local_dst(self.default_format)
+
+        # invoking gdal-geotiff and compute stats here
+        # instead of in a separate stage to assure we don't run out of memory
+        # the transform stage uses all available memory for concurrent processes.
+        # Having another stage which needs a lot of memory might cause the process to crash
+        self.postprocessing()
+
+    def _bin_points(self, dst: str) -> None:
+        """Count or sum up points per pixel."""
+        src = self.points_uri()
+        logger.info(f"Binning {src} to {dst}")
+
+        x, y, values = read_points(src)
+        blockxsize: int = self.dst[self.default_format].blockxsize
+
+        with WindowWriter(
+            dst, self.get_write_profile(self.default_format), self.tile_id
+        ) as writer:
+            for window, array in bin_points(
+                x,
+                y,
+                values,
+                self.dst[self.default_format].transform,
+                int(self.dst[self.default_format].width),
+                int(self.dst[self.default_format].height),
+                int(sqrt(self._max_blocks(1))) * blockxsize,
+                self.dst[self.default_format].dtype,
+                self.dst[self.default_format].nodata,
+            ):
+                writer.write(array, window)
+
+    def _rasterize_features(self, dst: str) -> None:
+        src = self.extract_uri()
         logger.info(f"Rasterizing {src} to {dst}")
 
-        cmd: List[str] = ["gdal_rasterize"]
+        values, geometries = read_geoparquet(src)
+        # Workers are forked, so they share the features without copying them
+        self._features = Features(
+            geometries, values, self.layer.rasterize_method, self._burn_order()
+        )
+        del values, geometries
 
-        if self.layer.rasterize_method == "count":
-            cmd += ["-burn", "1", "-add"]
-        else:
-            cmd += ["-a", self.layer.field]
-
-        if self.dst[self.default_format].nodata is not None:
-            cmd += ["-a_nodata", str(self.dst[self.default_format].nodata)]
-
-        cmd += [
-            "-te",
-            str(self.bounds.left),
-            str(self.bounds.bottom),
-            str(self.bounds.right),
-            str(self.bounds.top),
-            "-tr",
-            str(self.grid.xres),
-            str(self.grid.yres),
-            "-ot",
-            to_gdal_data_type(self.dst[self.default_format].dtype),
-            "-co",
-            f"COMPRESS={self.dst[self.default_format].compress}",
-            "-co",
-            "TILED=YES",
-            "-co",
-            f"BLOCKXSIZE={self.grid.blockxsize}",
-            "-co",
-            f"BLOCKYSIZE={self.grid.blockxsize}",
-            "-q",
-            "-oo",
-            f"GEOM_POSSIBLE_NAMES={GEOMETRY_COLUMN}",
+        try:
+            self._rasterize_windows(dst)
+        finally:
+            del self._features
+
+    def _rasterize_windows(self, dst: str) -> None:
+        co_workers: int = get_co_workers()
+        logger.debug(
+            f"Rasterize {len(self._features)} features of tile {self.tile_id} "
+            f"with {co_workers} co_workers"
+        )
+        blockxsize: int = self.dst[self.default_format].blockxsize
+        blockysize: int = self.dst[self.default_format].blockysize
+        windows: List[Window] = block_windows(
+            int(self.dst[self.default_format].width),
+            int(self.dst[self.default_format].height),
+            blockxsize,
+            blockysize,
+            int(sqrt(self._max_blocks(co_workers))),
+        )
+        max_rss = (
+            GLOBALS.worker_max_rss or available_memory_per_process_mb() / co_workers
+        )
+
+        with WindowWriter(
+            dst, self.get_write_profile(self.default_format), self.tile_id
+        ) as writer:
+            with WorkerPool(
+                self._rasterize_window, processes=co_workers, max_rss=max_rss
+            ) as pool:
+                for window, array in process_windows(
+                    pool, windows, blockxsize, blockysize, self.tile_id
+                ):
+                    if array is not None:
+                        writer.write(array, window)
+                    del array
+
+    def _rasterize_window(self, window: Window) -> Optional[np.ndarray]:
+        """Burn features into a single window inside a worker process."""
+        return rasterize_window(
+            self._features,
+            window,
+            self.dst[self.default_format].transform,
+            self.dst[self.default_format].dtype,
+            self.dst[self.default_format].nodata,
+        )
+
+    def _max_blocks(self, co_workers: int) -> int:
+        """Maximum number of blocks to burn at once, making sure that blocks
+        can always fill a squared extent."""
+        block_byte_size: int = (
+            self.dst[self.default_format].blockxsize
+            * self.dst[self.default_format].blockysize
+            * np.dtype(self.dst[self.default_format].dtype).itemsize
+        )
+        memory_per_process: float = (
+            available_memory_per_process_bytes() / GLOBALS.divisor / co_workers
+        )
+        return max(1, floor(sqrt(memory_per_process / block_byte_size)) ** 2)
+
+
+def _batches(result: ResultProxy, rows: List[Tuple]) -> Iterator[List[Tuple]]:
+    """Yield already fetched rows, followed by remaining rows of result in
+    batches."""
+    while rows:
+        yield rows
+        rows = result.fetchmany(GLOBALS.vector_batch_size)
+
+
+def _result_schema(result: ResultProxy, rows: List[Tuple], field: str) -> pa.Schema:
+    """GeoParquet schema for (value, WKB geometry) rows of a result."""
+    # Server side cursors only describe their columns after the first fetch.
+    # Results without any rows might already be closed.
+    description = getattr(result.cursor, "description", None)
+    value_type = arrow_type(
+        description[0][1] if description else None, [row[0] for row in rows]
+    )
+    return geoparquet_schema(field, value_type, GEOMETRY_COLUMN, "EPSG:4326")
+
+
+def src_table(src: VectorSource) -> Table:
+    table_clause: Table = table(src.table)
+    table_clause.schema = src.schema
+    return table_clause
+
+
+@retry(
+    retry_on_exception=retry_if_db_fell_over,
+    stop_max_attempt_number=7,
+    wait_random_min=60000,
+    wait_random_max=180000,
+)  # Wait 60-180s between retries
+def geometry_type(src: VectorSource) -> Optional[str]:
+    """Geometry type of source table as registered in geometry_columns.
+
+    Returns None if the geometry column is not registered.
+    """
+    sql = text(
+        f"""SELECT type
+            FROM geometry_columns
+            WHERE f_table_schema = :schema
+                AND f_table_name = :table
+                AND f_geometry_column = '{GEOMETRY_COLUMN}'"""
+    )
+    with get_engine().begin() as conn:
+        row = conn.execute(sql, schema=src.schema, table=src.table).fetchone()
+
+    return None if row is None else row[0]
+
+
+def table_extent(src: VectorSource) -> Optional[Bounds]:
+    """Extent of source table.
+
+    The extent estimated from table statistics is only used if the
+    table didn't change since it was last analyzed, as statistics of
+    append-only tables are stale until ANALYZE runs again. Otherwise,
+    the exact extent is computed with a scan of the table. Run ANALYZE
+    after loading a table to avoid the scan. Returns None if the table
+    has no features or the extent can't be determined.
+    """
+    if _has_current_statistics(src):
+        extent: Optional[Bounds] = _query_extent(
             src,
-            dst,
+            f"ST_EstimatedExtent(:schema, :table, '{GEOMETRY_COLUMN}')",
+            "estimated",
+        )
+        if extent is not None:
+            return extent
+
+    table_name: str = get_engine().dialect.identifier_preparer.format_table(
+        src_table(src)
+    )
+    return _query_extent(
+        src, f"(SELECT ST_Extent({GEOMETRY_COLUMN}) FROM {table_name})", "exact"
+    )
+
+
+def _has_current_statistics(src: VectorSource) -> bool:
+    """Whether source table got analyzed and didn't change since."""
+    sql = text(
+        """SELECT n_mod_since_analyze = 0
+                AND COALESCE(last_analyze, last_autoanalyze) IS NOT NULL
+            FROM pg_stat_user_tables
+            WHERE schemaname = :schema AND relname = :table"""
+    )
+    with get_engine().begin() as conn:
+        row = conn.execute(sql, schema=src.schema, table=src.table).fetchone()
+
+    return row is not None and bool(row[0])
+
+
+def _query_extent(src: VectorSource, extent_sql: str, kind: str) -> Optional[Bounds]:
+    """Query extent of source table, returning None if it is unknown."""
+    sql = text(
+        f"""SELECT ST_XMin(e), ST_YMin(e), ST_XMax(e), ST_YMax(e)
+            FROM {extent_sql} AS e"""
+    )
+    try:
+        with get_engine().begin() as conn:
+            row = conn.execute(sql, schema=src.schema, table=src.table).fetchone()
+    except DBAPIError as e:
+        logger.warning(
+            f"Could not get {kind} extent of {src.schema}.{src.table}: {e.orig}"
+        )
+        return None
+
+    if row is None or row[0] is None:
+        return None
+
+    logger.info(f"Use {kind} extent {tuple(row)} of {src.schema}.{src.table}")
+    return row[0], row[1], row[2], row[3]
+
+
+@retry(
+    retry_on_exception=retry_if_db_fell_over,
+    stop_max_attempt_number=7,
+    wait_random_min=60000,
+    wait_random_max=180000,
+)  # Wait 60-180s between retries
+def intersecting_tile_ids(tiles: Sequence[VectorSrcTile]) -> Set[str]:
+    """Return IDs of all tiles which intersect with their source table, using
+    one spatial join per chunk of tiles.
+
+    Tiles far outside the extent of the table are pruned before
+    querying the database. An estimated extent is derived from a sample
+    of the table, so the extent gets padded by one tile to not miss
+    features at its edges. See `table_extent` for when the extent gets
+    estimated.
+    """
+    if not tiles:
+        return set()
+
+    src: VectorSource = tiles[0].src
+    candidates: List[VectorSrcTile] = list(tiles)
+
+    extent: Optional[Bounds] = table_extent(src)
+    if extent is not None:
+        left, bottom, right, top = extent
+        width: float = tiles[0].bounds.right - tiles[0].bounds.left
+        height: float = tiles[0].bounds.top - tiles[0].bounds.bottom
+        candidates = [
+            tile
+            for tile in candidates
+            if tile.bounds.left <= right + width
+            and tile.bounds.right >= left - width
+            and tile.bounds.bottom <= top + height
+            and tile.bounds.top >= bottom - height
         ]
+        logger.info(
+            f"{len(candidates)} of {len(tiles)} tiles within extent {extent} "
+            f"of {src.schema}.{src.table}"
+        )
 
-        try:
-            run_gdal_subcommand(cmd)
-        except GDALError:
-            logger.error(f"Could not rasterize tile {self.tile_id}")
-            raise
-        else:
-            self.set_local_dst(self.default_format)
+    if not candidates:
+        return set()
+
+    engine: Engine = get_engine()
+    src_table_name: str = engine.dialect.identifier_preparer.format_table(
+        src_table(src)
+    )
+
+    tile_ids: Set[str] = set()
+    with engine.begin() as conn:
+        for start in range(0, len(candidates), TILE_QUERY_CHUNK_SIZE):
+            chunk: List[VectorSrcTile] = candidates[
+                start : start + TILE_QUERY_CHUNK_SIZE
+            ]
+            result: ResultProxy = conn.execute(
+                _intersecting_tiles_sql(chunk, src_table_name)
+            )
+            tile_ids.update(chunk[row[0]].tile_id for row in result)
+
+    logger.info(
+        f"{len(tile_ids)} tiles intersect with database table {src.schema}.{src.table}"
+    )
+    return tile_ids
+
+
+def _intersecting_tiles_sql(
+    tiles: Sequence[VectorSrcTile], src_table_name: str
+) -> TextClause:
+    """Statement which selects the indices of all tiles which intersect with
+    any feature of the source table."""
+    # Tile bounds are plain numbers, so they can safely go into the statement
+    # as literals. This avoids the limit on the number of bind parameters.
+    values: str = ",\n".join(
+        f"({i}, {tile.bounds.left}, {tile.bounds.bottom}, "
+        f"{tile.bounds.right}, {tile.bounds.top})"
+        for i, tile in enumerate(tiles)
+    )
+
+    return text(
+        f"""SELECT t.i
+            FROM (VALUES {values}) AS t(i, xmin, ymin, xmax, ymax)
+            WHERE EXISTS (
+                SELECT 1
+                FROM {src_table_name} AS s
+                WHERE ST_Intersects(
+                    s.{GEOMETRY_COLUMN},
+                    ST_MakeEnvelope(t.xmin, t.ymin, t.xmax, t.ymax, 4326)
+                )
+            )"""
+    )
+
+
+@retry(
+    retry_on_exception=retry_if_db_fell_over,
+    stop_max_attempt_number=7,
+    wait_random_min=60000,
+    wait_random_max=180000,
+)  # Wait 60-180s between retries
+def partition_src(tiles: Sequence[VectorSrcTile]) -> Set[str]:
+    """Extract features of the source table for all given tiles using a
+    single scan of the table.
+
+    Features are assigned to tiles based on their bounding boxes, clipped
+    to tile bounds and written to the local extract of each tile. Rows are
+    buffered until a full batch is collected across all tiles, so memory
+    usage doesn't depend on the size of the table. The table only gets
+    sorted if features are burned first or last by value. Otherwise,
+    features are put in order when they get rasterized. Returns IDs of
+    all tiles with at least one feature.
+    """
+    if not tiles:
+        return set()
+
+    layer = tiles[0].layer
+    assert isinstance(layer, VectorSrcLayer)
+    src: VectorSource = tiles[0].src
+    index = _TileIndex(tiles)
+
+    val_column = literal_column(str(layer.calc))
+    geom_column = literal_column(f"ST_AsBinary({GEOMETRY_COLUMN})")
+    sql = select(
+        [val_column.label(layer.field), geom_column.label(GEOMETRY_COLUMN)]
+    ).select_from(src_table(src))
+    if layer.rasterize_method in (RasterizeMethod.first, RasterizeMethod.last):
+        if tiles[0].is_ordered():
+            sql = sql.order_by(tiles[0].order_column(val_column))
+
+    # Parts written by a failed attempt would otherwise be read twice
+    for tile in tiles:
+        tile.remove_extract()
+
+    pending: Dict[str, List[Tuple]] = dict()
+    pending_count: int = 0
+    row_count: int = 0
+
+    with get_engine().begin() as conn:
+        result: ResultProxy = conn.execution_options(stream_results=True).execute(sql)
+        rows: List[Tuple] = result.fetchmany(GLOBALS.vector_batch_size)
+        schema: pa.Schema = _result_schema(result, rows, layer.field)
 
-            # invoking gdal-geotiff and compute stats here
-            # instead of in a separate stage to assure we don't run out of memory
-            # the transform stage uses all available memory for concurrent processes.
-            # Having another stage which needs a lot of memory might cause the process to crash
-            self.postprocessing()
+        with _ExtractWriters(index, schema) as writers:
+            for rows in _batches(result, rows):
+                row_count += len(rows)
+                for tile_id, tile_rows in index.split(rows).items():
+                    pending.setdefault(tile_id, list()).extend(tile_rows)
+                    pending_count += len(tile_rows)
+
+                if pending_count >= GLOBALS.vector_batch_size:
+                    writers.write(pending)
+                    pending_count = 0
+
+                logger.debug(
+                    f"Scanned {row_count} features of {src.schema}.{src.table}"
+                )
+
+            writers.write(pending)
+
+    logger.info(
+        f"Extracted {row_count} features of {src.schema}.{src.table} "
+        f"for {len(writers.tile_ids)} tiles"
+    )
+    return writers.tile_ids
+
+
+class _ExtractWriters(object):
+    """Append rows to the local extracts of tiles, keeping at most
+    `GLOBALS.vector_max_open_extracts` files open at once.
+
+    Parquet files can't be appended to once closed. The extract of a
+    tile is a directory of part files instead, and a tile whose writer
+    got closed continues in a new part. Parts are numbered in write
+    order.
+    """
+
+    def __init__(self, index: "_TileIndex", schema: pa.Schema) -> None:
+        self.index = index
+        self.schema = schema
+        self.parts: Dict[str, int] = dict()
+        self._writers: "OrderedDict[str, pq.ParquetWriter]" = OrderedDict()
+
+    def __enter__(self) -> "_ExtractWriters":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        while self._writers:
+            _, writer = self._writers.popitem()
+            writer.close()
+
+    @property
+    def tile_ids(self) -> Set[str]:
+        return set(self.parts.keys())
+
+    def write(self, pending: Dict[str, List[Tuple]]) -> None:
+        """Append pending rows to the extracts of their tiles."""
+        for tile_id, rows in pending.items():
+            self._writer(tile_id).write_table(geoparquet_table(self.schema, rows))
+        pending.clear()
+
+    def _writer(self, tile_id: str) -> pq.ParquetWriter:
+        """Open writer of tile, closing the least recently used writer if
+        too many are open."""
+        if tile_id in self._writers:
+            self._writers.move_to_end(tile_id)
+            return self._writers[tile_id]
+
+        if len(self._writers) >= GLOBALS.vector_max_open_extracts:
+            _, writer = self._writers.popitem(last=False)
+            writer.close()
+
+        extract: str = self.index.tiles[tile_id].extract_uri()
+        os.makedirs(extract, exist_ok=True)
+        part: int = self.parts.get(tile_id, 0)
+        self.parts[tile_id] = part + 1
+
+        writer = geoparquet_writer(
+            os.path.join(extract, f"part-{part:05d}.parquet"), self.schema
+        )
+        self._writers[tile_id] = writer
+        return writer
+
+
+class _TileIndex(object):
+    """Look up tiles of a regular grid by column and row, computed from
+    coordinates and tile size."""
+
+    def __init__(self, tiles: Sequence[VectorSrcTile]) -> None:
+        self.left: float = min(tile.bounds.left for tile in tiles)
+        self.top: float = max(tile.bounds.top for tile in tiles)
+        self.width: float = tiles[0].bounds.right - tiles[0].bounds.left
+        self.height: float = tiles[0].bounds.top - tiles[0].bounds.bottom
+
+        self.tiles: Dict[str, VectorSrcTile] = {tile.tile_id: tile for tile in tiles}
+        self.cells: Dict[Tuple[int, int], VectorSrcTile] = {
+            (
+                round((tile.bounds.left - self.left) / self.width),
+                round((self.top - tile.bounds.top) / self.height),
+            ): tile
+            for tile in tiles
+        }
+
+    def split(self, rows: Sequence[Tuple]) -> Dict[str, List[Tuple]]:
+        """Assign (value, WKB geometry) rows to all tiles their geometries
+        intersect with and clip geometries to tile bounds.
+
+        Keeps the order of rows within each tile.
+        """
+        geometries: np.ndarray = shapely.from_wkb([row[1] for row in rows])
+        bounds: np.ndarray = shapely.bounds(geometries)
+        has_geometry = ~(shapely.is_missing(geometries) | shapely.is_empty(geometries))
+
+        # First and last column and row of grid cells covered by each geometry
+        col_range = np.floor((bounds[:, [0, 2]] - self.left) / self.width)
+        row_range = np.floor((self.top - bounds[:, [3, 1]]) / self.height)
+
+        features: Dict[str, List[int]] = dict()
+        for i in np.flatnonzero(has_geometry):
+            for col in range(int(col_range[i, 0]), int(col_range[i, 1]) + 1):
+                for row in range(int(row_range[i, 0]), int(row_range[i, 1]) + 1):
+                    tile: Optional[VectorSrcTile] = self.cells.get((col, row))
+                    if tile is not None:
+                        features.setdefault(tile.tile_id, list()).append(i)
+
+        tile_rows: Dict[str, List[Tuple]] = dict()
+        for tile_id, feature_ids in features.items():
+            clipped: np.ndarray = _clip(
+                geometries[feature_ids], shapely.box(*self.tiles[tile_id].bounds)
+            )
+            wkb: np.ndarray = shapely.to_wkb(clipped)
+            rows_in_tile: List[Tuple] = [
+                (rows[i][0], wkb[j])
+                for j, i in enumerate(feature_ids)
+                if not shapely.is_empty(clipped[j])
+            ]
+            if rows_in_tile:
+                tile_rows[tile_id] = rows_in_tile
+
+        return tile_rows
+
+
+def _clip(geometries: np.ndarray, bounds: shapely.Polygon) -> np.ndarray:
+    """Intersect geometries with bounds.
+
+    Like `VectorSrcTile.intersection_geom`, only keep polygons of
+    intersections which result in geometry collections.
+    """
+    clipped: np.ndarray = shapely.intersection(geometries, bounds)
+    for i in np.flatnonzero(
+        shapely.get_type_id(clipped) == shapely.GeometryType.GEOMETRYCOLLECTION
+    ):
+        parts: np.ndarray = shapely.get_parts(shapely.get_parts(clipped[i]))
+        clipped[i] = shapely.multipolygons(
+            parts[shapely.get_type_id(parts) == shapely.GeometryType.POLYGON]
+        )
+    return clipped
@@ -4,6 +4,7 @@ from gfw_pixetl.utils.utils import (  # noqa: F401
     get_bucket,
     get_co_workers,
     get_module_logger,
+    get_spare_threads,
     snapped_window,
     world_bounds,
 )
@@ -26,6 +26,17 @@ get_secret_client = client_constructor(
 )
 
 
+def get_aws_file_version(bucket: str, key: str, s3_client=None) -> str:
+    """Get ETag of file in S3.
+
+    Pass a client when calling from several threads, clients are thread
+    safe but creating them is not.
+    """
+    if s3_client is None:
+        s3_client = get_s3_client()
+    return str(s3_client.head_object(Bucket=bucket, Key=key)["ETag"])
+
+
 @processify
 def download_s3(bucket: str, key: str, dst: str) -> Dict[str, Any]:
     s3_client = get_s3_client()
@@ -38,12 +49,19 @@ def upload_s3(path: str, bucket: str, dst: str) -> Dict[str, Any]:
     return s3_client.upload_file(path, bucket, dst)
 
 
-@processify
 def get_aws_files(
     bucket: str, prefix: str, extensions: Sequence[str] = (".tif",)
 ) -> List[str]:
     """Get all matching files in S3."""
-    files: List[str] = list()
+    return list(get_aws_file_versions(bucket, prefix, extensions))
+
+
+@processify
+def get_aws_file_versions(
+    bucket: str, prefix: str, extensions: Sequence[str] = (".tif",)
+) -> Dict[str, str]:
+    """Get all matching files in S3, together with their ETag."""
+    files: Dict[str, str] = dict()
 
     s3_client = get_s3_client()
     paginator = s3_client.get_paginator("list_objects_v2")
@@ -57,6 +75,6 @@ def get_aws_files(
         for obj in contents:
             key = str(obj["Key"])
             if any(key.endswith(ext) for ext in extensions):
-                files.append(f"/vsis3/{bucket}/{key}")
+                files[f"/vsis3/{bucket}/{key}"] = str(obj["ETag"])
 
     return files
@@ -0,0 +1,113 @@
+import ast
+import builtins
+from functools import lru_cache
+from typing import Callable
+
+import numpy as np
+from numpy.ma import MaskedArray
+
+from gfw_pixetl import get_module_logger
+from gfw_pixetl.utils.utils import enumerate_bands
+
+LOGGER = get_module_logger(__name__)
+
+# Names available to user defined calculations, in addition to band variables
+CALC_NAMESPACE = {"np": np}
+
+
+def calc_dtype(src_dtype, dst_dtype) -> np.dtype:
+    """Intermediate precision used to evaluate user defined calculations.
+
+    Integer inputs are evaluated in their native data type, so that
+    integer only operations (ie bit shifts) keep working and wide
+    integers don't lose precision. NumPy promotes them as needed. Float
+    inputs are evaluated as float32, or as float64 if either side
+    already is float64. This keeps NumPy from silently promoting float32
+    data to float64 whenever the expression contains a division or a
+    Python float literal.
+    """
+    src_dtype = np.dtype(src_dtype)
+    dst_dtype = np.dtype(dst_dtype)
+
+    if not np.issubdtype(src_dtype, np.floating):
+        return src_dtype
+    elif np.dtype("float64") in (src_dtype, dst_dtype):
+        return np.dtype("float64")
+    else:
+        return np.dtype("float32")
+
+
+def float_result_dtype(dst_dtype) -> np.dtype:
+    """Precision of float results of calculations on integer inputs.
+
+    float32 only holds integers up to 2**24 exactly. Results are kept as
+    float64 unless the destination is float32 or an integer type of at
+    most 16 bits, which float32 represents without loss.
+    """
+    dst_dtype = np.dtype(dst_dtype)
+
+    if dst_dtype.kind == "f" and dst_dtype.itemsize <= 4:
+        return np.dtype("float32")
+    elif dst_dtype.kind in "iub" and dst_dtype.itemsize <= 2:
+        return np.dtype("float32")
+    else:
+        return np.dtype("float64")
+
+
+@lru_cache(maxsize=None)
+def compile_calc(calc_string: str, band_count: int) -> Callable[..., MaskedArray]:
+    """Parse and validate user defined calculation and compile it into a
+    reusable function.
+
+    The expression may only reference the band variables (A, B, C,..),
+    the NumPy namespace `np`, Python builtins and names it binds itself
+    (ie in comprehensions or lambdas). This catches typos before any
+    tile is processed. It is no sandbox, expressions are trusted input
+    of the job definition. Results are cached, so each process compiles
+    a given expression only once.
+    """
+    band_names = enumerate_bands(band_count)
+
+    try:
+        expression = ast.parse(calc_string.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Calc expression `{calc_string}` is not valid: {e}")
+
+    # Names bound within the expression
+    local_names = {
+        node.id
+        for node in ast.walk(expression)
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store)
+    } | {node.arg for node in ast.walk(expression) if isinstance(node, ast.arg)}
+
+    unknown_names = {
+        node.id
+        for node in ast.walk(expression)
+        if isinstance(node, ast.Name)
+        and node.id not in band_names
+        and node.id not in local_names
+        and node.id not in CALC_NAMESPACE
+        and not hasattr(builtins, node.id)
+    }
+    if unknown_names:
+        raise ValueError(
+            f"Calc expression `{calc_string}` references unknown variable(s) "
+            f"{sorted(unknown_names)}. Available bands are {band_names}."
+        )
+
+    function = ast.Expression(
+        body=ast.Lambda(
+            args=ast.arguments(
+                posonlyargs=[],
+                args=[ast.arg(arg=name) for name in band_names],
+                kwonlyargs=[],
+                kw_defaults=[],
+                defaults=[],
+            ),
+            body=expression.body,
+        )
+    )
+    ast.fix_missing_locations(function)
+
+    LOGGER.debug(f"Compiled calc expression `{calc_string}` for {band_count} band(s)")
+    return eval(compile(function, "<calc>", "eval"), dict(CALC_NAMESPACE))
@@ -7,6 +7,8 @@ from shapely.ops import unary_union
 
 from gfw_pixetl import get_module_logger
 from gfw_pixetl.models.types import FeatureTuple
+from gfw_pixetl.sources import RasterSource
+from gfw_pixetl.utils.metadata import metadata_to_json
 
 LOGGER = get_module_logger(__name__)
 
@@ -28,6 +30,9 @@ def _extract_geoms(tiles, dst_format: str) -> List[Tuple[Polygon, Dict[str, Any]
             continue
         properties = tile.metadata.get(dst_format, dict())
         properties["name"] = tile.dst[dst_format].url
+        raster_metadata = _raster_metadata(tile, dst_format)
+        if raster_metadata:
+            properties["raster"] = raster_metadata
         geoms.append(
             (
                 tile.dst[dst_format].geom,
@@ -38,6 +43,22 @@ def _extract_geoms(tiles, dst_format: str) -> List[Tuple[Polygon, Dict[str, Any]
     return geoms
 
 
+def _raster_metadata(tile, dst_format: str) -> Optional[Dict[str, Any]]:
+    """Bounds and profile of the file behind a tile, so that readers of
+    tiles.geojson don't need to open every listed file.
+
+    Only known if the file was opened, either as local copy of a
+    processed tile or as source file.
+    """
+    for src in (
+        getattr(tile, "local_dst", dict()).get(dst_format),
+        tile.dst[dst_format],
+    ):
+        if isinstance(src, RasterSource):
+            return metadata_to_json((src.bounds, src.profile))
+    return None
+
+
 def _union_tile_geoms(fc: FeatureCollection) -> FeatureCollection:
     """Union tiles bounds into a single geometry."""
 
@@ -1,4 +1,4 @@
-from typing import List, Sequence
+from typing import Dict, List, Optional, Sequence
 
 from google.auth.exceptions import DefaultCredentialsError
 from google.cloud import storage
@@ -12,7 +12,6 @@ from gfw_pixetl.errors import MissingGCSKeyError, retry_if_missing_gcs_key_error
     stop_max_attempt_number=2,
 )
 def download_gcs(bucket: str, key: str, dst: str) -> None:
-
     try:
         storage_client = storage.Client()
     except DefaultCredentialsError:
@@ -31,6 +30,17 @@ def get_gs_files(
     bucket: str, prefix: str, extensions: Sequence[str] = (".tif",)
 ) -> List[str]:
     """Get all matching files in GCS."""
+    return list(get_gs_file_versions(bucket, prefix, extensions))
+
+
+@retry(
+    retry_on_exception=retry_if_missing_gcs_key_error,
+    stop_max_attempt_number=2,
+)
+def get_gs_file_versions(
+    bucket: str, prefix: str, extensions: Sequence[str] = (".tif",)
+) -> Dict[str, str]:
+    """Get all matching files in GCS, together with their ETag."""
 
     try:
         storage_client = storage.Client()
@@ -38,9 +48,25 @@ def get_gs_files(
         raise MissingGCSKeyError()
 
     blobs = storage_client.list_blobs(bucket, prefix=prefix)
-    files = [
-        f"/vsigs/{bucket}/{blob.name}"
+    files = {
+        f"/vsigs/{bucket}/{blob.name}": str(blob.etag)
         for blob in blobs
         if any(blob.name.endswith(ext) for ext in extensions)
-    ]
+    }
     return files
+
+
+@retry(
+    retry_on_exception=retry_if_missing_gcs_key_error,
+    stop_max_attempt_number=2,
+)
+def get_gs_file_version(bucket: str, key: str) -> Optional[str]:
+    """Get ETag of file in GCS, None if it does not exist."""
+
+    try:
+        storage_client = storage.Client()
+    except DefaultCredentialsError:
+        raise MissingGCSKeyError()
+
+    blob = storage_client.bucket(bucket).get_blob(key)
+    return str(blob.etag) if blob is not None else None
@@ -0,0 +1,164 @@
+import json
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from affine import Affine
+from rasterio.coords import BoundingBox
+from rasterio.crs import CRS
+
+from gfw_pixetl import get_module_logger
+from gfw_pixetl.settings.globals import GLOBALS
+from gfw_pixetl.utils.aws import get_aws_file_version, get_s3_client
+from gfw_pixetl.utils.google import get_gs_file_version
+from gfw_pixetl.utils.utils import fetch_metadata
+
+LOGGER = get_module_logger(__name__)
+
+FileMetadata = Tuple[BoundingBox, Dict[str, Any]]
+
+# Metadata of files known to the current process, by file URI.
+# Worker processes inherit it when forked.
+_METADATA: Dict[str, FileMetadata] = dict()
+
+
+def source_metadata(uri: str, version: Optional[str] = None) -> FileMetadata:
+    """Bounds and profile of a source file.
+
+    Each file is only opened once per process.
+    """
+    return fetch_source_metadata([uri], {uri: version} if version else None)[uri]
+
+
+def register_source_metadata(metadata: Dict[str, FileMetadata]) -> None:
+    """Trust metadata of source files which is already known, for example
+    from a tiles.geojson manifest, instead of opening the files."""
+    _METADATA.update(metadata)
+
+
+def fetch_source_metadata(
+    uris: Iterable[str], versions: Optional[Dict[str, str]] = None
+) -> Dict[str, FileMetadata]:
+    """Bounds and profile of source files, by file URI.
+
+    Files which were not looked up before by the current process are
+    opened concurrently, unless their metadata was persisted by an
+    earlier run for the same file version. Versions are the ETags from
+    a bucket listing, if known. Otherwise they are requested per file.
+    """
+    uris = list(dict.fromkeys(uris))
+    missing = [uri for uri in uris if uri not in _METADATA]
+
+    if missing:
+        LOGGER.info(f"Fetch metadata of {len(missing)} file(s)")
+        cached: Dict[str, Any] = _load_cache()
+        s3_client = (
+            get_s3_client()
+            if any(uri.startswith("/vsis3/") for uri in missing)
+            else None
+        )
+
+        def fetch(uri: str) -> Tuple[str, Optional[str], FileMetadata]:
+            version = (versions or dict()).get(uri) or _file_version(uri, s3_client)
+            key: Optional[str] = f"{uri}|{version}" if version else None
+            if key in cached:
+                LOGGER.debug(f"Found cached metadata for file {uri}")
+                return uri, None, metadata_from_json(cached[key])
+            return uri, key, fetch_metadata(uri)
+
+        fetched: Dict[str, Any] = dict()
+        with ThreadPoolExecutor(
+            max_workers=min(GLOBALS.metadata_threads, len(missing))
+        ) as executor:
+            for uri, key, metadata in executor.map(fetch, missing):
+                _METADATA[uri] = metadata
+                if key:
+                    fetched[key] = metadata_to_json(metadata)
+
+        if fetched:
+            _persist(fetched)
+
+    return {uri: _METADATA[uri] for uri in uris}
+
+
+def _file_version(uri: str, s3_client) -> Optional[str]:
+    """ETag of files in S3 or GCS, size and modification time of local
+    files.
+
+    None if the version is unknown, metadata of such files is not
+    persisted.
+    """
+    parts = uri.split("/", 3)
+    try:
+        if uri.startswith("/vsis3/"):
+            return get_aws_file_version(parts[2], parts[3], s3_client)
+        elif uri.startswith("/vsigs/"):
+            return get_gs_file_version(parts[2], parts[3])
+        elif os.path.isfile(uri):
+            stat = os.stat(uri)
+            return f"{stat.st_size}-{stat.st_mtime_ns}"
+    except Exception as e:
+        LOGGER.debug(f"Cannot determine version of file {uri}: {e}")
+    return None
+
+
+def metadata_to_json(metadata: FileMetadata) -> Dict[str, Any]:
+    """JSON serializable form of bounds and profile of a file."""
+    bounds, profile = metadata
+    crs: Optional[CRS] = profile.get("crs")
+    transform: Optional[Affine] = profile.get("transform")
+    nodata = profile.get("nodata")
+    return {
+        "bounds": list(bounds),
+        "profile": {
+            **profile,
+            "crs": crs.to_wkt() if crs else None,
+            "transform": list(transform)[:6] if transform else None,
+            # Non-numeric float values (like NaN) are not JSON-legal
+            "nodata": str(nodata)
+            if isinstance(nodata, float) and not math.isfinite(nodata)
+            else nodata,
+        },
+    }
+
+
+def metadata_from_json(value: Dict[str, Any]) -> FileMetadata:
+    """Bounds and profile of a file from their JSON serializable form."""
+    profile: Dict[str, Any] = dict(value["profile"])
+    if profile.get("crs"):
+        profile["crs"] = CRS.from_wkt(profile["crs"])
+    if profile.get("transform"):
+        profile["transform"] = Affine(*profile["transform"])
+    if isinstance(profile.get("nodata"), str):
+        profile["nodata"] = float(profile["nodata"])
+    return BoundingBox(*value["bounds"]), profile
+
+
+def _load_cache() -> Dict[str, Any]:
+    if not GLOBALS.metadata_cache or not os.path.isfile(GLOBALS.metadata_cache):
+        return dict()
+    try:
+        with open(GLOBALS.metadata_cache) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        LOGGER.warning(f"Could not read metadata cache: {e}")
+        return dict()
+
+
+def _persist(entries: Dict[str, Any]) -> None:
+    if not GLOBALS.metadata_cache:
+        return
+
+    cached = _load_cache()
+    cached.update(entries)
+
+    try:
+        os.makedirs(os.path.dirname(GLOBALS.metadata_cache), exist_ok=True)
+        tmp_file = f"{GLOBALS.metadata_cache}.{os.getpid()}"
+        with open(tmp_file, "w") as f:
+            json.dump(cached, f)
+        # Replace in one go, other processes might read the file at the same time
+        os.replace(tmp_file, GLOBALS.metadata_cache)
+    except OSError as e:
+        LOGGER.warning(f"Could not persist metadata cache: {e}")
@@ -0,0 +1,171 @@
+import json
+import os
+from decimal import Decimal
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyproj import CRS
+
+from gfw_pixetl import get_module_logger
+
+LOGGER = get_module_logger(__name__)
+
+# Arrow types of common PostgreSQL column types, by type OID.
+# Numeric columns are written as doubles, so that GDAL reads them as real fields.
+PG_ARROW_TYPES = {
+    16: pa.bool_(),
+    20: pa.int64(),
+    21: pa.int16(),
+    23: pa.int32(),
+    25: pa.string(),
+    700: pa.float32(),
+    701: pa.float64(),
+    1043: pa.string(),
+    1700: pa.float64(),
+}
+
+
+def arrow_type(pg_type_code: Optional[int], values: Sequence[Any]) -> pa.DataType:
+    """Arrow type for values of a PostgreSQL column.
+
+    Falls back to the type inferred from the given values for other
+    column types.
+    """
+    if pg_type_code in PG_ARROW_TYPES:
+        return PG_ARROW_TYPES[pg_type_code]
+
+    inferred: pa.DataType = pa.array(values).type
+    return pa.float64() if pa.types.is_null(inferred) else inferred
+
+
+def geoparquet_schema(
+    value_field: str, value_type: pa.DataType, geometry_field: str, crs: str
+) -> pa.Schema:
+    """Schema of a GeoParquet file with a single value column and a WKB
+    encoded geometry column."""
+    geo_metadata = {
+        "version": "1.0.0",
+        "primary_column": geometry_field,
+        "columns": {
+            geometry_field: {
+                "encoding": "WKB",
+                "geometry_types": [],
+                "crs": CRS.from_user_input(crs).to_json_dict(),
+            }
+        },
+    }
+    return pa.schema(
+        [pa.field(value_field, value_type), pa.field(geometry_field, pa.binary())],
+        metadata={"geo": json.dumps(geo_metadata)},
+    )
+
+
+def geoparquet_writer(dst: str, schema: pa.Schema) -> pq.ParquetWriter:
+    return pq.ParquetWriter(dst, schema, compression="snappy")
+
+
+def geoparquet_table(schema: pa.Schema, rows: Sequence[Sequence[Any]]) -> pa.Table:
+    """Table of (value, WKB geometry) rows."""
+    value_type: pa.DataType = schema.field(0).type
+
+    values = [row[0] for row in rows]
+    if pa.types.is_floating(value_type):
+        values = [float(v) if isinstance(v, Decimal) else v for v in values]
+    geometries = [bytes(row[1]) if row[1] is not None else None for row in rows]
+
+    return pa.Table.from_arrays(
+        [pa.array(values, type=value_type), pa.array(geometries, type=pa.binary())],
+        schema=schema,
+    )
+
+
+def write_geoparquet(
+    dst: str,
+    schema: pa.Schema,
+    batches: Iterable[Sequence[Sequence[Any]]],
+) -> int:
+    """Write batches of (value, WKB geometry) rows to a GeoParquet file.
+
+    Each batch becomes a row group, so that only one batch is held in
+    memory at a time. Returns number of rows written.
+    """
+    row_count = 0
+
+    writer = geoparquet_writer(dst, schema)
+    try:
+        for rows in batches:
+            writer.write_table(geoparquet_table(schema, rows))
+            row_count += len(rows)
+            LOGGER.debug(f"Wrote {row_count} rows to {dst}")
+    finally:
+        writer.close()
+
+    return row_count
+
+
+def read_geoparquet(src: str) -> Tuple[np.ndarray, pa.ChunkedArray]:
+    """Read values and WKB encoded geometries of a GeoParquet file with a
+    single value column and a WKB encoded geometry column.
+
+    Source can also be a directory of part files, which are read in
+    order of their names. Geometries are not decoded, see `Features`.
+    """
+    tables: List[pa.Table] = [pq.read_table(path) for path in parquet_parts(src)]
+    if not tables:
+        return np.array([]), pa.chunked_array([], type=pa.binary())
+
+    table: pa.Table = pa.concat_tables(tables)
+    return table.column(0).to_numpy(), table.column(1)
+
+
+def parquet_parts(src: str) -> List[str]:
+    """Parquet files of source, which is either a single file or a
+    directory of part files."""
+    if not os.path.isdir(src):
+        return [src]
+    return [
+        os.path.join(src, name)
+        for name in sorted(os.listdir(src))
+        if name.endswith(".parquet")
+    ]
+
+
+def write_points(
+    dst: str, batches: Iterable[Sequence[Sequence[Any]]], value_field: Optional[str]
+) -> int:
+    """Write batches of (x, y) or (x, y, value) rows to a Parquet file.
+
+    All columns are stored as doubles, missing values as NaN. Returns
+    number of rows written.
+    """
+    names = ["x", "y"] + ([value_field] if value_field else [])
+    schema = pa.schema([pa.field(name, pa.float64()) for name in names])
+    row_count = 0
+
+    writer = pq.ParquetWriter(dst, schema, compression="snappy")
+    try:
+        for rows in batches:
+            columns = [
+                pa.array(
+                    [float("nan") if row[i] is None else float(row[i]) for row in rows],
+                    type=pa.float64(),
+                )
+                for i in range(len(names))
+            ]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            row_count += len(rows)
+            LOGGER.debug(f"Wrote {row_count} points to {dst}")
+    finally:
+        writer.close()
+
+    return row_count
+
+
+def read_points(src: str) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """Read x, y and, if present, values of points written by
+    `write_points`."""
+    table: pa.Table = pq.read_table(src)
+    columns = [column.to_numpy() for column in table.columns]
+    return columns[0], columns[1], columns[2] if len(columns) > 2 else None
@@ -97,16 +97,21 @@ def create_empty_file(work_dir, src_profile: Dict[str, Any]):
     wait_exponential_max=300000,
 )
 def fetch_metadata(src_uri) -> Tuple[BoundingBox, Dict[str, Any]]:
-    """Open file to fetch metadata."""
+    """Open file to fetch metadata.
+
+    Besides the rasterio profile, the returned profile lists the
+    overview levels of the file.
+    """
     LOGGER.debug(f"Fetch metadata for file {src_uri} if exists")
 
     try:
         with rasterio.Env(**GDAL_ENV), rasterio.open(src_uri) as src:
             LOGGER.info(f"File {src_uri} exists")
-            return src.bounds, src.profile
+            profile: Dict[str, Any] = dict(src.profile)
+            profile["overviews"] = src.overviews(1) if profile.get("count") else list()
+            return src.bounds, profile
 
     except Exception as e:
-
         if _file_does_not_exist(e):
             LOGGER.info(f"File does not exist {src_uri}")
             raise FileNotFoundError(f"File does not exist: {src_uri}")
@@ -148,6 +153,12 @@ def get_co_workers() -> int:
     return max(1, floor(GLOBALS.num_processes / GLOBALS.workers))
 
 
+def get_spare_threads(processes: int = 1) -> int:
+    """Number of threads each of the given number of processes of a tile can
+    use without competing with other tiles for cores."""
+    return max(1, floor(GLOBALS.cores / (GLOBALS.workers * processes)))
+
+
 def snapped_window(window: Window):
     """Make sure window is snapped to grid and contains full pixels to avoid
     missing rows and columns."""
@@ -0,0 +1,294 @@
+import multiprocessing
+import sys
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing.connection import Connection, wait
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+import psutil
+
+from gfw_pixetl import get_module_logger
+from gfw_pixetl.decorators import SubprocessKilledError
+from gfw_pixetl.settings.globals import GLOBALS
+
+LOGGER = get_module_logger(__name__)
+
+# Workers are forked so that they inherit the state of the object
+# which owns the task function (ie the tile) without having to pickle it.
+CONTEXT = multiprocessing.get_context("fork")
+
+
+def _worker(
+    func: Callable[[Any], Any],
+    conn: Connection,
+    initializer: Optional[Callable[[], None]],
+    max_tasks: int,
+    max_rss: Optional[float],
+) -> None:
+    """Execute tasks received through the pipe until told to stop or until
+    the worker should be recycled."""
+
+    if initializer is not None:
+        initializer()
+
+    process = psutil.Process()
+    task_count = 0
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+
+        if message is None:
+            break
+
+        task_id, task = message
+        try:
+            ret = func(task)
+        except Exception:
+            ex_type, ex_value, tb = sys.exc_info()
+            error: Optional[Tuple] = ex_type, ex_value, "".join(traceback.format_tb(tb))
+            ret = None
+        else:
+            error = None
+
+        task_count += 1
+        rss = process.memory_info().rss
+        retire = task_count >= max_tasks or (max_rss is not None and rss > max_rss)
+
+        try:
+            conn.send((task_id, ret, error, retire))
+        except Exception as e:
+            # Result or exception could not be pickled
+            conn.send((task_id, None, (type(e), RuntimeError(str(e)), ""), retire))
+
+        if retire:
+            break
+
+    conn.close()
+
+
+class _WorkerHandle(object):
+    def __init__(
+        self, process: multiprocessing.process.BaseProcess, conn: Connection
+    ) -> None:
+        self.process = process
+        self.conn = conn
+        self.task_id: Optional[int] = None
+        self.started: float = 0.0
+
+
+class WorkerPool(object):
+    """Pool of long-lived worker processes.
+
+    Each worker runs one task at a time and is replaced after it
+    processed `max_tasks` tasks or once its resident memory exceeds
+    `max_rss` MB. Recycling workers keeps memory leaks (in particular
+    for float data types) in check without paying for a new process per
+    task.
+
+    If a worker dies while running a task (ie gets OOM killed), the
+    future of this task raises SubprocessKilledError and a new worker
+    takes over the remaining tasks. A worker which spends more than
+    `timeout` seconds on a single task is terminated and the future of
+    this task raises TimeoutError.
+
+    Tasks are only executed while iterating over `as_completed()`.
+    """
+
+    def __init__(
+        self,
+        func: Callable[[Any], Any],
+        processes: int = 1,
+        initializer: Optional[Callable[[], None]] = None,
+        max_tasks: Optional[int] = None,
+        max_rss: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> None:
+        self.func = func
+        self.processes = max(1, processes)
+        self.initializer = initializer
+        self.max_tasks: int = max_tasks if max_tasks else GLOBALS.worker_max_tasks
+        _max_rss: Optional[float] = max_rss if max_rss else GLOBALS.worker_max_rss
+        self.max_rss: Optional[float] = _max_rss * 1000000 if _max_rss else None
+        self.timeout: Optional[float] = timeout if timeout else GLOBALS.worker_timeout
+
+        self._task_count = 0
+        self._pending: Deque[Tuple[int, Any]] = deque()
+        self._futures: Dict[int, Future] = dict()
+        self._workers: List[_WorkerHandle] = list()
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+    def submit(self, task: Any) -> Future:
+        """Schedule task for execution."""
+        task_id = self._task_count
+        self._task_count += 1
+
+        future: Future = Future()
+        self._futures[task_id] = future
+        self._pending.append((task_id, task))
+
+        return future
+
+    def as_completed(self) -> Iterator[Future]:
+        """Run scheduled tasks and yield futures as they complete.
+
+        New tasks can be submitted while iterating.
+        """
+        while self._pending or self._busy_workers():
+            self._dispatch()
+
+            busy = self._busy_workers()
+            ready = wait(
+                [w.conn for w in busy] + [w.process.sentinel for w in busy],  # type: ignore
+                timeout=self._time_left(busy),
+            )
+
+            for worker in busy:
+                if worker.conn in ready or worker.process.sentinel in ready:
+                    task_id = self._collect(worker)
+                    yield self._futures.pop(task_id)
+                elif self._timed_out(worker):
+                    task_id = self._abort(worker)
+                    yield self._futures.pop(task_id)
+
+    def close(self) -> None:
+        """Stop all idle workers once they finished their current task."""
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self._workers:
+            worker.process.join()
+            worker.conn.close()
+        self._workers = list()
+
+    def terminate(self) -> None:
+        """Stop all workers immediately."""
+        for worker in self._workers:
+            worker.process.terminate()
+        for worker in self._workers:
+            worker.process.join()
+            worker.conn.close()
+        self._workers = list()
+
+    def _busy_workers(self) -> List[_WorkerHandle]:
+        return [w for w in self._workers if w.task_id is not None]
+
+    def _dispatch(self) -> None:
+        """Hand pending tasks to idle workers, starting new workers if
+        needed."""
+        idle = [w for w in self._workers if w.task_id is None]
+        while self._pending and (idle or len(self._workers) < self.processes):
+            worker = idle.pop() if idle else self._start_worker()
+            task_id, task = self._pending.popleft()
+            worker.task_id = task_id
+            worker.started = time.monotonic()
+            worker.conn.send((task_id, task))
+
+    def _start_worker(self) -> _WorkerHandle:
+        parent_conn, child_conn = CONTEXT.Pipe()
+        process = CONTEXT.Process(
+            target=_worker,
+            args=(
+                self.func,
+                child_conn,
+                self.initializer,
+                self.max_tasks,
+                self.max_rss,
+            ),
+        )
+        process.start()
+        child_conn.close()
+
+        LOGGER.debug(f"Started worker process {process.pid}")
+        worker = _WorkerHandle(process, parent_conn)
+        self._workers.append(worker)
+        return worker
+
+    def _collect(self, worker: _WorkerHandle) -> int:
+        """Fetch result of finished task and set its future.
+
+        Remove the worker from the pool if it retired or died.
+        """
+        task_id = worker.task_id
+        assert task_id is not None
+        worker.task_id = None
+        future = self._futures[task_id]
+
+        try:
+            _, ret, error, retire = worker.conn.recv()
+        except (EOFError, OSError):
+            worker.process.join()
+            exit_code = worker.process.exitcode
+            LOGGER.warning(
+                f"Worker process {worker.process.pid} died with exit code {exit_code}"
+            )
+            if exit_code is not None and exit_code < 0:
+                future.set_exception(SubprocessKilledError("Process was killed"))
+            else:
+                future.set_exception(
+                    RuntimeError(f"Worker process exited with code {exit_code}")
+                )
+            self._remove_worker(worker)
+        else:
+            if error:
+                _, ex_value, _ = error
+                future.set_exception(ex_value)
+            else:
+                future.set_result(ret)
+
+            if retire:
+                LOGGER.debug(f"Recycle worker process {worker.process.pid}")
+                worker.process.join()
+                self._remove_worker(worker)
+
+        return task_id
+
+    def _time_left(self, busy: List[_WorkerHandle]) -> Optional[float]:
+        """Seconds until the first busy worker times out."""
+        if self.timeout is None:
+            return None
+        started = min(w.started for w in busy)
+        return max(0.0, started + self.timeout - time.monotonic())
+
+    def _timed_out(self, worker: _WorkerHandle) -> bool:
+        return (
+            self.timeout is not None
+            and time.monotonic() - worker.started >= self.timeout
+        )
+
+    def _abort(self, worker: _WorkerHandle) -> int:
+        """Terminate a worker which is stuck on its task and fail the
+        task's future."""
+        task_id = worker.task_id
+        assert task_id is not None
+        worker.task_id = None
+
+        LOGGER.warning(
+            f"Worker process {worker.process.pid} timed out after {self.timeout} seconds"
+        )
+        worker.process.terminate()
+        worker.process.join()
+        self._futures[task_id].set_exception(
+            TimeoutError(f"Task did not finish within {self.timeout} seconds")
+        )
+        self._remove_worker(worker)
+
+        return task_id
+
+    def _remove_worker(self, worker: _WorkerHandle) -> None:
+        worker.conn.close()
+        self._workers.remove(worker)
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from gfw_pixetl.tiles.utils.array_utils import calc
+from gfw_pixetl.utils.calc import calc_dtype, compile_calc, float_result_dtype
+
+
+def test_compile_calc():
+    f = compile_calc("(A + B) * 2", 2)
+    assert f(np.ones(3), np.ones(3)).sum() == 12
+
+    # same expression is only compiled once per process
+    assert compile_calc("(A + B) * 2", 2) is f
+
+    f = compile_calc("np.ma.array([A, abs(B)])", 2)
+    assert f(np.ones(3), -np.ones(3)).sum() == 6
+
+    # names bound within the expression are known
+    f = compile_calc("np.ma.array([x * 2 for x in (A,)])", 1)
+    assert f(np.ones(3)).sum() == 6
+    f = compile_calc("(lambda x: x + 1)(A)", 1)
+    assert f(np.ones(3)).sum() == 6
+
+
+def test_compile_calc_invalid():
+    with pytest.raises(ValueError):
+        compile_calc("A +", 1)
+
+    with pytest.raises(ValueError):
+        compile_calc("A + B", 1)
+
+    # unknown names are caught before any tile is processed
+    with pytest.raises(ValueError):
+        compile_calc("os.remove('tiles.geojson')", 1)
+
+    with pytest.raises(ValueError):
+        compile_calc("[x for x in (A,)] + [y]", 1)
+
+
+def test_calc_dtype():
+    assert calc_dtype("uint8", "uint16") == np.dtype("uint8")
+    assert calc_dtype("uint16", "float32") == np.dtype("uint16")
+    assert calc_dtype("float32", "uint8") == np.dtype("float32")
+    assert calc_dtype("float64", "float32") == np.dtype("float64")
+    assert calc_dtype("float32", "float64") == np.dtype("float64")
+    assert calc_dtype("int16", "float64") == np.dtype("int16")
+
+
+def test_calc_integer_sources():
+    # integer only operations keep working with float destinations
+    array = np.ma.array([[[8, 16]]], dtype="uint16")
+    result = calc(array, "window", "A >> 2", 1, "tile", "float32")
+    assert result.tolist() == [[[2, 4]]]
+
+    # wide integers don't lose precision before the calc runs
+    array = np.ma.array([[[16777217]]], dtype="int32")
+    result = calc(array, "window", "A - 16777216", 1, "tile", "float32")
+    assert result.tolist() == [[[1]]]
+
+    # float sources still stay at working precision
+    array = np.ma.array([[[1.0, 2.0]]], dtype="float32")
+    result = calc(array, "window", "A / 3", 1, "tile", "float32")
+    assert result.dtype == np.dtype("float32")
+
+
+def test_calc_wide_integer_float_results():
+    assert float_result_dtype("float32") == np.dtype("float32")
+    assert float_result_dtype("uint16") == np.dtype("float32")
+    assert float_result_dtype("int32") == np.dtype("float64")
+    assert float_result_dtype("int64") == np.dtype("float64")
+    assert float_result_dtype("float64") == np.dtype("float64")
+
+    # float results of wide integers keep their precision
+    for dtype in ["uint32", "int32", "int64"]:
+        array = np.ma.array([[[100000001]]], dtype=dtype)
+        result = calc(array, "window", "A + 0.5", 1, "tile", "int64")
+        assert result.dtype == np.dtype("float64")
+        assert result.astype("int64").tolist() == [[[100000001]]]
+
+    # small integers with float32 destinations stay at float32
+    array = np.ma.array([[[3]]], dtype="uint8")
+    result = calc(array, "window", "A / 2", 1, "tile", "uint16")
+    assert result.dtype == np.dtype("float32")
@@ -0,0 +1,24 @@
+import multiprocessing
+
+from gfw_pixetl.connection import get_engine
+
+
+def _engine_id(queue):
+    queue.put(id(get_engine()))
+
+
+def test_get_engine():
+    engine = get_engine()
+    assert get_engine() is engine
+    assert engine.pool.size() == 2
+    assert engine.pool._pre_ping
+
+    # Forked processes get an engine of their own
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_engine_id, args=(queue,))
+    process.start()
+    child_engine_id = queue.get()
+    process.join()
+
+    assert child_engine_id != id(engine)
@@ -1,11 +1,21 @@
-import pytest
-from pydantic import ValidationError
+from unittest import mock
+
+from geojson import Feature, FeatureCollection, dumps
 from rasterio.warp import Resampling
-from shapely.geometry import MultiPolygon, Polygon
+from shapely.geometry import MultiPolygon, Polygon, box
 
 from gfw_pixetl import layers
 from gfw_pixetl.models.pydantic import LayerModel
-from tests.conftest import BUCKET, GEOJSON_2_NAME, GEOJSON_NAME, minimal_layer_dict
+from gfw_pixetl.utils.aws import get_s3_client
+from gfw_pixetl.utils.metadata import metadata_to_json
+from gfw_pixetl.utils.utils import fetch_metadata
+from tests.conftest import (
+    BUCKET,
+    GEOJSON_2_NAME,
+    GEOJSON_NAME,
+    TILE_1_PATH,
+    minimal_layer_dict,
+)
 from tests.utils import compare_multipolygons
 
 
@@ -187,3 +197,70 @@ def test_folder_source_uri():
             ]
         ),
     )
+
+
+def test_intersecting_input_files():
+    layer_dict = {
+        **minimal_layer_dict,
+        "source_uri": [
+            f"s3://{BUCKET}/{GEOJSON_NAME}",
+            f"s3://{BUCKET}/{GEOJSON_2_NAME}",
+        ],
+        "calc": "A + B",
+    }
+    layer = layers.layer_factory(LayerModel.parse_obj(layer_dict))
+    assert isinstance(layer, layers.RasterSrcLayer)
+
+    def uris(geom):
+        return [[f.uri for f in band] for band in layer.intersecting_input_files(geom)]
+
+    tile_10E, tile_10W = [f.uri for f in layer.input_bands[0]]
+    world = layer.input_bands[1][0].uri
+
+    assert uris(Polygon([[12, 8], [18, 8], [18, 2], [12, 2], [12, 8]])) == [
+        [tile_10E],
+        [world],
+    ]
+    # Files which only touch the tile are not used
+    assert uris(Polygon([[0, 10], [10, 10], [10, 0], [0, 0], [0, 10]])) == [
+        [],
+        [world],
+    ]
+    # Files keep their order
+    assert uris(Polygon([[-5, 5], [15, 5], [15, 2], [-5, 2], [-5, 5]])) == [
+        [tile_10E, tile_10W],
+        [world],
+    ]
+
+
+def test_tiles_geojson_metadata():
+    uri = f"/vsis3/{BUCKET}/manifest_only.tif"
+    bounds, profile = fetch_metadata(TILE_1_PATH)
+    feature = Feature(
+        geometry=box(*bounds),
+        properties={
+            "name": uri,
+            "raster": metadata_to_json((bounds, {**profile, "count": 2})),
+        },
+    )
+    get_s3_client().put_object(
+        Bucket=BUCKET,
+        Key="manifest/tiles.geojson",
+        Body=str.encode(dumps(FeatureCollection([feature]))),
+    )
+
+    layer_dict = {
+        **minimal_layer_dict,
+        "source_uri": [f"s3://{BUCKET}/manifest/tiles.geojson"],
+    }
+    # Files listed with metadata are not opened
+    with mock.patch(
+        "gfw_pixetl.utils.metadata.fetch_metadata", side_effect=FileNotFoundError
+    ):
+        layer = layers.layer_factory(LayerModel.parse_obj(layer_dict))
+
+    assert isinstance(layer, layers.RasterSrcLayer)
+    assert [[(f.uri, f.band) for f in band] for band in layer.input_bands] == [
+        [(uri, 1)],
+        [(uri, 2)],
+    ]
@@ -0,0 +1,68 @@
+import os
+from unittest import mock
+
+import pytest
+
+from gfw_pixetl.settings.globals import GLOBALS
+from gfw_pixetl.utils import metadata
+from gfw_pixetl.utils.metadata import fetch_source_metadata
+from gfw_pixetl.utils.utils import fetch_metadata
+from tests.conftest import TILE_1_PATH, TILE_2_PATH
+
+CACHE = "/tmp/test_metadata_cache.json"
+
+
+@pytest.fixture()
+def metadata_cache():
+    cache = GLOBALS.metadata_cache
+    GLOBALS.metadata_cache = CACHE
+    metadata._METADATA.clear()
+    if os.path.isfile(CACHE):
+        os.remove(CACHE)
+
+    yield CACHE
+
+    GLOBALS.metadata_cache = cache
+    metadata._METADATA.clear()
+    if os.path.isfile(CACHE):
+        os.remove(CACHE)
+
+
+def test_fetch_source_metadata(metadata_cache):
+    with mock.patch(
+        "gfw_pixetl.utils.metadata.fetch_metadata", side_effect=fetch_metadata
+    ) as fetch:
+        result = fetch_source_metadata([TILE_1_PATH, TILE_2_PATH, TILE_1_PATH])
+        # Each file is only opened once
+        assert fetch.call_count == 2
+        assert list(result) == [TILE_1_PATH, TILE_2_PATH]
+
+        fetch_source_metadata([TILE_2_PATH])
+        assert fetch.call_count == 2
+
+    for uri in (TILE_1_PATH, TILE_2_PATH):
+        bounds, profile = fetch_metadata(uri)
+        assert result[uri][0] == bounds
+        assert result[uri][1] == profile
+
+    assert os.path.isfile(metadata_cache)
+
+
+def test_fetch_source_metadata_persisted(metadata_cache):
+    expected = fetch_source_metadata([TILE_1_PATH])[TILE_1_PATH]
+    metadata._METADATA.clear()
+
+    # Later runs read metadata of unchanged files from disk
+    with mock.patch("gfw_pixetl.utils.metadata.fetch_metadata") as fetch:
+        bounds, profile = fetch_source_metadata([TILE_1_PATH])[TILE_1_PATH]
+        fetch.assert_not_called()
+    assert bounds == expected[0]
+    assert profile == expected[1]
+    metadata._METADATA.clear()
+
+    # But open files again once they changed
+    with mock.patch(
+        "gfw_pixetl.utils.metadata.fetch_metadata", return_value=expected
+    ) as fetch:
+        fetch_source_metadata([TILE_1_PATH], {TILE_1_PATH: "new-etag"})
+        fetch.assert_called_once_with(TILE_1_PATH)
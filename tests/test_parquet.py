@@ -0,0 +1,68 @@
+import json
+from decimal import Decimal
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from shapely.geometry import Point, box
+from shapely.wkb import loads
+
+from gfw_pixetl.utils.parquet import (
+    arrow_type,
+    geoparquet_schema,
+    read_geoparquet,
+    read_points,
+    write_geoparquet,
+    write_points,
+)
+
+DST = "/tmp/test.parquet"
+
+
+def test_arrow_type():
+    assert arrow_type(23, [1, 2]) == pa.int32()
+    assert arrow_type(None, [1.5]) == pa.float64()
+    assert arrow_type(None, [None]) == pa.float64()
+
+
+def test_write_geoparquet():
+    schema = geoparquet_schema("value", pa.int32(), "geom", "EPSG:4326")
+    batches = [
+        [(1, box(0, 0, 1, 1).wkb), (2, Point(5, 5).wkb)],
+        [(3, memoryview(box(1, 1, 2, 2).wkb)), (None, None)],
+    ]
+
+    assert write_geoparquet(DST, schema, batches) == 4
+
+    parquet_file = pq.ParquetFile(DST)
+    assert parquet_file.num_row_groups == 2
+
+    geo = json.loads(parquet_file.schema_arrow.metadata[b"geo"])
+    assert geo["primary_column"] == "geom"
+    assert geo["columns"]["geom"]["encoding"] == "WKB"
+
+    table = parquet_file.read()
+    assert table.column("value").to_pylist() == [1, 2, 3, None]
+    assert loads(table.column("geom")[2].as_py()).equals(box(1, 1, 2, 2))
+
+    # Geometries are read without decoding them
+    values, geometries = read_geoparquet(DST)
+    assert values[:3].tolist() == [1, 2, 3] and np.isnan(values[3])
+    assert isinstance(geometries, pa.ChunkedArray)
+    assert loads(geometries[2].as_py()).equals(box(1, 1, 2, 2))
+
+
+def test_write_points():
+    dst = "/tmp/points.parquet"
+    batches = [[(1, 2, Decimal("1.5")), (3, 4, None)], [(5.5, 6, 7)]]
+
+    assert write_points(dst, batches, "value") == 3
+
+    x, y, values = read_points(dst)
+    assert x.tolist() == [1, 3, 5.5]
+    assert y.tolist() == [2, 4, 6]
+    assert values is not None
+    assert values[0] == 1.5 and np.isnan(values[1])
+
+    write_points(dst, [[(1, 2)]], None)
+    assert read_points(dst)[2] is None
@@ -0,0 +1,70 @@
+import json
+from unittest import mock
+
+import pytest
+
+from gfw_pixetl.pixetl_prep import create_geojsons
+from gfw_pixetl.settings.globals import GLOBALS
+from gfw_pixetl.utils import metadata
+from gfw_pixetl.utils.aws import get_s3_client
+from gfw_pixetl.utils.utils import fetch_metadata
+from tests.conftest import BUCKET, TILE_1_PATH, TILE_2_PATH
+
+DATASET = "pixetl_prep_test"
+VERSION = "v1"
+TILES_GEOJSON = f"{DATASET}/{VERSION}/raw/geotiff/tiles.geojson"
+
+
+@pytest.fixture()
+def no_metadata_cache():
+    cache = GLOBALS.metadata_cache
+    GLOBALS.metadata_cache = ""
+    metadata._METADATA.clear()
+
+    yield
+
+    GLOBALS.metadata_cache = cache
+    metadata._METADATA.clear()
+
+
+def _listed_files():
+    body = get_s3_client().get_object(Bucket=BUCKET, Key=TILES_GEOJSON)["Body"]
+    features = json.loads(body.read().decode("utf-8"))["features"]
+    return {
+        feature["properties"]["name"]: feature["properties"] for feature in features
+    }
+
+
+def test_create_geojsons_incremental(no_metadata_cache):
+    s3_client = get_s3_client()
+    for key in ("prep/tile_1.tif", "prep/tile_2.tif", TILES_GEOJSON):
+        s3_client.delete_object(Bucket=BUCKET, Key=key)
+
+    s3_client.upload_file(TILE_1_PATH, BUCKET, "prep/tile_1.tif")
+    resources = [("s3", BUCKET, "prep/")]
+
+    create_geojsons(resources, DATASET, VERSION, "raw", merge_existing=False)
+    listed = _listed_files()
+    assert list(listed) == [f"/vsis3/{BUCKET}/prep/tile_1.tif"]
+    assert listed[f"/vsis3/{BUCKET}/prep/tile_1.tif"]["etag"]
+    assert listed[f"/vsis3/{BUCKET}/prep/tile_1.tif"]["raster"]
+
+    # Only new files are opened
+    metadata._METADATA.clear()
+    s3_client.upload_file(TILE_2_PATH, BUCKET, "prep/tile_2.tif")
+    with mock.patch(
+        "gfw_pixetl.utils.metadata.fetch_metadata", side_effect=fetch_metadata
+    ) as fetch:
+        create_geojsons(
+            resources, DATASET, VERSION, "raw", merge_existing=False, incremental=True
+        )
+        fetch.assert_called_once_with(f"/vsis3/{BUCKET}/prep/tile_2.tif")
+
+    assert set(_listed_files()) == {
+        f"/vsis3/{BUCKET}/prep/tile_1.tif",
+        f"/vsis3/{BUCKET}/prep/tile_2.tif",
+    }
+    assert (
+        _listed_files()[f"/vsis3/{BUCKET}/prep/tile_1.tif"]
+        == listed[f"/vsis3/{BUCKET}/prep/tile_1.tif"]
+    )
@@ -170,7 +170,7 @@ def test_create_tiles_subprocess_oom(LAYER):
     ), mock.patch.object(
         Destination, "exists", return_value=False
     ), mock.patch.object(
-        RasterSrcTile, "_processified_transform", side_effect=SubprocessKilledError
+        RasterSrcTile, "_transform_window", side_effect=SubprocessKilledError
     ), mock.patch.object(
         RasterSrcTile, "create_gdal_geotiff", return_value=None
     ), mock.patch.object(
@@ -229,6 +229,25 @@ def test_filter_src_tiles(PIPE_10x10):
         assert i == 4
 
 
+def test_intersect_src_tiles(LAYER):
+    pipe = RasterPipe(LAYER)
+    assert isinstance(pipe.grid, LatLngGrid)
+
+    tiles = {
+        RasterSrcTile(
+            tile_id=pipe.grid.xy_to_tile_id(x, y), grid=pipe.grid, layer=LAYER
+        )
+        for x in range(-12, 22, 2)
+        for y in range(-2, 13, 2)
+    }
+    pipe._intersect_src_tiles(tiles)
+
+    assert any(tile.src_intersects for tile in tiles)
+    assert not all(tile.src_intersects for tile in tiles)
+    for tile in tiles:
+        assert tile.src_intersects == tile.within()
+
+
 def test_transform(PIPE_10x10):
     with mock.patch.object(RasterSrcTile, "transform", return_value=True):
         tiles = PIPE_10x10.transform(_get_subset_tiles())
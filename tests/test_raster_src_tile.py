@@ -4,14 +4,20 @@ from math import isclose
 
 import numpy as np
 import rasterio
+import rasterio.shutil
 from rasterio.enums import ColorInterp
+from rasterio.windows import Window
+from shapely.geometry import box
 
 from gfw_pixetl import get_module_logger, layers
 from gfw_pixetl.models.enums import PhotometricType
+from gfw_pixetl.models.named_tuples import InputBandElement
 from gfw_pixetl.models.pydantic import LayerModel
 from gfw_pixetl.settings.gdal import GDAL_ENV
+from gfw_pixetl.sources import RasterSource
 from gfw_pixetl.tiles import RasterSrcTile
-from tests.conftest import BUCKET, GEOJSON_2_NAME, LAYER_DICT
+from gfw_pixetl.tiles.raster_src_tile import _has_valid_pixels, _same_nodata
+from tests.conftest import BUCKET, GEOJSON_2_NAME, LAYER_DICT, TILE_1_PATH
 
 LOGGER = get_module_logger(__name__)
 
@@ -270,3 +276,139 @@ def test__block_byte_size(LAYER, LAYER_MULTI):
 
     tile = RasterSrcTile("10N_010E", LAYER_MULTI.grid, LAYER_MULTI)
     assert tile._block_byte_size() == 2 * 2 * 400 * 400
+
+
+def test_is_aligned(LAYER):
+    tile = RasterSrcTile("10N_010E", LAYER.grid, LAYER)
+    tile._lazy_src = RasterSource(TILE_1_PATH)
+
+    dst = tile.dst[tile.default_format]
+    src_transform = tile.src.transform
+
+    dst.transform = src_transform
+    assert tile.is_aligned()
+
+    # Shifted by full pixels
+    dst.transform = src_transform * rasterio.Affine.translation(-10, 20)
+    assert tile.is_aligned()
+
+    # Shifted by half a pixel
+    dst.transform = src_transform * rasterio.Affine.translation(0.5, 0)
+    assert not tile.is_aligned()
+
+    # Different resolution
+    dst.transform = src_transform * rasterio.Affine.scale(2)
+    assert not tile.is_aligned()
+
+
+def test_probe_sparse_data(LAYER):
+    tile = RasterSrcTile("10N_010E", LAYER.grid, LAYER)
+
+    uri = "/tmp/probe_sparse.tif"
+    with rasterio.open(TILE_1_PATH) as src:
+        profile = src.profile
+    profile.update(dtype="uint8", count=1, nodata=0)
+    pixels = [(5, 7), (150, 330)]
+
+    data = np.zeros((profile["height"], profile["width"]), dtype="uint8")
+    for row, col in pixels:
+        data[row, col] = 1
+    with rasterio.Env(**GDAL_ENV):
+        with rasterio.open(uri, "w", **profile) as dst:
+            dst.write(data, 1)
+        # Nearest neighbour overviews miss sparse pixels
+        with rasterio.open(uri, "r+") as dst:
+            dst.build_overviews([2, 4, 8, 16])
+
+    tile._lazy_src = RasterSource(uri)
+    has_data = tile._probe()
+    assert has_data is not None
+
+    # Source pixels are 10 times the size of tile pixels
+    expected = np.zeros((10, 10), dtype=bool)
+    expected[0, 0] = True
+    expected[3, 8] = True
+    np.testing.assert_array_equal(has_data, expected)
+
+    tile.data_blocks = has_data
+    assert tile._window_has_data(Window(3300, 1500, 1, 1))
+    assert not tile._window_has_data(Window(400, 400, 400, 400))
+
+
+def test_same_nodata():
+    assert _same_nodata(None, None)
+    assert _same_nodata(0, 0.0)
+    assert _same_nodata(float("nan"), np.nan)
+    assert not _same_nodata(None, 0)
+    assert not _same_nodata(0, np.nan)
+    assert not _same_nodata(1, 2)
+
+    # One value per band
+    assert _same_nodata([0], 0)
+    assert _same_nodata([np.nan, 1], [float("nan"), 1])
+    assert _same_nodata(0, [0, 0])
+    assert not _same_nodata([0, 1], 0)
+    assert not _same_nodata([0, 1], [0, 1, 2])
+
+
+def test_has_valid_pixels():
+    uri = "/tmp/has_valid_pixels.tif"
+    profile = {
+        "driver": "GTiff",
+        "width": 512,
+        "height": 512,
+        "count": 1,
+        "dtype": "float32",
+        "nodata": np.nan,
+        "tiled": True,
+        "blockxsize": 256,
+        "blockysize": 256,
+        "crs": "EPSG:4326",
+        "transform": rasterio.Affine(0.001, 0, 10, 0, -0.001, 10),
+    }
+    data = np.full((1, 512, 512), np.nan, dtype="float32")
+
+    with rasterio.open(uri, "w", **profile) as dst:
+        dst.write(data)
+    assert not _has_valid_pixels(uri)
+
+    data[0, 300, 300] = 1
+    with rasterio.open(uri, "w", **profile) as dst:
+        dst.write(data)
+    assert _has_valid_pixels(uri)
+
+
+def test_plan_windows(LAYER):
+    tile = RasterSrcTile("10N_010E", LAYER.grid, LAYER)
+    tile._lazy_input_files = [
+        [
+            InputBandElement(uri="b.tif", geometry=box(10.5, 9, 11, 10), band=1),
+            InputBandElement(uri="a.tif", geometry=box(10, 9.5, 10.5, 10), band=1),
+        ]
+    ]
+
+    top_left = Window(0, 0, 2000, 2000)
+    top_right = Window(2000, 0, 2000, 2000)
+    bottom_left = Window(0, 2000, 2000, 2000)
+    bottom_right = Window(2000, 2000, 2000, 2000)
+
+    windows = tile._plan_windows([top_left, top_right, bottom_left, bottom_right])
+
+    # bottom left has no input file, windows are ordered by input file
+    assert windows == [top_right, bottom_right, top_left]
+
+
+def test_window_has_data(LAYER):
+    tile = RasterSrcTile("10N_010E", LAYER.grid, LAYER)
+    tile._lazy_src = RasterSource(TILE_1_PATH)
+    assert tile.intersecting_window == Window(0, 0, 4000, 4000)
+
+    assert tile._window_has_data(Window(0, 0, 400, 400))
+
+    tile.data_blocks = np.zeros((10, 10), dtype=bool)
+    tile.data_blocks[9, 0] = True
+
+    assert not tile._window_has_data(Window(0, 0, 2000, 2000))
+    assert tile._window_has_data(Window(0, 2000, 2000, 2000))
+    assert tile._window_has_data(Window(0, 3600, 400, 400))
+    assert not tile._window_has_data(Window(400, 3600, 400, 400))
@@ -1,17 +1,22 @@
+import json
 from unittest import mock
 
-from geojson import FeatureCollection
+from geojson import FeatureCollection, dumps
 from shapely.geometry import shape
 
+from gfw_pixetl.sources import RasterSource
 from gfw_pixetl.utils.geometry import (
     _extract_geoms,
     _to_feature_collection,
     _union_tile_geoms,
 )
+from gfw_pixetl.utils.metadata import metadata_from_json
 from gfw_pixetl.utils.upload_geometries import (
     generate_feature_collection,
     upload_geojsons,
 )
+from gfw_pixetl.utils.utils import DummyTile, fetch_metadata
+from tests.conftest import TILE_1_PATH
 from tests.test_pipe import _get_subset_tiles
 
 
@@ -77,3 +82,15 @@ def test_generate_feature_collection(PIPE):
     dst_format = "nonexisting"
     fc: FeatureCollection = generate_feature_collection(tiles, dst_format)
     assert len(fc["features"]) == 0
+
+
+def test_generate_feature_collection_raster_metadata():
+    tile = DummyTile({"geotiff": RasterSource(TILE_1_PATH)})
+
+    fc: FeatureCollection = generate_feature_collection([tile], "geotiff")
+    properties = fc["features"][0]["properties"]
+    assert properties["name"] == TILE_1_PATH
+
+    bounds, profile = metadata_from_json(json.loads(dumps(properties["raster"])))
+    assert (bounds, profile) == fetch_metadata(TILE_1_PATH)
+    assert profile["overviews"] == []
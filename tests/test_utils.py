@@ -21,6 +21,7 @@ from gfw_pixetl.utils.utils import (
     available_memory_per_process_mb,
     enumerate_bands,
     get_bucket,
+    get_spare_threads,
     intersection,
     world_bounds,
 )
@@ -99,6 +100,27 @@ def test_available_memory_per_process():
     assert available_memory_per_process_mb() == GLOBALS.max_mem / 2
 
 
+def test_get_spare_threads():
+    cores = GLOBALS.cores
+    num_processes = GLOBALS.num_processes
+    workers = GLOBALS.workers
+    try:
+        GLOBALS.cores = 16
+        GLOBALS.num_processes = 16
+
+        GLOBALS.workers = 16
+        assert get_spare_threads() == 1
+
+        GLOBALS.workers = 2
+        assert get_spare_threads() == 8
+        assert get_spare_threads(3) == 2
+        assert get_spare_threads(16) == 1
+    finally:
+        GLOBALS.cores = cores
+        GLOBALS.num_processes = num_processes
+        GLOBALS.workers = workers
+
+
 def test_create_vrt():
     vrt = create_vrt(URIS)
     assert vrt == "all.vrt"
@@ -1,13 +1,29 @@
 import json
 import os
+import shutil
 import subprocess
-
+from types import SimpleNamespace
+from unittest import mock
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from shapely.geometry import box
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 
+from gfw_pixetl.connection import get_engine
 from gfw_pixetl.grids import LatLngGrid, grid_factory
 from gfw_pixetl.layers import VectorSrcLayer, layer_factory
 from gfw_pixetl.models.pydantic import LayerModel
-from gfw_pixetl.tiles import VectorSrcTile
+from gfw_pixetl.settings.globals import GLOBALS
+from gfw_pixetl.tiles import VectorSrcTile, vector_src_tile
+from gfw_pixetl.tiles.vector_src_tile import (
+    _ExtractWriters,
+    intersecting_tile_ids,
+    partition_src,
+)
+from gfw_pixetl.utils.parquet import geoparquet_schema, read_geoparquet
 
 Base = declarative_base()
 
@@ -17,7 +33,7 @@ base_vector_layer_dict = {
     "source_type": "vector",
     "no_data": None,
     "data_type": "uint8",
-    "calc": "1"
+    "calc": "1",
 }
 
 
@@ -57,6 +73,156 @@ def test_vector_src_tile_intersects_surrounding_tiles(sample_vector_data):
         assert not tile.src_vector_intersects()
 
 
+def test_intersecting_tile_ids(sample_vector_data):
+    dataset, version = sample_vector_data
+    layer: VectorSrcLayer = layer_factory(
+        LayerModel.parse_obj(
+            base_vector_layer_dict | {"dataset": dataset, "version": version}
+        )
+    )
+
+    tiles = [
+        VectorSrcTile(tile_id, layer.grid, layer)
+        for tile_id in [
+            "70N_000E",
+            "70N_010E",
+            "60N_000E",
+            "60N_010E",
+            "60N_020E",
+            "00N_010E",
+        ]
+    ]
+    assert intersecting_tile_ids(tiles) == {"60N_010E"}
+
+    # Tiles are sent to the database in chunks
+    with mock.patch.object(vector_src_tile, "TILE_QUERY_CHUNK_SIZE", 2):
+        assert intersecting_tile_ids(tiles) == {"60N_010E"}
+
+
+def test_intersecting_tile_ids_after_append(sample_vector_data):
+    dataset, version = sample_vector_data
+    layer: VectorSrcLayer = layer_factory(
+        LayerModel.parse_obj(
+            base_vector_layer_dict | {"dataset": dataset, "version": version}
+        )
+    )
+    tiles = [
+        VectorSrcTile(tile_id, layer.grid, layer)
+        for tile_id in ["60N_010E", "00N_010E"]
+    ]
+
+    # Features appended after ANALYZE are outside the estimated extent
+    with get_engine().begin() as conn:
+        conn.execute(text(f'ANALYZE {dataset}."{version}"'))
+    with get_engine().begin() as conn:
+        conn.execute(
+            text(
+                f"""INSERT INTO {dataset}."{version}" (geom)
+                    VALUES (ST_Multi(ST_MakeEnvelope(10.1, -5, 10.2, -4.9, 4326)))"""
+            )
+        )
+    try:
+        assert intersecting_tile_ids(tiles) == {"60N_010E", "00N_010E"}
+    finally:
+        with get_engine().begin() as conn:
+            conn.execute(
+                text(f'DELETE FROM {dataset}."{version}" WHERE gfw_fid IS NULL')
+            )
+
+
+def test_partition_src(sample_vector_data):
+    dataset, version = sample_vector_data
+    layer: VectorSrcLayer = layer_factory(
+        LayerModel.parse_obj(
+            base_vector_layer_dict | {"dataset": dataset, "version": version}
+        )
+    )
+
+    tiles = [
+        VectorSrcTile(tile_id, layer.grid, layer)
+        for tile_id in ["60N_000E", "60N_010E", "00N_010E"]
+    ]
+    for tile in tiles:
+        tile.remove_work_dir()
+
+    assert partition_src(tiles) == {"60N_010E"}
+    assert not os.path.exists(tiles[0].extract_uri())
+    extract = pq.read_table(tiles[1].extract_uri())
+
+    # Extract has the same features as fetched from the database
+    tiles[1].remove_work_dir()
+    tiles[1].fetch_data()
+    assert extract.num_rows == pq.read_table(tiles[1].extract_uri()).num_rows
+
+
+def test_partition_src_retry(sample_vector_data):
+    dataset, version = sample_vector_data
+    layer: VectorSrcLayer = layer_factory(
+        LayerModel.parse_obj(
+            base_vector_layer_dict | {"dataset": dataset, "version": version}
+        )
+    )
+    tiles = [VectorSrcTile("60N_010E", layer.grid, layer)]
+    tiles[0].remove_work_dir()
+    write = _ExtractWriters.write
+    attempts = list()
+
+    def fail_first_attempt(writers, pending):
+        if attempts:
+            return write(writers, pending)
+        attempts.append(writers)
+        # Leave two parts behind, like a tile whose writer got closed
+        for _ in range(2):
+            write(writers, dict(pending))
+            writers.__exit__(None, None, None)
+        raise OperationalError("SELECT", {}, Exception("Connection refused"))
+
+    with mock.patch.object(
+        _ExtractWriters, "write", autospec=True, side_effect=fail_first_attempt
+    ), mock.patch("retrying.time.sleep"):
+        assert partition_src(tiles) == {"60N_010E"}
+    assert attempts
+
+    # Parts of the failed attempt are not read again
+    extract = pq.read_table(tiles[0].extract_uri())
+    tiles[0].remove_work_dir()
+    tiles[0].fetch_data()
+    assert extract.num_rows == pq.read_table(tiles[0].extract_uri()).num_rows
+
+
+def test_extract_writers():
+    work_dir = "/tmp/extract_writers"
+    shutil.rmtree(work_dir, ignore_errors=True)
+    index = SimpleNamespace(
+        tiles={
+            tile_id: SimpleNamespace(
+                extract_uri=lambda tile_id=tile_id: os.path.join(work_dir, tile_id)
+            )
+            for tile_id in ["a", "b"]
+        }
+    )
+    schema = geoparquet_schema("value", pa.int32(), "geom", "EPSG:4326")
+
+    def rows(*values):
+        return [(value, box(0, 0, 1, 1).wkb) for value in values]
+
+    # Writing b closes the writer of a, which continues in a new part
+    with mock.patch.object(GLOBALS, "vector_max_open_extracts", 1):
+        with _ExtractWriters(index, schema) as writers:
+            writers.write({"a": rows(1, 2)})
+            writers.write({"b": rows(3)})
+            writers.write({"a": rows(4)})
+
+    assert writers.tile_ids == {"a", "b"}
+    assert sorted(os.listdir(os.path.join(work_dir, "a"))) == [
+        "part-00000.parquet",
+        "part-00001.parquet",
+    ]
+    values, geometries = read_geoparquet(os.path.join(work_dir, "a"))
+    assert values.tolist() == [1, 2, 4]
+    assert len(geometries) == 3
+
+
 def test_vector_src_tile_fetch_data_creates_parquet(sample_vector_data):
     dataset, version = sample_vector_data
     layer: VectorSrcLayer = layer_factory(
@@ -125,12 +291,7 @@ def test_vector_src_tile_rasterize_tiff_has_data(sample_vector_data):
 
     assert os.path.isfile(tiff_path)
 
-    proc_args = [
-        "gdalinfo",
-        "-stats",
-        "-json",
-        tiff_path
-    ]
+    proc_args = ["gdalinfo", "-stats", "-json", tiff_path]
     p = subprocess.run(proc_args, capture_output=True, check=True)
     output = p.stdout.decode("utf-8")
     info = json.loads(output)
@@ -0,0 +1,105 @@
+import os
+import signal
+import time
+
+import pytest
+
+from gfw_pixetl.decorators import SubprocessKilledError
+from gfw_pixetl.utils.worker_pool import WorkerPool
+
+
+class SomeException(Exception):
+    pass
+
+
+def square(x):
+    return x * x
+
+
+def raise_exception(x):
+    raise SomeException("Boom!")
+
+
+def terminate_on_one(x):
+    if x == 1:
+        os.kill(os.getpid(), signal.SIGKILL)
+    return x
+
+
+def sleep_on_one(x):
+    if x == 1:
+        time.sleep(60)
+    return x
+
+
+def get_pid(x):
+    return os.getpid()
+
+
+def test_worker_pool_results():
+    with WorkerPool(square, processes=2) as pool:
+        futures = [pool.submit(i) for i in range(10)]
+        done = list(pool.as_completed())
+
+    assert len(done) == 10
+    assert [future.result() for future in futures] == [i * i for i in range(10)]
+
+
+def test_worker_pool_exception():
+    with WorkerPool(raise_exception) as pool:
+        future = pool.submit(1)
+        list(pool.as_completed())
+
+    with pytest.raises(SomeException):
+        future.result()
+
+
+def test_worker_pool_killed_worker():
+    with WorkerPool(terminate_on_one) as pool:
+        futures = [pool.submit(i) for i in range(3)]
+        list(pool.as_completed())
+
+    assert futures[0].result() == 0
+    with pytest.raises(SubprocessKilledError):
+        futures[1].result()
+    # a new worker takes over remaining tasks
+    assert futures[2].result() == 2
+
+
+def test_worker_pool_timeout():
+    start = time.monotonic()
+    with WorkerPool(sleep_on_one, processes=2, timeout=1) as pool:
+        futures = [pool.submit(i) for i in range(3)]
+        list(pool.as_completed())
+
+    assert time.monotonic() - start < 30
+    assert futures[0].result() == 0
+    with pytest.raises(TimeoutError):
+        futures[1].result()
+    assert futures[2].result() == 2
+
+
+def test_worker_pool_recycle():
+    with WorkerPool(get_pid, max_tasks=2) as pool:
+        futures = [pool.submit(i) for i in range(4)]
+        list(pool.as_completed())
+
+    pids = [future.result() for future in futures]
+    assert pids[0] == pids[1]
+    assert pids[2] == pids[3]
+    assert pids[0] != pids[2]
+
+
+def test_worker_pool_initializer():
+    def init():
+        os.environ["WORKER_POOL_TEST"] = "initialized"
+
+    def read_env(x):
+        return os.environ.get("WORKER_POOL_TEST")
+
+    with WorkerPool(read_env, initializer=init) as pool:
+        future = pool.submit(1)
+        list(pool.as_completed())
+
+    assert future.result() == "initialized"
+    assert "WORKER_POOL_TEST" not in os.environ
@@ -3,7 +3,12 @@ from rasterio.windows import Window
 
 from gfw_pixetl import layers
 from gfw_pixetl.tiles import RasterSrcTile
-from gfw_pixetl.tiles.utils.array_utils import calc, set_datatype
+from gfw_pixetl.tiles.utils.array_utils import (
+    calc,
+    sentinel_block_has_data,
+    sentinel_set_datatype,
+    set_datatype,
+)
 
 
 def test_set_dtype(LAYER):
@@ -166,3 +171,48 @@ def test_calc_multi_out(LAYER):
     )
     assert result.shape == (3, 1, 3)
     assert result.sum() == 30
+
+
+def test_calc_precision(LAYER):
+    window = Window(0, 0, 1, 3)
+    tile = RasterSrcTile("10N_010E", LAYER.grid, LAYER)
+
+    data = np.ma.array(np.ones((1, 1, 3), dtype="float32"))
+    result = calc(data, window, "A / 3", 1, tile.tile_id, "float32")
+    assert result.dtype == np.dtype("float32")
+
+    data = np.ma.array(np.ones((1, 1, 3), dtype="uint16"))
+    result = calc(data, window, "A / 2", 1, tile.tile_id, "float32")
+    assert result.dtype == np.dtype("float32")
+    assert result.sum() == 1.5
+
+    data = np.ma.array(np.ones((1, 1, 3), dtype="uint8"))
+    result = calc(data, window, "A + 1", 1, tile.tile_id, "uint16")
+    assert result.dtype == np.dtype("uint8")
+
+
+def test_sentinel_matches_masked():
+    window = Window(0, 0, 10, 10)
+    data = np.random.randint(4, size=(2, 10, 10)).astype("uint16")
+    masked_data = np.ma.masked_values(data, 0)
+
+    for nodata in [5, [5, 6], None]:
+        expected = set_datatype(masked_data, window, nodata, "float32", "10N_010E")
+        result = sentinel_set_datatype(
+            data, (0, 0), window, nodata, "float32", "10N_010E"
+        )
+        assert result.dtype == np.dtype("float32")
+        np.testing.assert_array_equal(result, expected)
+
+
+def test_sentinel_block_has_data():
+    data = np.zeros((2, 10, 10), dtype="float32")
+    assert not sentinel_block_has_data(data, (0, 0), "10N_010E")
+    assert sentinel_block_has_data(data, (0, None), "10N_010E")
+
+    data[1, 5, 5] = 1
+    assert sentinel_block_has_data(data, (0, 0), "10N_010E")
+
+    data[:] = np.nan
+    assert not sentinel_block_has_data(data, (np.nan, np.nan), "10N_010E")
+    assert not sentinel_block_has_data(np.zeros((1, 0, 10)), (None,), "10N_010E")
@@ -0,0 +1,26 @@
+import numpy as np
+
+from gfw_pixetl.tiles.utils.buffers import BufferPool
+
+
+def test_buffer_pool():
+    buffers = BufferPool()
+
+    array = buffers.get("src", (2, 10, 10), "uint16")
+    assert array.shape == (2, 10, 10)
+    assert array.dtype == np.uint16
+    assert array.flags.c_contiguous
+
+    # Smaller arrays reuse the same memory
+    smaller = buffers.get("src", (1, 5, 5), "float32")
+    assert smaller.dtype == np.float32
+    assert np.shares_memory(array, smaller)
+
+    # Larger arrays grow the buffer
+    larger = buffers.get("src", (4, 10, 10), "float64")
+    assert larger.shape == (4, 10, 10)
+    assert not np.shares_memory(array, larger)
+
+    # Buffers with different names don't overlap
+    other = buffers.get("dst", (2, 10, 10), "uint16")
+    assert not np.shares_memory(larger, other)
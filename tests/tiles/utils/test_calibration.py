@@ -0,0 +1,87 @@
+import json
+import os
+from unittest import mock
+
+import numpy as np
+from rasterio.enums import Resampling
+
+from gfw_pixetl.settings.globals import GLOBALS
+from gfw_pixetl.tiles.utils import calibration
+from gfw_pixetl.tiles.utils.calibration import (
+    calibration_key,
+    get_calibration,
+    measure_peak_memory,
+    needs_calibration,
+    set_calibration,
+    skip_calibration,
+)
+
+CACHE = "/tmp/calibration/calibration.json"
+
+
+def test_calibration_key():
+    key = calibration_key(
+        "uint8", np.float32, 2, "A + B", Resampling.bilinear, 0.5, "10/40000"
+    )
+    assert key == "uint8|float32|2|A + B|bilinear|0.5|10/40000"
+
+    assert key != calibration_key(
+        "uint8", np.float32, 2, None, Resampling.bilinear, 0.5, "10/40000"
+    )
+    assert key != calibration_key(
+        "uint8", np.float32, 2, "A + B", Resampling.bilinear, 2, "10/40000"
+    )
+    assert key != calibration_key(
+        "uint8", np.float32, 2, "A + B", Resampling.bilinear, 0.5, "90/27008"
+    )
+
+
+def _fresh_process():
+    return mock.patch.multiple(
+        calibration, _CALIBRATIONS=dict(), _LOADED_MTIME=None, _SKIPPED=set()
+    )
+
+
+def test_calibration_cache():
+    key = calibration_key("uint16", "uint16", 1, None, Resampling.nearest, 1, "1/4000")
+    if os.path.isfile(CACHE):
+        os.remove(CACHE)
+
+    with mock.patch.object(GLOBALS, "calibration_cache", CACHE), _fresh_process():
+        assert get_calibration(key) is None
+        set_calibration(key, 12.5)
+        assert get_calibration(key) == 12.5
+
+        with open(CACHE) as f:
+            assert json.load(f) == {key: 12.5}
+
+    # A new process picks up the persisted calibration
+    with mock.patch.object(GLOBALS, "calibration_cache", CACHE), _fresh_process():
+        assert get_calibration(key) == 12.5
+
+        # Loaded calibrations are kept in memory
+        with mock.patch.object(calibration, "_load_calibrations") as load:
+            assert get_calibration(key) == 12.5
+            assert get_calibration("unknown") is None
+            load.assert_not_called()
+
+
+def test_skip_calibration():
+    key = calibration_key("uint8", "uint8", 1, None, Resampling.nearest, 1, "1/4000")
+
+    with mock.patch.object(GLOBALS, "calibration_cache", None), _fresh_process():
+        assert needs_calibration(key)
+        skip_calibration(key)
+        assert not needs_calibration(key)
+        assert get_calibration(key) is None
+
+
+def test_measure_peak_memory():
+    def allocate(size):
+        array = np.ones(size, dtype="uint8")
+        return array.sum()
+
+    result, peak = measure_peak_memory(allocate, 100000000)
+
+    assert result == 100000000
+    assert peak >= 90000000
@@ -0,0 +1,136 @@
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+from shapely import to_wkb
+from shapely.geometry import Point, box
+
+from gfw_pixetl.tiles.utils.rasterize import Features, bin_points, rasterize_window
+
+TRANSFORM = rasterio.Affine(1, 0, 0, 0, -1, 10)
+
+
+def test_rasterize_window():
+    geometries = np.array([box(0, 0, 6, 10), box(4, 0, 10, 10), box(0, 0, 2, 2), None])
+    values = np.array([1.0, 2.0, np.nan, 4.0])
+    features = Features(to_wkb(geometries), values)
+    assert len(features) == 3
+
+    array = rasterize_window(features, Window(0, 0, 10, 5), TRANSFORM, "uint8", 0)
+    assert array is not None
+    assert array.shape == (1, 5, 10)
+    assert array.dtype == np.uint8
+    # Later features overwrite earlier ones
+    assert array[0, 0].tolist() == [1, 1, 1, 1, 2, 2, 2, 2, 2, 2]
+
+    # Features without value are burned as 0
+    array = rasterize_window(features, Window(0, 8, 10, 2), TRANSFORM, "uint8", 255)
+    assert array is not None
+    assert array[0, 0].tolist() == [0, 0, 1, 1, 2, 2, 2, 2, 2, 2]
+
+    features = Features(to_wkb([box(0, 5, 1, 6)]), np.array([1]))
+    assert rasterize_window(features, Window(5, 0, 5, 5), TRANSFORM, "uint8", 0) is None
+
+
+def test_rasterize_window_order():
+    geometries = np.array([box(0, 0, 6, 10), box(4, 0, 10, 10)])
+    window = Window(0, 0, 10, 1)
+
+    # Features get burned in order of their values
+    features = Features(to_wkb(geometries), np.array([2, 1]), order="asc")
+    array = rasterize_window(features, window, TRANSFORM, "uint8", 0)
+    assert array is not None
+    assert array[0, 0].tolist() == [2, 2, 2, 2, 2, 2, 1, 1, 1, 1]
+
+    features = Features(to_wkb(geometries), np.array([1, 2]), order="desc")
+    array = rasterize_window(features, window, TRANSFORM, "uint8", 0)
+    assert array is not None
+    assert array[0, 0].tolist() == [1, 1, 1, 1, 1, 1, 2, 2, 2, 2]
+
+
+def test_rasterize_window_count():
+    geometries = np.array([box(0, 0, 6, 10), box(4, 0, 10, 10), box(0, 0, 2, 2)])
+    values = np.array([None, None, None], dtype=object)
+    features = Features(to_wkb(geometries), values, "count")
+
+    array = rasterize_window(features, Window(0, 6, 10, 4), TRANSFORM, "int8", -1)
+    assert array is not None
+    assert array.dtype == np.int8
+    assert array[0, 3].tolist() == [2, 2, 1, 1, 2, 2, 1, 1, 1, 1]
+    assert array[0, 0].tolist() == [1, 1, 1, 1, 2, 2, 1, 1, 1, 1]
+
+
+def test_rasterize_window_reductions():
+    geometries = np.array([box(0, 0, 6, 10), box(4, 0, 10, 10), box(8, 8, 10, 10)])
+    values = np.array([3, 1, 5])
+    window = Window(0, 0, 10, 1)
+
+    expected = {
+        "max": [3, 3, 3, 3, 3, 3, 1, 1, 5, 5],
+        "min": [3, 3, 3, 3, 1, 1, 1, 1, 1, 1],
+        "sum": [3, 3, 3, 3, 4, 4, 1, 1, 6, 6],
+        "mean": [3, 3, 3, 3, 2, 2, 1, 1, 3, 3],
+        "first": [3, 3, 3, 3, 3, 3, 1, 1, 1, 1],
+        "last": [3, 3, 3, 3, 1, 1, 1, 1, 5, 5],
+    }
+    for method, row in expected.items():
+        features = Features(to_wkb(geometries), values, method)
+        array = rasterize_window(features, window, TRANSFORM, "uint8", 0)
+        assert array is not None
+        assert array[0, 0].tolist() == row, method
+
+    # Pixels without features get no data value
+    features = Features(to_wkb([box(0, 0, 2, 10), box(1, 0, 2, 10)]), values[:2], "max")
+    array = rasterize_window(features, window, TRANSFORM, "int16", -1)
+    assert array is not None
+    assert array[0, 0].tolist() == [3, 3] + [-1] * 8
+
+    # Features without value are left out of reductions
+    features = Features(to_wkb(geometries[:2]), np.array([3, np.nan]), "max")
+    assert len(features) == 1
+
+
+def test_rasterize_window_reductions_same_pixel():
+    # Features which don't intersect but fall into the same pixel
+    geometries = np.array([Point(0.25, 9.5), Point(0.75, 9.5), Point(3.5, 9.5)])
+    values = np.array([1, 5, 2])
+    window = Window(0, 0, 5, 1)
+
+    expected = {
+        "max": [5, 0, 0, 2, 0],
+        "min": [1, 0, 0, 2, 0],
+        "sum": [6, 0, 0, 2, 0],
+        "mean": [3, 0, 0, 2, 0],
+        "first": [1, 0, 0, 2, 0],
+        "last": [5, 0, 0, 2, 0],
+    }
+    for method, row in expected.items():
+        features = Features(to_wkb(geometries), values, method)
+        array = rasterize_window(features, window, TRANSFORM, "uint8", 0)
+        assert array is not None
+        assert array[0, 0].tolist() == row, method
+
+
+def test_bin_points():
+    x = np.array([0.5, 0.7, 9.5, 5.5, 10.0, -1.0])
+    y = np.array([9.5, 9.2, 0.5, 5.5, 5.0, 5.0])
+
+    binned = dict(
+        (window.flatten(), array)
+        for window, array in bin_points(x, y, None, TRANSFORM, 10, 10, 4, "uint8", 255)
+    )
+    # Points outside of the raster are dropped, empty windows are skipped
+    assert sorted(binned.keys()) == [(0, 0, 4, 4), (4, 4, 4, 4), (8, 8, 2, 2)]
+    assert binned[(0, 0, 4, 4)][0, 0].tolist() == [2, 255, 255, 255]
+    assert binned[(4, 4, 4, 4)][0, 0, 1] == 1
+    assert binned[(8, 8, 2, 2)].shape == (1, 2, 2)
+    assert binned[(8, 8, 2, 2)][0, 1, 1] == 1
+
+    weights = np.array([1.5, 2.0, np.nan, 4.0, 1.0, 1.0])
+    binned = dict(
+        (window.flatten(), array)
+        for window, array in bin_points(
+            x, y, weights, TRANSFORM, 10, 10, 4, "float32", 0
+        )
+    )
+    assert sorted(binned.keys()) == [(0, 0, 4, 4), (4, 4, 4, 4)]
+    assert binned[(0, 0, 4, 4)][0, 0, 0] == 3.5
@@ -0,0 +1,114 @@
+import threading
+
+import numpy as np
+import pytest
+import rasterio
+from rasterio.windows import Window
+
+from gfw_pixetl.tiles.utils.window_utils import (
+    WindowPrefetcher,
+    WindowWriter,
+    block_windows,
+    split_window,
+)
+
+PROFILE = {
+    "driver": "GTiff",
+    "width": 512,
+    "height": 512,
+    "count": 1,
+    "dtype": "uint8",
+    "nodata": 0,
+    "tiled": True,
+    "blockxsize": 256,
+    "blockysize": 256,
+    "compress": "DEFLATE",
+    "crs": "EPSG:4326",
+    "transform": rasterio.Affine(0.001, 0, 10, 0, -0.001, 10),
+}
+
+
+def _create_file():
+    uri = "/tmp/window_writer.tif"
+    with rasterio.open(uri, "w", **PROFILE):
+        pass
+    return uri
+
+
+def test_window_writer():
+    uri = _create_file()
+
+    with WindowWriter(uri, PROFILE, "10N_010E", queue_size=1) as writer:
+        # The writer runs in its own process, so that forking workers is safe
+        assert threading.active_count() == 1
+        for i, (col_off, row_off) in enumerate([(0, 0), (256, 0), (0, 256)]):
+            array = np.full((1, 256, 256), i + 1, dtype="uint8")
+            writer.write(array, Window(col_off, row_off, 256, 256))
+
+    with rasterio.open(uri) as src:
+        data = src.read(1)
+
+    assert data[:256, :256].min() == data[:256, :256].max() == 1
+    assert data[:256, 256:].min() == data[:256, 256:].max() == 2
+    assert data[256:, :256].min() == data[256:, :256].max() == 3
+    assert data[256:, 256:].max() == 0
+
+
+def test_window_writer_error():
+    uri = "/tmp/does_not_exist.tif"
+
+    with pytest.raises(rasterio.RasterioIOError):
+        with WindowWriter(uri, PROFILE, "10N_010E", queue_size=1) as writer:
+            array = np.ones((1, 256, 256), dtype="uint8")
+            for _ in range(3):
+                writer.write(array, Window(0, 0, 256, 256))
+
+
+def test_split_window():
+    quadrants = split_window(Window(0, 0, 1000, 1000), 256, 256)
+    assert quadrants == [
+        Window(0, 0, 512, 512),
+        Window(512, 0, 488, 512),
+        Window(0, 512, 512, 488),
+        Window(512, 512, 488, 488),
+    ]
+
+    # Windows which don't start at a block boundary
+    quadrants = split_window(Window(100, 0, 350, 256), 256, 256)
+    assert quadrants == [Window(100, 0, 156, 256), Window(256, 0, 194, 256)]
+
+    # Single blocks can't be split
+    assert split_window(Window(256, 256, 256, 256), 256, 256) == [
+        Window(256, 256, 256, 256)
+    ]
+
+
+def test_window_prefetcher():
+    windows = [Window(i * 256, 0, 256, 256) for i in range(4)]
+    reads = list()
+
+    def read(window, buffer):
+        reads.append((window.col_off, buffer))
+        return window.col_off
+
+    with WindowPrefetcher(read, windows, depth=1) as prefetcher:
+        assert prefetcher.get(windows[0]) == 0
+        assert prefetcher.get(windows[1]) == 256
+        # Windows outside of the plan are read without reading ahead
+        assert prefetcher.get(Window(0, 256, 128, 128)) == 0
+        assert prefetcher.get(windows[3]) == 768
+
+    # Reads alternate between two buffers
+    assert reads[:2] == [(0, "src0"), (256, "src1")]
+    # Window 2 was read ahead (unless cancelled in time) but dropped
+    assert reads[-2:] == [(0, "src1"), (768, "src0")]
+
+
+def test_block_windows():
+    windows = block_windows(1000, 600, 256, 256, 2)
+    assert windows == [
+        Window(0, 0, 512, 512),
+        Window(0, 512, 512, 88),
+        Window(512, 0, 488, 512),
+        Window(512, 512, 488, 88),
+    ]